@@ -1,43 +1,43 @@
-import io
 import os
 import re
+import sys
 import threading
-from contextlib import redirect_stdout
-from datetime import datetime, timezone
+import time
 from typing import Any
-from uuid import uuid4
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import json
 import asyncio
 from pydantic import BaseModel, Field
 
+from src.graphs.collection_config import DEFAULT_COLLECTION, UnknownCollectionError, get_collection, get_collections
+from src.graphs.metrics import REQUEST_DURATION, STREAM_TTFT, render_metrics
+from src.graphs.tracing import collect_trace, record, step_lines
 from src.storage.chat_store import (
     ChatStoreError,
-    append_message,
+    aappend_message,
+    aappend_message_deferred,
+    acreate_session,
+    aclose_pool,
+    aget_messages,
+    aget_recent_messages,
+    alist_sessions,
+    alog_escalation_deferred,
+    close_pool,
     create_session,
-    get_messages,
     list_sessions,
+    start_write_behind,
+    stop_write_behind,
     update_session_title,
-    log_escalation,
 )
+from src.storage.memory_store import get_memory_store
 # NOTE: Heavy imports (langchain_groq, src.states.state) are loaded LAZILY
 # to ensure the FastAPI server binds to the port immediately on startup.
 # This prevents Render's port-scan timeout.
 
-_rag_app_cache = None
-
-def _get_rag_app():
-    """Lazy-load the LangGraph RAG app (heavy imports: PyTorch, sentence-transformers)."""
-    global _rag_app_cache
-    if _rag_app_cache is None:
-        from src.states import state
-        _rag_app_cache = state.app
-    return _rag_app_cache
-
 # Load .env values for local development.
 load_dotenv()
 
@@ -45,13 +45,8 @@ load_dotenv()
 def _generate_title_with_llm(question: str, groq_api_key: str) -> str:
     """Call Groq LLM to produce a concise ≤6-word chat title."""
     try:
-        from langchain_groq import ChatGroq
-        llm = ChatGroq(
-            model="openai/gpt-oss-20b",
-            temperature=0,
-            groq_api_key=groq_api_key,
-            max_tokens=20,
-        )
+        from src.llms.llm import RAG_MODEL, get_chat_model
+        llm = get_chat_model(RAG_MODEL, groq_api_key, max_tokens=20)
         prompt = (
             "Generate a concise chat title (maximum 6 words, no quotes, no punctuation at the end) "
             f"that summarises this question: {question}"
@@ -67,7 +62,6 @@ def _rename_session_async(
     session_id: str,
     question: str,
     groq_api_key: str,
-    memory_sessions: dict,
 ) -> None:
     """Generate an LLM title in a background thread and update the session."""
 
@@ -79,8 +73,7 @@ def _rename_session_async(
         except ChatStoreError:
             pass
         # Also update in-memory store if present
-        if session_id in memory_sessions:
-            memory_sessions[session_id]["title"] = title
+        _memory_store.update_title(session_id, title)
 
     threading.Thread(target=_worker, daemon=True).start()
 
@@ -97,10 +90,16 @@ def _background_warmup():
             _ = _state_mod.app
             # Also pre-build the vectorstore
             from src.graphs.graph_builder import get_retriever
-            _ = get_retriever(groq_key)
+            _ = get_retriever()
+            # Load (or download) the local reranker model before the first grading
+            from src.graphs.reranker import get_reranker
+            _ = get_reranker()
             print("---WARMUP: Done. Backend ready.---")
         else:
             print("---WARMUP: GROQ_API_KEY not set, skipping vectorstore pre-warm.---")
+        # Hot-reload the index when documents/ or the source URLs change
+        from src.graphs.graph_builder import start_index_watcher
+        start_index_watcher()
     except Exception as exc:
         print(f"---WARMUP ERROR (non-fatal): {exc}---")
 
@@ -109,7 +108,16 @@ async def lifespan(app_instance):
     # Start background warmup thread so port binds immediately
     warmup_thread = threading.Thread(target=_background_warmup, daemon=True)
     warmup_thread.start()
+    await start_write_behind()
     yield
+    # Let an index sync in progress finish writing before the process exits.
+    graph_builder = sys.modules.get("src.graphs.graph_builder")
+    if graph_builder is not None:
+        await asyncio.to_thread(graph_builder.stop_index_watcher)
+    # Persist queued assistant messages and escalations before the pools close.
+    await stop_write_behind()
+    await aclose_pool()
+    await asyncio.to_thread(close_pool)
 
 app = FastAPI(
     title="Adaptive RAG Backend",
@@ -127,61 +135,68 @@ app.add_middleware(
 )
 
 
-_memory_sessions: dict[str, dict[str, Any]] = {}
-_memory_messages: dict[str, list[dict[str, Any]]] = {}
+# Prior turns passed to the graph as chat history.
+CHAT_HISTORY_MESSAGES = int(os.getenv("CHAT_HISTORY_MESSAGES", "10"))
 
+_memory_store = get_memory_store()
 
-def _now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
-
-
-def _create_memory_session(title: str) -> dict[str, Any]:
-    session_id = str(uuid4())
-    row = {
-        "id": session_id,
-        "title": title[:120] if title else "New chat",
-        "created_at": _now_iso(),
-        "last_message_at": _now_iso(),
-    }
-    _memory_sessions[session_id] = row
-    _memory_messages[session_id] = []
-    return row
 
-
-def _append_memory_message(
+async def _save_assistant_message(
     session_id: str,
-    role: str,
+    use_memory_store: bool,
     content: str,
     metadata: dict[str, Any] | None = None,
-) -> dict[str, Any]:
-    if session_id not in _memory_sessions:
-        _memory_sessions[session_id] = {
-            "id": session_id,
-            "title": "Recovered chat",
-            "created_at": _now_iso(),
-            "last_message_at": _now_iso(),
-        }
-        _memory_messages.setdefault(session_id, [])
-    row = {
-        "id": str(uuid4()),
-        "session_id": session_id,
-        "role": role,
-        "content": content,
-        "metadata": metadata or {},
-        "created_at": _now_iso(),
-    }
-    _memory_messages.setdefault(session_id, []).append(row)
-    _memory_sessions[session_id]["last_message_at"] = _now_iso()
-    return row
+) -> None:
+    if use_memory_store:
+        _memory_store.append_message(session_id=session_id, role="assistant", content=content, metadata=metadata)
+        return
+    try:
+        await aappend_message_deferred(session_id=session_id, role="assistant", content=content, metadata=metadata)
+    except ChatStoreError:
+        _memory_store.append_message(session_id=session_id, role="assistant", content=content, metadata=metadata)
 
 
-def _list_memory_sessions() -> list[dict[str, Any]]:
-    rows = list(_memory_sessions.values())
-    return sorted(rows, key=lambda item: item.get("last_message_at", ""), reverse=True)
+async def _load_chat_history(session_id: str, use_memory_store: bool) -> str:
+    """The last CHAT_HISTORY_MESSAGES user/assistant turns formatted for the prompt."""
+    if not session_id:
+        return ""
+    history_msgs = None
+    if not use_memory_store:
+        try:
+            history_msgs = await aget_recent_messages(session_id, CHAT_HISTORY_MESSAGES)
+        except ChatStoreError:
+            pass
+    if history_msgs is None:
+        history_msgs = _memory_store.get_recent_messages(session_id, CHAT_HISTORY_MESSAGES)
+    return "\n".join(f"{m['role'].capitalize()}: {m.get('content', '')}" for m in history_msgs)
+
+
+def _lookup_cached_answer(question: str, chat_history: str, collection: str) -> tuple[dict[str, Any], str] | None:
+    """Return (entry, "exact" | "semantic") for a question previously answered from the same collection index."""
+    try:
+        from src.graphs.answer_cache import ANSWER_CACHE_ENABLED, get_answer_cache, is_history_dependent
+        from src.graphs.graph_builder import get_index_signature
 
+        signature = get_index_signature(collection)
+        if not ANSWER_CACHE_ENABLED or not signature or is_history_dependent(question, chat_history):
+            return None
+        return get_answer_cache().lookup(question, collection, signature)
+    except Exception as exc:
+        print(f"---ANSWER CACHE LOOKUP FAILED: {exc}---")
+        return None
+
+
+def _remember_answer(question: str, chat_history: str, collection: str, answer: str, documents_used: int) -> None:
+    try:
+        from src.graphs.answer_cache import ANSWER_CACHE_ENABLED, get_answer_cache, is_history_dependent
+        from src.graphs.graph_builder import get_index_signature
 
-def _get_memory_messages(session_id: str) -> list[dict[str, Any]]:
-    return _memory_messages.get(session_id, [])
+        signature = get_index_signature(collection)
+        if not ANSWER_CACHE_ENABLED or not signature or is_history_dependent(question, chat_history):
+            return
+        get_answer_cache().store(question, collection, signature, answer, documents_used)
+    except Exception as exc:
+        print(f"---ANSWER CACHE STORE FAILED: {exc}---")
 
 
 class ChatRequest(BaseModel):
@@ -191,6 +206,22 @@ class ChatRequest(BaseModel):
         default=None,
         description="Groq API key. Falls back to GROQ_API_KEY environment variable.",
     )
+    collection: str | None = Field(
+        default=None,
+        description="Named document collection to answer from. Falls back to DEFAULT_COLLECTION.",
+    )
+
+
+class TraceStep(BaseModel):
+    name: str
+    kind: str
+    started_at: float
+    ended_at: float | None = None
+    duration_ms: float | None = None
+    decision: str | None = None
+    notes: list[str] = Field(default_factory=list)
+    token_usage: dict[str, int] = Field(default_factory=dict)
+    error: str | None = None
 
 
 class ChatResponse(BaseModel):
@@ -201,6 +232,7 @@ class ChatResponse(BaseModel):
     steps: list[str]
     escalated: bool
     escalation_reason: str | None = None
+    trace: list[TraceStep] = Field(default_factory=list)
 
 
 class SessionResponse(BaseModel):
@@ -223,6 +255,13 @@ class CreateSessionRequest(BaseModel):
     title: str | None = None
 
 
+def _resolve_collection(name: str | None) -> str:
+    try:
+        return get_collection(name).name
+    except UnknownCollectionError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+
 def _is_simple_greeting(text: str) -> bool:
     normalized = re.sub(r"[^a-z]", "", text.lower())
     return normalized in {"hi", "hello", "hey", "hola", "namaste"}
@@ -243,16 +282,31 @@ def models() -> dict[str, Any]:
     return {
         "llm": "openai/gpt-oss-20b",
         "embedding": "sentence-transformers/all-MiniLM-L6-v2",
+        "embedding_provider": os.getenv("EMBEDDING_PROVIDER", "local"),
         "routing": ["vectorstore", "human_escalation"],
     }
 
 
+@app.get("/collections")
+def collections() -> dict[str, Any]:
+    # Only report what is loaded if the index module is already imported.
+    graph_builder = sys.modules.get("src.graphs.graph_builder")
+    loaded = graph_builder.get_loaded_indexes()["collections"] if graph_builder else {}
+    return {
+        "default": DEFAULT_COLLECTION,
+        "collections": [
+            {"name": name, "loaded": name in loaded, "memory_bytes": loaded.get(name, {}).get("memory_bytes")}
+            for name in get_collections()
+        ],
+    }
+
+
 @app.get("/sessions", response_model=list[SessionResponse])
-def sessions() -> list[SessionResponse]:
+async def sessions() -> list[SessionResponse]:
     try:
-        return [SessionResponse(**item) for item in list_sessions()]
+        return [SessionResponse(**item) for item in await alist_sessions()]
     except ChatStoreError:
-        return [SessionResponse(**item) for item in _list_memory_sessions()]
+        return [SessionResponse(**item) for item in _memory_store.list_sessions()]
 
 
 @app.post("/sessions", response_model=SessionResponse)
@@ -261,7 +315,7 @@ def new_session(payload: CreateSessionRequest) -> SessionResponse:
     try:
         row = create_session(title)
     except ChatStoreError:
-        row = _create_memory_session(title)
+        row = _memory_store.create_session(title)
     return SessionResponse(**row)
 
 
@@ -280,113 +334,88 @@ def rename_session(session_id: str, payload: UpdateSessionRequest) -> SessionRes
             raise HTTPException(status_code=404, detail="Session not found")
         return SessionResponse(**row)
     except ChatStoreError:
-        if session_id in _memory_sessions:
-            _memory_sessions[session_id]["title"] = title
-            return SessionResponse(**_memory_sessions[session_id])
+        row = _memory_store.update_title(session_id, title)
+        if row:
+            return SessionResponse(**row)
         raise HTTPException(status_code=404, detail="Session not found")
 
 
 @app.get("/sessions/{session_id}/messages", response_model=list[MessageResponse])
-def session_messages(session_id: str) -> list[MessageResponse]:
+async def session_messages(session_id: str) -> list[MessageResponse]:
     try:
-        return [MessageResponse(**item) for item in get_messages(session_id)]
+        return [MessageResponse(**item) for item in await aget_messages(session_id)]
     except ChatStoreError:
-        return [MessageResponse(**item) for item in _get_memory_messages(session_id)]
+        return [MessageResponse(**item) for item in _memory_store.get_messages(session_id)]
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.post("/chat", response_model=ChatResponse)
-def chat(payload: ChatRequest) -> ChatResponse:
+async def chat(payload: ChatRequest) -> ChatResponse:
+    with REQUEST_DURATION.time(endpoint="/chat"):
+        return await _chat(payload)
+
+
+async def _chat(payload: ChatRequest) -> ChatResponse:
+    collection = _resolve_collection(payload.collection)
     use_memory_store = False
     try:
         if payload.session_id:
             session_id = payload.session_id
         else:
             chat_title = payload.question[:60] + ("…" if len(payload.question) > 60 else "")
-            created = create_session(chat_title)
+            created = await acreate_session(chat_title)
             session_id = created["id"]
             # Kick off LLM title generation in background (non-blocking)
             groq_key = payload.groq_api_key or os.getenv("GROQ_API_KEY") or ""
             if groq_key:
-                _rename_session_async(session_id, payload.question, groq_key, _memory_sessions)
+                _rename_session_async(session_id, payload.question, groq_key)
     except ChatStoreError:
         use_memory_store = True
         if payload.session_id:
             session_id = payload.session_id
-            if session_id not in _memory_sessions:
-                _memory_sessions[session_id] = {
-                    "id": session_id,
-                    "title": payload.question[:120] if payload.question else "Recovered chat",
-                    "created_at": _now_iso(),
-                    "last_message_at": _now_iso(),
-                }
-                _memory_messages.setdefault(session_id, [])
+            _memory_store.ensure_session(session_id, payload.question or "Recovered chat")
         else:
             chat_title = payload.question[:60] + ("…" if len(payload.question) > 60 else "")
-            created = _create_memory_session(chat_title)
+            created = _memory_store.create_session(chat_title)
             session_id = created["id"]
             # Kick off LLM title generation in background (non-blocking)
             groq_key = payload.groq_api_key or os.getenv("GROQ_API_KEY") or ""
             if groq_key:
-                _rename_session_async(session_id, payload.question, groq_key, _memory_sessions)
+                _rename_session_async(session_id, payload.question, groq_key)
 
     # Fetch history before appending current message to use as context
-    chat_history_str = ""
-    if session_id:
-        if use_memory_store:
-            history_msgs = _get_memory_messages(session_id)
-        else:
-            try:
-                history_msgs = get_messages(session_id)
-            except ChatStoreError:
-                history_msgs = _get_memory_messages(session_id)
-        
-        formatted_history = []
-        for m in history_msgs[-10:]:
-            r = m.get("role", "")
-            if r in ("user", "assistant"):
-                formatted_history.append(f"{r.capitalize()}: {m.get('content', '')}")
-        chat_history_str = "\n".join(formatted_history)
+    chat_history_str = await _load_chat_history(session_id, use_memory_store)
 
     if use_memory_store:
-        _append_memory_message(session_id=session_id, role="user", content=payload.question)
+        _memory_store.append_message(session_id=session_id, role="user", content=payload.question)
     else:
         try:
-            append_message(session_id=session_id, role="user", content=payload.question)
+            await aappend_message(session_id=session_id, role="user", content=payload.question)
         except ChatStoreError:
             use_memory_store = True
-            _append_memory_message(session_id=session_id, role="user", content=payload.question)
+            _memory_store.append_message(session_id=session_id, role="user", content=payload.question)
 
     if _is_simple_greeting(payload.question):
+        trace = [record("greeting", kind="shortcut").to_dict()]
         greeting_response = ChatResponse(
             session_id=session_id,
             question=payload.question,
             answer="Hi! How can I help you today?",
             documents_used=0,
-            steps=["---GREETING SHORT-CIRCUIT---"],
+            steps=step_lines(trace),
             escalated=False,
+            trace=trace,
+        )
+        await _save_assistant_message(
+            session_id,
+            use_memory_store,
+            greeting_response.answer,
+            metadata={"steps": greeting_response.steps, "trace": trace, "escalated": False},
         )
-        if use_memory_store:
-            _append_memory_message(
-                session_id=session_id,
-                role="assistant",
-                content=greeting_response.answer,
-                metadata={"steps": greeting_response.steps, "escalated": False},
-            )
-        else:
-            try:
-                append_message(
-                    session_id=session_id,
-                    role="assistant",
-                    content=greeting_response.answer,
-                    metadata={"steps": greeting_response.steps, "escalated": False},
-                )
-            except ChatStoreError:
-                _append_memory_message(
-                    session_id=session_id,
-                    role="assistant",
-                    content=greeting_response.answer,
-                    metadata={"steps": greeting_response.steps, "escalated": False},
-                )
         return greeting_response
 
     groq_api_key = payload.groq_api_key or os.getenv("GROQ_API_KEY")
@@ -396,17 +425,43 @@ def chat(payload: ChatRequest) -> ChatResponse:
             detail="Missing Groq API key. Provide groq_api_key in request or set GROQ_API_KEY.",
         )
 
-    execution_buffer = io.StringIO()
+    cached = await asyncio.to_thread(_lookup_cached_answer, payload.question, chat_history_str, collection)
+    if cached:
+        entry, match_type = cached
+        trace = [record("answer_cache", kind="cache", decision=match_type).to_dict()]
+        cached_response = ChatResponse(
+            session_id=session_id,
+            question=payload.question,
+            answer=entry["answer"],
+            documents_used=entry["documents_used"],
+            steps=step_lines(trace),
+            escalated=False,
+            trace=trace,
+        )
+        await _save_assistant_message(
+            session_id,
+            use_memory_store,
+            cached_response.answer,
+            metadata={
+                "steps": cached_response.steps,
+                "trace": trace,
+                "documents_used": cached_response.documents_used,
+                "escalated": False,
+            },
+        )
+        return cached_response
+
     try:
         from src.states import state
         # Ensure it's imported correctly
-        _rag_app_cache = state.app
-        with redirect_stdout(execution_buffer):
-            result = _rag_app_cache.invoke(
+        rag_app = state.app
+        with collect_trace() as trace:
+            result = await rag_app.ainvoke(
                 {
                     "question": payload.question,
                     "chat_history": chat_history_str,
                     "groq_api_key": groq_api_key,
+                    "collection": collection,
                     "retrieval_attempts": 0,
                     "generation_attempts": 0,
                     "escalated": False,
@@ -418,56 +473,34 @@ def chat(payload: ChatRequest) -> ChatResponse:
         status_code = 400 if "api key" in message.lower() else 500
         raise HTTPException(status_code=status_code, detail=message) from exc
 
-    steps = [line.strip() for line in execution_buffer.getvalue().splitlines() if line.strip()]
+    events = trace.to_list()
+    steps = step_lines(events)
     documents = result.get("documents") or []
     escalated = bool(result.get("escalated", False))
     escalation_reason = result.get("escalation_reason") or "Unknown reason"
 
     if escalated and not use_memory_store:
         try:
-            log_escalation(session_id, payload.question, chat_history_str, escalation_reason)
+            await alog_escalation_deferred(session_id, payload.question, chat_history_str, escalation_reason)
         except ChatStoreError:
             pass
 
     answer = result.get("generation", "No answer returned.")
-
-    if use_memory_store:
-        _append_memory_message(
-            session_id=session_id,
-            role="assistant",
-            content=answer,
-            metadata={
-                "steps": steps,
-                "documents_used": len(documents),
-                "escalated": escalated,
-                "escalation_reason": escalation_reason,
-            },
-        )
-    else:
-        try:
-            append_message(
-                session_id=session_id,
-                role="assistant",
-                content=answer,
-                metadata={
-                    "steps": steps,
-                    "documents_used": len(documents),
-                    "escalated": escalated,
-                    "escalation_reason": escalation_reason,
-                },
-            )
-        except ChatStoreError:
-            _append_memory_message(
-                session_id=session_id,
-                role="assistant",
-                content=answer,
-                metadata={
-                    "steps": steps,
-                    "documents_used": len(documents),
-                    "escalated": escalated,
-                    "escalation_reason": escalation_reason,
-                },
-            )
+    if not escalated and result.get("generation"):
+        await asyncio.to_thread(_remember_answer, payload.question, chat_history_str, collection, answer, len(documents))
+
+    await _save_assistant_message(
+        session_id,
+        use_memory_store,
+        answer,
+        metadata={
+            "steps": steps,
+            "trace": events,
+            "documents_used": len(documents),
+            "escalated": escalated,
+            "escalation_reason": escalation_reason,
+        },
+    )
 
     return ChatResponse(
         session_id=session_id,
@@ -477,80 +510,56 @@ def chat(payload: ChatRequest) -> ChatResponse:
         steps=steps,
         escalated=escalated,
         escalation_reason=escalation_reason,
+        trace=events,
     )
 
 @app.post("/chat/stream")
 async def chat_stream(payload: ChatRequest):
+    request_started = time.perf_counter()
+    collection = _resolve_collection(payload.collection)
     use_memory_store = False
     try:
         if payload.session_id:
             session_id = payload.session_id
         else:
             chat_title = payload.question[:60] + ("…" if len(payload.question) > 60 else "")
-            created = create_session(chat_title)
+            created = await acreate_session(chat_title)
             session_id = created["id"]
             groq_key = payload.groq_api_key or os.getenv("GROQ_API_KEY") or ""
             if groq_key:
-                _rename_session_async(session_id, payload.question, groq_key, _memory_sessions)
+                _rename_session_async(session_id, payload.question, groq_key)
     except ChatStoreError:
         use_memory_store = True
         if payload.session_id:
             session_id = payload.session_id
-            if session_id not in _memory_sessions:
-                _memory_sessions[session_id] = {
-                    "id": session_id,
-                    "title": payload.question[:120] if payload.question else "Recovered chat",
-                    "created_at": _now_iso(),
-                    "last_message_at": _now_iso(),
-                }
-                _memory_messages.setdefault(session_id, [])
+            _memory_store.ensure_session(session_id, payload.question or "Recovered chat")
         else:
             chat_title = payload.question[:60] + ("…" if len(payload.question) > 60 else "")
-            created = _create_memory_session(chat_title)
+            created = _memory_store.create_session(chat_title)
             session_id = created["id"]
             groq_key = payload.groq_api_key or os.getenv("GROQ_API_KEY") or ""
             if groq_key:
-                _rename_session_async(session_id, payload.question, groq_key, _memory_sessions)
+                _rename_session_async(session_id, payload.question, groq_key)
 
-    chat_history_str = ""
-    if session_id:
-        if use_memory_store:
-            history_msgs = _get_memory_messages(session_id)
-        else:
-            try:
-                history_msgs = get_messages(session_id)
-            except ChatStoreError:
-                history_msgs = _get_memory_messages(session_id)
-        
-        formatted_history = []
-        for m in history_msgs[-10:]:
-            r = m.get("role", "")
-            if r in ("user", "assistant"):
-                formatted_history.append(f"{r.capitalize()}: {m.get('content', '')}")
-        chat_history_str = "\n".join(formatted_history)
+    chat_history_str = await _load_chat_history(session_id, use_memory_store)
 
     if use_memory_store:
-        _append_memory_message(session_id=session_id, role="user", content=payload.question)
+        _memory_store.append_message(session_id=session_id, role="user", content=payload.question)
     else:
         try:
-            append_message(session_id=session_id, role="user", content=payload.question)
+            await aappend_message(session_id=session_id, role="user", content=payload.question)
         except ChatStoreError:
             use_memory_store = True
-            _append_memory_message(session_id=session_id, role="user", content=payload.question)
+            _memory_store.append_message(session_id=session_id, role="user", content=payload.question)
 
     async def event_generator():
         yield f"data: {json.dumps({'type': 'session_init', 'session_id': session_id})}\n\n"
 
         if _is_simple_greeting(payload.question):
             ans = "Hi! How can I help you today?"
+            yield f"data: {json.dumps({'type': 'trace', 'event': record('greeting', kind='shortcut').to_dict()})}\n\n"
             yield f"data: {json.dumps({'type': 'content', 'content': ans})}\n\n"
-            if use_memory_store:
-                _append_memory_message(session_id=session_id, role="assistant", content=ans)
-            else:
-                try:
-                    append_message(session_id=session_id, role="assistant", content=ans)
-                except ChatStoreError:
-                    _append_memory_message(session_id=session_id, role="assistant", content=ans)
+            await _save_assistant_message(session_id, use_memory_store, ans)
             yield "data: [DONE]\n\n"
             return
 
@@ -558,79 +567,124 @@ async def chat_stream(payload: ChatRequest):
         if not groq_api_key:
             yield f"data: {json.dumps({'type': 'error', 'content': 'Missing API key.'})}\n\n"
             return
-            
+
+        cached = await asyncio.to_thread(_lookup_cached_answer, payload.question, chat_history_str, collection)
+        if cached:
+            entry, match_type = cached
+            yield f"data: {json.dumps({'type': 'status', 'content': f'Answer served from cache ({match_type} match).'})}\n\n"
+            yield f"data: {json.dumps({'type': 'trace', 'event': record('answer_cache', kind='cache', decision=match_type).to_dict()})}\n\n"
+            yield f"data: {json.dumps({'type': 'content', 'content': entry['answer']})}\n\n"
+            await _save_assistant_message(session_id, use_memory_store, entry["answer"])
+            yield "data: [DONE]\n\n"
+            return
+
         full_answer = ""
-        try:
-            yield f"data: {json.dumps({'type': 'status', 'content': 'Initializing components (may take a moment)...'})}\n\n"
+        last_generation = None
+        escalated = False
+        failed = False
+        first_token_seen = False
+        trace_sent = 0
+        with collect_trace() as trace:
+            try:
+                yield f"data: {json.dumps({'type': 'status', 'content': 'Initializing components (may take a moment)...'})}\n\n"
             
-            from src.states import state
-            rag_app = state.app
+                from src.states import state
+                rag_app = state.app
             
-            async for event in rag_app.astream_events(
-                {
-                    "question": payload.question,
-                    "chat_history": chat_history_str,
-                    "groq_api_key": groq_api_key,
-                    "retrieval_attempts": 0,
-                    "generation_attempts": 0,
-                    "escalated": False,
-                    "escalation_reason": "",
-                },
-                version="v1"
-            ):
-                if event["event"] == "on_chain_start":
-                    node_name = event.get("name")
-                    status_map = {
-                        "route_question": "Routing your question...",
-                        "retrieve": "Searching knowledge base...",
-                        "grade_documents": "Evaluating document relevance...",
-                        "transform_query": "Re-writing query for better search...",
-                        "generate": "Generating answer...",
-                        "grade_generation_v_documents_and_question": "Double-checking answer..."
-                    }
-                    if node_name in status_map:
-                        yield f"data: {json.dumps({'type': 'status', 'content': status_map[node_name]})}\n\n"
+                async for event in rag_app.astream_events(
+                    {
+                        "question": payload.question,
+                        "chat_history": chat_history_str,
+                        "groq_api_key": groq_api_key,
+                        "collection": collection,
+                        "retrieval_attempts": 0,
+                        "generation_attempts": 0,
+                        "escalated": False,
+                        "escalation_reason": "",
+                    },
+                    version="v1"
+                ):
+                    if event["event"] == "on_chain_start":
+                        node_name = event.get("name")
+                        status_map = {
+                            "route_question": "Routing your question...",
+                            "retrieve": "Searching knowledge base...",
+                            "grade_documents": "Evaluating document relevance...",
+                            "transform_query": "Re-writing query for better search...",
+                            "generate": "Generating answer...",
+                            "grade_generation_v_documents_and_question": "Double-checking answer..."
+                        }
+                        if node_name in status_map:
+                            yield f"data: {json.dumps({'type': 'status', 'content': status_map[node_name]})}\n\n"
                         
-                elif event["event"] == "on_chat_model_stream":
-                    chunk = event["data"]["chunk"].content
-                    if chunk:
-                        full_answer += chunk
-                        yield f"data: {json.dumps({'type': 'content', 'content': chunk})}\n\n"
-                        await asyncio.sleep(0.01)
-                elif event["event"] == "on_chain_end" and event.get("name") == "human_escalation":
-                    output = event["data"].get("output", {})
-                    
-                    if not use_memory_store:
-                        try:
-                            log_escalation(
-                                session_id,
-                                payload.question,
-                                chat_history_str,
-                                output.get("escalation_reason", "Reason not specified")
-                            )
-                        except ChatStoreError:
-                            pass
-                            
-                    if isinstance(output, dict) and "generation" in output:
-                        chunk = output["generation"]
+                    elif event["event"] == "on_chat_model_stream":
+                        chunk = event["data"]["chunk"].content
                         if chunk:
+                            if not first_token_seen:
+                                first_token_seen = True
+                                STREAM_TTFT.observe(time.perf_counter() - request_started)
                             full_answer += chunk
                             yield f"data: {json.dumps({'type': 'content', 'content': chunk})}\n\n"
                             await asyncio.sleep(0.01)
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
-            
+                    elif event["event"] == "on_chain_end" and event.get("name") == "generate":
+                        output = event["data"].get("output")
+                        if isinstance(output, dict):
+                            last_generation = output
+                    elif event["event"] == "on_chain_end" and event.get("name") == "human_escalation":
+                        escalated = True
+                        output = event["data"].get("output", {})
+                    
+                        if not use_memory_store:
+                            try:
+                                await alog_escalation_deferred(
+                                    session_id,
+                                    payload.question,
+                                    chat_history_str,
+                                    output.get("escalation_reason", "Reason not specified")
+                                )
+                            except ChatStoreError:
+                                pass
+                            
+                        if isinstance(output, dict) and "generation" in output:
+                            chunk = output["generation"]
+                            if chunk:
+                                if not first_token_seen:
+                                    first_token_seen = True
+                                    STREAM_TTFT.observe(time.perf_counter() - request_started)
+                                full_answer += chunk
+                                yield f"data: {json.dumps({'type': 'content', 'content': chunk})}\n\n"
+                                await asyncio.sleep(0.01)
+
+                    # Spans are recorded as nodes finish; forward any new ones.
+                    for step in trace.events_since(trace_sent):
+                        trace_sent += 1
+                        yield f"data: {json.dumps({'type': 'trace', 'event': step.to_dict()})}\n\n"
+            except Exception as e:
+                failed = True
+                yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+
+        for step in trace.events_since(trace_sent):
+            yield f"data: {json.dumps({'type': 'trace', 'event': step.to_dict()})}\n\n"
+
+        if not failed and not escalated and last_generation and last_generation.get("generation"):
+            await asyncio.to_thread(
+                _remember_answer,
+                payload.question,
+                chat_history_str,
+                collection,
+                last_generation["generation"],
+                len(last_generation.get("documents") or []),
+            )
+
         if not full_answer:
             full_answer = "This query is out of context. Your query has been escalated to a human reviewer."
             yield f"data: {json.dumps({'type': 'content', 'content': full_answer})}\n\n"
-            
-        if use_memory_store:
-            _append_memory_message(session_id=session_id, role="assistant", content=full_answer)
-        else:
-            try:
-                append_message(session_id=session_id, role="assistant", content=full_answer)
-            except ChatStoreError:
-                _append_memory_message(session_id=session_id, role="assistant", content=full_answer)
+
+        events = trace.to_list()
+        await _save_assistant_message(
+            session_id, use_memory_store, full_answer, metadata={"steps": step_lines(events), "trace": events}
+        )
+        REQUEST_DURATION.observe(time.perf_counter() - request_started, endpoint="/chat/stream")
 
         yield "data: [DONE]\n\n"
 
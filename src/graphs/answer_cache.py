@@ -0,0 +1,193 @@
+# Answer cache in front of the RAG graph
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.graphs.cache import LRUCache
+from src.graphs.embeddings import get_embeddings
+from src.graphs.metrics import REGISTRY
+
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+# Cosine similarity above which a differently-worded question reuses an answer.
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+# Optional SQLite file so cached answers survive restarts; empty keeps them in memory only.
+ANSWER_CACHE_FILE = os.getenv("ANSWER_CACHE_FILE", "")
+
+# Words that usually point back at earlier turns ("what about it?", "tell me more").
+_FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|they|them|their|this|that|these|those|he|she|him|her|above|previous|earlier|again|more|else)\b",
+    re.IGNORECASE,
+)
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
+def is_history_dependent(question: str, chat_history: str) -> bool:
+    """True when the answer may depend on earlier turns and must not be shared."""
+    return bool(chat_history and chat_history.strip()) and bool(_FOLLOW_UP_PATTERN.search(question))
+
+
+class AnswerCache:
+    """Question -> answer cache with exact and embedding-similarity lookup.
+
+    Entries are kept per collection and scoped to that collection's index
+    signature: when its index changes, the collection's cached answers are
+    dropped (and purged from the on-disk backing); other collections keep theirs.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = ANSWER_CACHE_SIZE,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold: float = ANSWER_CACHE_SIMILARITY,
+        path: str | None = ANSWER_CACHE_FILE or None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.maxsize = maxsize
+        self._collections: dict[str, LRUCache] = {}
+        self._lock = threading.Lock()
+        self._connection = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            columns = {row[1] for row in self._connection.execute("pragma table_info(answers)")}
+            if columns and "collection" not in columns:
+                # Written before answers were scoped per collection; it is only a cache.
+                self._connection.execute("drop table answers")
+            self._connection.execute(
+                "create table if not exists answers ("
+                "collection text not null, signature text not null, question_key text not null, "
+                "question text not null, answer text not null, documents_used integer not null, "
+                "embedding blob not null, created_at real not null, "
+                "primary key (collection, signature, question_key))"
+            )
+            self._connection.commit()
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(get_embeddings().embed_query(question), dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _entries(self, collection: str, signature: str) -> LRUCache:
+        """The collection's entries, reset (and reloaded from disk) if its index signature changed."""
+        with self._lock:
+            entries = self._collections.get(collection)
+            if entries is None:
+                entries = self._collections[collection] = LRUCache(maxsize=self.maxsize, ttl_seconds=self.ttl_seconds)
+        if entries.generation == signature:
+            return entries
+        entries.reset_if_changed(signature)
+        if self._connection is None:
+            return entries
+        with self._lock:
+            self._connection.execute(
+                "delete from answers where collection = ? and signature != ?", (collection, signature)
+            )
+            self._connection.execute(
+                "delete from answers where created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._connection.commit()
+            rows = self._connection.execute(
+                "select question_key, question, answer, documents_used, embedding, created_at "
+                "from answers where collection = ? and signature = ? order by created_at asc",
+                (collection, signature),
+            ).fetchall()
+        for question_key, question, answer, documents_used, embedding, created_at in rows[-entries.maxsize:]:
+            entries.set(question_key, {
+                "question": question,
+                "answer": answer,
+                "documents_used": documents_used,
+                "embedding": np.frombuffer(embedding, dtype=np.float32),
+                "created_at": created_at,
+            })
+        return entries
+
+    def lookup(self, question: str, collection: str, signature: str) -> tuple[dict, str] | None:
+        """Return (entry, "exact" | "semantic") or None."""
+        entries = self._entries(collection, signature)
+        now = time.time()
+        entry = entries.get(normalize_question(question))
+        if entry is not None and now - entry["created_at"] <= self.ttl_seconds:
+            self.exact_hits += 1
+            return entry, "exact"
+
+        candidates = [
+            value for _, value in entries.items() if now - value["created_at"] <= self.ttl_seconds
+        ]
+        if candidates:
+            scores = np.stack([value["embedding"] for value in candidates]) @ self._embed(question)
+            best = int(np.argmax(scores))
+            if float(scores[best]) >= self.similarity_threshold:
+                self.semantic_hits += 1
+                return candidates[best], "semantic"
+        self.misses += 1
+        return None
+
+    def store(self, question: str, collection: str, signature: str, answer: str, documents_used: int) -> None:
+        entries = self._entries(collection, signature)
+        question_key = normalize_question(question)
+        entry = {
+            "question": question,
+            "answer": answer,
+            "documents_used": documents_used,
+            "embedding": self._embed(question),
+            "created_at": time.time(),
+        }
+        entries.set(question_key, entry)
+        if self._connection is None:
+            return
+        with self._lock:
+            self._connection.execute(
+                "insert or replace into answers "
+                "(collection, signature, question_key, question, answer, documents_used, embedding, created_at) "
+                "values (?, ?, ?, ?, ?, ?, ?, ?)",
+                (collection, signature, question_key, question, answer, documents_used,
+                 entry["embedding"].tobytes(), entry["created_at"]),
+            )
+            self._connection.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            collections = list(self._collections.values())
+        return {
+            "size": sum(len(entries) for entries in collections),
+            "maxsize": self.maxsize,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+        }
+
+
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    with _answer_cache_lock:
+        if not hasattr(get_answer_cache, "_instance"):
+            get_answer_cache._instance = AnswerCache()
+    return get_answer_cache._instance
+
+
+def _answer_cache_metrics():
+    if not hasattr(get_answer_cache, "_instance"):
+        return
+    stats = get_answer_cache._instance.stats()
+    yield ("rag_answer_cache_size", "gauge", "Entries in the answer cache.", {}, stats["size"])
+    for result, key in (("exact", "exact_hits"), ("semantic", "semantic_hits"), ("miss", "misses")):
+        yield ("rag_answer_cache_lookups_total", "counter", "Answer cache lookups by result.", {"result": result}, stats[key])
+
+
+REGISTRY.register_collector(_answer_cache_metrics)
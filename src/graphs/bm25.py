@@ -0,0 +1,109 @@
+# Lexical (BM25) index over the indexed chunks, used next to FAISS
+import heapq
+import json
+import math
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Iterable
+
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i if in into is it its of on or "
+    "that the their then there these this to was were what when where which who why will with".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word tokens; hyphenated and dotted terms (e.g. ``gpt-4``) stay whole."""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of chunk ids.
+
+    Postings map each term to ``[[row, term_frequency], ...]``; a search only
+    touches the postings of the query terms.
+    """
+
+    def __init__(
+        self,
+        doc_ids: list[str],
+        doc_lengths: list[int],
+        postings: dict[str, list[list[int]]],
+        k1: float = BM25_K1,
+        b: float = BM25_B,
+    ):
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.postings = postings
+        self.k1 = k1
+        self.b = b
+        self.avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+        total = len(doc_ids)
+        self._idf = {
+            term: math.log(1.0 + (total - len(rows) + 0.5) / (len(rows) + 0.5))
+            for term, rows in postings.items()
+        }
+
+    @classmethod
+    def build(cls, doc_ids: list[str], texts: Iterable[str], k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        postings: dict[str, list[list[int]]] = {}
+        doc_lengths: list[int] = []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                postings.setdefault(term, []).append([row, frequency])
+        return cls(list(doc_ids), doc_lengths, postings, k1=k1, b=b)
+
+    def search(self, query: str, k: int) -> list[tuple[str, float]]:
+        """Top-k (chunk id, score) pairs, best first."""
+        if not self.doc_ids or k <= 0:
+            return []
+        scores: dict[int, float] = {}
+        length_norm = self.b / self.avg_length if self.avg_length else 0.0
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for row, frequency in self.postings[term]:
+                denominator = frequency + self.k1 * (1.0 - self.b + length_norm * self.doc_lengths[row])
+                scores[row] = scores.get(row, 0.0) + idf * frequency * (self.k1 + 1.0) / denominator
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.doc_ids[row], score) for row, score in best]
+
+    def save(self, path: Path, version: str) -> None:
+        payload = {
+            "version": version,
+            "k1": self.k1,
+            "b": self.b,
+            "doc_ids": self.doc_ids,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings,
+        }
+        path.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path, version: str) -> "BM25Index | None":
+        """The stored index, or None if it is missing or was built for another index version."""
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            return None
+        if payload.get("version") != version or payload.get("k1") != BM25_K1 or payload.get("b") != BM25_B:
+            return None
+        return cls(payload["doc_ids"], payload["doc_lengths"], payload["postings"], k1=payload["k1"], b=payload["b"])
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[str]:
+    """Merge ranked id lists by summing ``1 / (k + rank)``; ties keep first-seen order."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
@@ -0,0 +1,121 @@
+# Small in-process caches shared by the retrieval and answer paths
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with an optional per-entry TTL.
+
+    ``generation`` ties the contents to an external version (e.g. the index
+    signature): calling ``reset_if_changed`` with a new value drops every
+    entry, so stale results are never served after the index changes.
+
+    With ``max_bytes`` and ``sizeof``, entries are also evicted while their
+    total size is over the limit; the newest entry is always kept.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        ttl_seconds: float | None = None,
+        max_bytes: int | None = None,
+        sizeof: Callable[[Any], int] | None = None,
+    ):
+        self.maxsize = max(0, maxsize)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.max_bytes = max_bytes if max_bytes and max_bytes > 0 and sizeof else None
+        self.sizeof = sizeof
+        self.generation: Any = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._sizes: dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and time.monotonic() - entry[0] > self.ttl_seconds:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Like ``get`` but leaves the recency order and hit/miss counts alone."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or (self.ttl_seconds and time.monotonic() - entry[0] > self.ttl_seconds):
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize == 0:
+            return
+        size = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic(), value)
+            self._sizes[key] = size
+            self._bytes += size
+            while len(self._entries) > self.maxsize or (
+                self.max_bytes and self._bytes > self.max_bytes and len(self._entries) > 1
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        if self._entries.pop(key, None) is not None:
+            self._bytes -= self._sizes.pop(key, 0)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def reset_if_changed(self, generation: Any) -> None:
+        with self._lock:
+            if generation != self.generation:
+                self._entries.clear()
+                self._sizes.clear()
+                self._bytes = 0
+                self.generation = generation
+
+    def items(self) -> list[tuple[Hashable, Any]]:
+        """Snapshot of live (key, value) pairs, least recently used first."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                (key, value)
+                for key, (stored_at, value) in self._entries.items()
+                if not self.ttl_seconds or now - stored_at <= self.ttl_seconds
+            ]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,101 @@
+# Named document collections, each with its own sources and index directory
+import json
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+
+DEFAULT_COLLECTION = os.getenv("DEFAULT_COLLECTION", "default")
+# JSON object of collection name -> {"urls": [...], "documents_dir": "..."};
+# relative paths are resolved against the project root.
+COLLECTIONS_FILE = os.getenv("COLLECTIONS_FILE", "collections.json")
+INDEX_SOURCE_URLS = [
+    "https://lilianweng.github.io/posts/2023-06-23-agent/",
+]
+DOCUMENTS_DIR_NAME = "documents"
+# Names become directory names, so keep them to a safe character set.
+_NAME_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+
+
+class UnknownCollectionError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Collection:
+    name: str
+    source_urls: tuple[str, ...]
+    documents_dir: Path
+    index_dir: Path
+
+
+def _project_root() -> Path:
+    return Path(__file__).resolve().parents[2]
+
+
+def _data_dir() -> Path:
+    return Path(__file__).resolve().parents[1] / "data"
+
+
+def _resolve(path: str) -> Path:
+    path = Path(path).expanduser()
+    return path if path.is_absolute() else _project_root() / path
+
+
+def _default_collection() -> Collection:
+    # The original single corpus; its index stays where it always was.
+    return Collection(
+        name=DEFAULT_COLLECTION,
+        source_urls=tuple(INDEX_SOURCE_URLS),
+        documents_dir=_project_root() / DOCUMENTS_DIR_NAME,
+        index_dir=_data_dir() / "faiss_index",
+    )
+
+
+def _read_collections_file() -> dict[str, Collection]:
+    path = _resolve(COLLECTIONS_FILE)
+    if not path.exists():
+        return {}
+    config = json.loads(path.read_text(encoding="utf-8"))
+    if not isinstance(config, dict):
+        raise ValueError(f"{path}: expected an object of collection name -> settings.")
+
+    collections: dict[str, Collection] = {}
+    for name, settings in config.items():
+        if not _NAME_RE.fullmatch(name):
+            raise ValueError(f"{path}: invalid collection name {name!r}.")
+        settings = settings or {}
+        if name == DEFAULT_COLLECTION:
+            default = _default_collection()
+            index_dir = default.index_dir
+            documents_dir = settings.get("documents_dir", str(default.documents_dir))
+            urls = settings.get("urls", list(default.source_urls))
+        else:
+            index_dir = _data_dir() / "collections" / name
+            documents_dir = settings.get("documents_dir", f"{DOCUMENTS_DIR_NAME}/{name}")
+            urls = settings.get("urls", [])
+        collections[name] = Collection(
+            name=name,
+            source_urls=tuple(urls),
+            documents_dir=_resolve(documents_dir),
+            index_dir=index_dir,
+        )
+    return collections
+
+
+def get_collections() -> dict[str, Collection]:
+    """Every configured collection by name; the default one is always present."""
+    if not hasattr(get_collections, "_instance"):
+        collections = {DEFAULT_COLLECTION: _default_collection()}
+        collections.update(_read_collections_file())
+        get_collections._instance = collections
+    return get_collections._instance
+
+
+def get_collection(name: str | None = None) -> Collection:
+    name = name or DEFAULT_COLLECTION
+    try:
+        return get_collections()[name]
+    except KeyError:
+        raise UnknownCollectionError(f"Unknown collection: {name}") from None
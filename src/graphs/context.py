@@ -0,0 +1,188 @@
+# Token-budgeted context assembly shared by generation and grading
+import os
+import re
+from dataclasses import dataclass
+
+from langchain_core.documents import Document
+
+
+# Encoding the text splitters measure chunks in, so budgets and chunk sizes agree.
+TOKEN_ENCODING = "gpt2"
+# Upper bound on the context passed to the generator and the hallucination
+# grader; 0 disables trimming.
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "2000"))
+# Share of a passage's word trigrams already in a more relevant passage above
+# which it is dropped as a near-duplicate (e.g. the same page in two copies
+# of a PDF, or a chunk already inside a merged passage).
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.9"))
+# A truncated passage shorter than this is dropped instead.
+_MIN_TRUNCATED_TOKENS = 32
+# Shortest text shared by the end of one chunk and the start of the next
+# for the two to count as overlapping splits of the same text.
+_MIN_OVERLAP_CHARS = 20
+_SEPARATOR = "\n\n"
+_WORD_RE = re.compile(r"\w+")
+
+
+@dataclass
+class Context:
+    text: str
+    chunks: int = 0
+    passages: int = 0
+    merged: int = 0
+    duplicates: int = 0
+    tokens: int = 0
+    truncated: bool = False
+
+    def summary(self) -> str:
+        trimmed = ", trimmed to budget" if self.truncated else ""
+        return (
+            f"{self.chunks} chunks -> {self.passages} passages, {self.tokens} tokens "
+            f"({self.merged} merged, {self.duplicates} duplicates dropped{trimmed})"
+        )
+
+
+@dataclass
+class _Passage:
+    rank: int
+    source: object
+    text: str
+
+
+def _encoding():
+    """tiktoken encoding, or None if it cannot be loaded (e.g. offline), in which case tokens are estimated."""
+    if not hasattr(_encoding, "_instance"):
+        try:
+            import tiktoken
+
+            _encoding._instance = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception as exc:
+            print(f"---CONTEXT: TIKTOKEN UNAVAILABLE, ESTIMATING TOKENS ({exc})---")
+            _encoding._instance = None
+    return _encoding._instance
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    encoding = _encoding()
+    if encoding is None:
+        return text[: max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of ``left`` that is a prefix of ``right``; 0 if shorter than _MIN_OVERLAP_CHARS."""
+    probe = right[:_MIN_OVERLAP_CHARS]
+    if len(probe) < _MIN_OVERLAP_CHARS:
+        return 0
+    position = left.find(probe)
+    while position != -1:
+        if right.startswith(left[position:]):
+            return len(left) - position
+        position = left.find(probe, position + 1)
+    return 0
+
+
+def _merge(left: str, right: str) -> str | None:
+    """``left`` and ``right`` joined without repeating their shared text, or None if they do not overlap."""
+    if right in left:
+        return left
+    if left in right:
+        return right
+    shared = _overlap(left, right)
+    if shared:
+        return left + right[shared:]
+    shared = _overlap(right, left)
+    if shared:
+        return right + left[shared:]
+    return None
+
+
+def _shingles(text: str) -> set[tuple[str, ...]]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < 3:
+        return {tuple(words)}
+    return {tuple(words[i : i + 3]) for i in range(len(words) - 2)}
+
+
+def _containment(candidate: set, other: set) -> float:
+    if not candidate:
+        return 0.0
+    return len(candidate & other) / len(candidate)
+
+
+def build_context(
+    documents: list,
+    max_tokens: int = CONTEXT_MAX_TOKENS,
+    dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD,
+) -> Context:
+    """Join retrieved chunks into one prompt context within ``max_tokens``.
+
+    ``documents`` are taken to be in relevance order. Chunks of the same
+    source that overlap (neighbouring splits share INDEX_CHUNK_OVERLAP
+    tokens) are merged into one passage ranked as its best chunk, passages
+    that nearly repeat a better one are dropped, and the rest are added best
+    first until the budget is reached; the passage that crosses it is cut.
+    """
+    context = Context(text="", chunks=len(documents))
+    passages: list[_Passage] = []
+    for rank, doc in enumerate(documents):
+        if isinstance(doc, Document):
+            text, source = doc.page_content.strip(), doc.metadata.get("source")
+        else:
+            text, source = str(doc).strip(), None
+        if not text:
+            continue
+        passage = _Passage(rank=rank, source=source, text=text)
+        # Merging can make a passage overlap another one, so keep merging until it stops growing.
+        merged = True
+        while merged:
+            merged = False
+            for other in passages:
+                if other is passage or other.source != passage.source or source is None:
+                    continue
+                joined = _merge(other.text, passage.text)
+                if joined is not None:
+                    other.text, other.rank = joined, min(other.rank, passage.rank)
+                    if passage in passages:
+                        passages.remove(passage)
+                    passage = other
+                    context.merged += 1
+                    merged = True
+                    break
+        if passage not in passages:
+            passages.append(passage)
+
+    passages.sort(key=lambda item: item.rank)
+    kept: list[tuple[_Passage, set]] = []
+    for passage in passages:
+        shingles = _shingles(passage.text)
+        if any(_containment(shingles, other) >= dedup_threshold for _, other in kept):
+            context.duplicates += 1
+            continue
+        kept.append((passage, shingles))
+
+    parts: list[str] = []
+    separator_tokens = count_tokens(_SEPARATOR)
+    for passage, _ in kept:
+        cost = count_tokens(passage.text) + (separator_tokens if parts else 0)
+        if max_tokens > 0 and context.tokens + cost > max_tokens:
+            remaining = max_tokens - context.tokens - (separator_tokens if parts else 0)
+            if remaining >= _MIN_TRUNCATED_TOKENS:
+                text = _truncate(passage.text, remaining)
+                parts.append(text)
+                context.tokens += count_tokens(text) + (separator_tokens if len(parts) > 1 else 0)
+            context.truncated = True
+            break
+        parts.append(passage.text)
+        context.tokens += cost
+
+    context.text = _SEPARATOR.join(parts)
+    context.passages = len(parts)
+    return context
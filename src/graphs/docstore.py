@@ -0,0 +1,110 @@
+# On-disk chunk store read lazily by the FAISS vectorstore
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """Chunk text and metadata in a read-only SQLite file, fetched per search hit.
+
+    Nothing is loaded up front, so startup cost and resident memory do not
+    grow with the corpus, and workers reading the same file share the OS
+    page cache. Incremental index updates go to an in-memory overlay, or to
+    attached files for large batches, until ``write_docstore`` replaces the
+    file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._connections = [self._open(self.path)]
+        self._added: dict[str, Document] = {}
+        self._deleted: set[str] = set()
+
+    @staticmethod
+    def _open(path: Path) -> sqlite3.Connection:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    def attach(self, path: Path) -> None:
+        """Also serve chunks from another file with the same schema (e.g. an ingestion spool)."""
+        with self._lock:
+            self._connections.append(self._open(Path(path)))
+
+    def _fetch(self, doc_id: str) -> Document | None:
+        with self._lock:
+            for connection in self._connections:
+                row = connection.execute(
+                    "select content, metadata from chunks where id = ?", (doc_id,)
+                ).fetchone()
+                if row is not None:
+                    return Document(id=doc_id, page_content=row[0], metadata=json.loads(row[1]))
+        return None
+
+    def search(self, search: str) -> Document | str:
+        doc = self._added.get(search)
+        if doc is None and search not in self._deleted:
+            doc = self._fetch(search)
+        if doc is None:
+            return f"ID {search} not found."
+        return doc
+
+    def add(self, texts: dict[str, Document]) -> None:
+        overlapping = [doc_id for doc_id in texts if isinstance(self.search(doc_id), Document)]
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        for doc_id, doc in texts.items():
+            self._deleted.discard(doc_id)
+            self._added[doc_id] = doc
+
+    def delete(self, ids: list) -> None:
+        missing = [doc_id for doc_id in ids if not isinstance(self.search(doc_id), Document)]
+        if missing:
+            raise ValueError(f"Tried to delete ids that does not exist: {missing}")
+        for doc_id in ids:
+            self._added.pop(doc_id, None)
+            self._deleted.add(doc_id)
+
+    def index_to_docstore_id(self) -> dict[int, str]:
+        """FAISS row -> chunk id, as stored when the file was written."""
+        with self._lock:
+            rows = self._connections[0].execute("select position, id from chunks order by position").fetchall()
+        return {position: doc_id for position, doc_id in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+
+
+def _rows(docstore: Docstore, index_to_docstore_id: dict[int, str]):
+    for position in range(len(index_to_docstore_id)):
+        doc_id = index_to_docstore_id[position]
+        doc = docstore.search(doc_id)
+        if not isinstance(doc, Document):
+            raise ValueError(f"Chunk {doc_id} is missing from the docstore.")
+        yield position, doc_id, doc.page_content, json.dumps(doc.metadata, default=str)
+
+
+def write_docstore(path: Path, docstore: Docstore, index_to_docstore_id: dict[int, str]) -> None:
+    """Write every chunk in FAISS row order to a new SQLite file and swap it in atomically."""
+    path = Path(path)
+    temp_path = path.with_name(f"{path.name}.tmp")
+    temp_path.unlink(missing_ok=True)
+    connection = sqlite3.connect(str(temp_path))
+    try:
+        connection.execute(
+            "create table chunks ("
+            "position integer primary key, id text not null unique, content text not null, metadata text not null)"
+        )
+        connection.executemany("insert into chunks values (?, ?, ?, ?)", _rows(docstore, index_to_docstore_id))
+        connection.commit()
+    finally:
+        connection.close()
+    # Readers keep the old file open until they reload, so the swap is safe
+    # while other workers are serving from it.
+    os.replace(temp_path, path)
@@ -0,0 +1,238 @@
+# Embedding providers and the persistent embedding cache
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.graphs.cache import LRUCache
+
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# "local" runs the ONNX export of the model on CPU; "huggingface" calls the
+# HuggingFace Inference API and needs HF_TOKEN.
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "local").strip().lower()
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_MAX_LENGTH = 256
+EMBEDDING_CACHE_FILE = "embedding_cache.sqlite3"
+# Query vectors are kept in memory only: questions rarely repeat verbatim and
+# should not grow (or be stored next to) the on-disk corpus cache.
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+
+
+def _data_dir() -> Path:
+    base = Path(os.path.dirname(os.path.dirname(__file__))) / "data"
+    base.mkdir(parents=True, exist_ok=True)
+    return base
+
+
+def _local_model_dir() -> Path:
+    configured = os.getenv("EMBEDDING_MODEL_DIR")
+    if configured:
+        return Path(configured)
+    return _data_dir() / "models" / EMBEDDING_MODEL.split("/")[-1]
+
+
+def resolve_onnx_model_files(model_name: str, model_dir: Path) -> tuple[Path, Path]:
+    """Paths to ``model.onnx`` and ``tokenizer.json`` for a Hub model, downloaded once into ``model_dir``."""
+    model_path = model_dir / "model.onnx"
+    tokenizer_path = model_dir / "tokenizer.json"
+    if model_path.exists() and tokenizer_path.exists():
+        return model_path, tokenizer_path
+
+    # First run: fetch the ONNX export from the Hub once and keep it local.
+    from huggingface_hub import hf_hub_download
+
+    model_dir.mkdir(parents=True, exist_ok=True)
+    downloaded_model = Path(hf_hub_download(model_name, "onnx/model.onnx"))
+    downloaded_tokenizer = Path(hf_hub_download(model_name, "tokenizer.json"))
+    model_path.write_bytes(downloaded_model.read_bytes())
+    tokenizer_path.write_bytes(downloaded_tokenizer.read_bytes())
+    print(f"---MODEL DOWNLOADED: {model_name}---")
+    return model_path, tokenizer_path
+
+
+class LocalOnnxEmbeddings(Embeddings):
+    """CPU inference for all-MiniLM-L6-v2 using onnxruntime and NumPy.
+
+    Texts are sorted by length and encoded in padded batches so each ONNX
+    run does as little padding work as possible; onnxruntime spreads each
+    batch across all cores.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, batch_size: int = EMBEDDING_BATCH_SIZE):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as exc:
+            raise ValueError(
+                "EMBEDDING_PROVIDER=local requires the onnxruntime and tokenizers packages."
+            ) from exc
+
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+
+        model_path, tokenizer_path = self._resolve_model_files(model_name)
+        self._tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self._tokenizer.enable_truncation(max_length=EMBEDDING_MAX_LENGTH)
+        self._tokenizer.no_padding()
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = int(os.getenv("EMBEDDING_THREADS", str(os.cpu_count() or 1)))
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(
+            str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {item.name for item in self._session.get_inputs()}
+
+    @staticmethod
+    def _resolve_model_files(model_name: str) -> tuple[Path, Path]:
+        return resolve_onnx_model_files(model_name, _local_model_dir())
+
+    def _encode_batch(self, texts: list[str]):
+        encodings = self._tokenizer.encode_batch(texts)
+        width = max(len(item.ids) for item in encodings)
+        input_ids = np.zeros((len(encodings), width), dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), width), dtype=np.int64)
+        for row, item in enumerate(encodings):
+            input_ids[row, : len(item.ids)] = item.ids
+            attention_mask[row, : len(item.attention_mask)] = item.attention_mask
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        token_embeddings = self._session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then L2 normalisation (as sentence-transformers does).
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = np.zeros((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            batch_ids = order[start : start + self.batch_size]
+            batch_vectors = self._encode_batch([texts[i] for i in batch_ids])
+            if vectors.shape[1] == 0:
+                vectors = np.zeros((len(texts), batch_vectors.shape[1]), dtype=np.float32)
+            vectors[batch_ids] = batch_vectors
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """Wrap an embeddings provider with an on-disk (model, text hash) cache.
+
+    Only texts that miss the cache are sent to the wrapped provider, in a
+    single batched call, so index rebuilds reuse vectors of unchanged chunks.
+    Query vectors go to a bounded in-memory LRU instead.
+    """
+
+    def __init__(self, underlying: Embeddings, model_key: str, cache_path: Path | None = None):
+        self.underlying = underlying
+        self.model_key = model_key
+        self._lock = threading.Lock()
+        self._queries = LRUCache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+        self._connection = sqlite3.connect(
+            str(cache_path or _data_dir() / EMBEDDING_CACHE_FILE),
+            check_same_thread=False,
+        )
+        with self._lock:
+            self._connection.execute(
+                "create table if not exists embeddings ("
+                "model text not null, text_hash text not null, vector blob not null, "
+                "primary key (model, text_hash))"
+            )
+            self._connection.commit()
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _lookup(self, hashes: list[str]) -> dict[str, list[float]]:
+        found: dict[str, list[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                chunk = unique[start : start + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                rows = self._connection.execute(
+                    f"select text_hash, vector from embeddings where model = ? and text_hash in ({placeholders})",
+                    (self.model_key, *chunk),
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def _store(self, items: dict[str, list[float]]) -> None:
+        if not items:
+            return
+        rows = [
+            (self.model_key, text_hash, np.asarray(vector, dtype=np.float32).tobytes())
+            for text_hash, vector in items.items()
+        ]
+        with self._lock:
+            self._connection.executemany(
+                "insert or replace into embeddings (model, text_hash, vector) values (?, ?, ?)",
+                rows,
+            )
+            self._connection.commit()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        hashes = [self._hash(text) for text in texts]
+        vectors = self._lookup(hashes)
+        missing = {text_hash: text for text_hash, text in zip(hashes, texts) if text_hash not in vectors}
+        if missing:
+            computed = self.underlying.embed_documents(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), computed))
+            self._store(new_vectors)
+            vectors.update(new_vectors)
+        return [vectors[text_hash] for text_hash in hashes]
+
+    def embed_query(self, text: str) -> list[float]:
+        vector = self._queries.get(text)
+        if vector is None:
+            vector = self.underlying.embed_query(text)
+            self._queries.set(text, vector)
+        return list(vector)
+
+
+def _make_provider() -> Embeddings:
+    if EMBEDDING_PROVIDER == "local":
+        return LocalOnnxEmbeddings(EMBEDDING_MODEL)
+    if EMBEDDING_PROVIDER == "huggingface":
+        # HuggingFace Endpoint (no local model files required)
+        from langchain_huggingface import HuggingFaceEndpointEmbeddings
+
+        hf_token = os.getenv("HF_TOKEN")
+        if not hf_token:
+            raise ValueError("HF_TOKEN environment variable is required for embeddings.")
+        return HuggingFaceEndpointEmbeddings(
+            model=EMBEDDING_MODEL,
+            task="feature-extraction",
+            huggingfacehub_api_token=hf_token,
+        )
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {EMBEDDING_PROVIDER!r} (expected 'local' or 'huggingface').")
+
+
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings() -> Embeddings:
+    """Return the process-wide cached embeddings for the configured provider."""
+    with _embeddings_lock:
+        if not hasattr(get_embeddings, "_instance"):
+            get_embeddings._instance = CachedEmbeddings(
+                _make_provider(),
+                model_key=f"{EMBEDDING_PROVIDER}:{EMBEDDING_MODEL}",
+            )
+    return get_embeddings._instance
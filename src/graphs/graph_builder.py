@@ -1,67 +1,261 @@
-
 # Index building and retriever setup
+import hashlib
 import json
+import math
 import os
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
 from pathlib import Path
+from uuid import uuid4
+
+import faiss
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are only serialized within one process
+    fcntl = None
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader, WebBaseLoader
+from langchain_community.document_loaders import WebBaseLoader
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEndpointEmbeddings
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from src.graphs.bm25 import BM25Index, reciprocal_rank_fusion
+from src.graphs.cache import LRUCache
+from src.graphs.collection_config import Collection, get_collection
+from src.graphs.context import TOKEN_ENCODING
+from src.graphs.docstore import SQLiteDocstore, write_docstore
+from src.graphs.ingestion import (
+    INGEST_BATCH_SIZE,
+    INGEST_MEMORY_LIMIT_BYTES,
+    INGEST_PROGRESS_EVERY,
+    ChunkSpool,
+    IngestionStats,
+    PdfJob,
+    parse_pdfs,
+)
+from src.graphs.metrics import BM25_SEARCH, EMBEDDING_DURATION, FAISS_SEARCH, INDEX_RELOADS, REGISTRY
+from src.graphs.embeddings import EMBEDDING_MODEL, EMBEDDING_PROVIDER, get_embeddings
 
 
-EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 INDEX_SIGNATURE_FILE = "index_signature.json"
-INDEX_SOURCE_URLS = [
-    "https://lilianweng.github.io/posts/2023-06-23-agent/",
-]
-DOCUMENTS_DIR_NAME = "documents"
+INDEX_MANIFEST_FILE = "index_manifest.json"
+INDEX_CENTROIDS_FILE = "index_centroids.json"
+INDEX_BM25_FILE = "index_bm25.json"
+INDEX_FAISS_FILE = "index.faiss"
+INDEX_DOCSTORE_FILE = "index_docstore.sqlite3"
+INDEX_LOCK_FILE = "index.lock"
 INDEX_CHUNK_SIZE = 500
 INDEX_CHUNK_OVERLAP = 50
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "2"))
+# "hybrid" fuses FAISS and BM25 rankings with reciprocal rank fusion; "dense" is FAISS only.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").strip().lower()
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Index structure, chosen at build time and recorded in the index signature:
+# flat (exact), ivf, ivfpq, ivfsq, hnsw, hnswsq, pq or sq. FAISS_INDEX_FACTORY
+# takes any faiss index_factory string instead.
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat").strip().lower()
+FAISS_INDEX_FACTORY = os.getenv("FAISS_INDEX_FACTORY", "").strip()
+FAISS_NLIST = int(os.getenv("FAISS_NLIST", "0"))  # 0: about 4 * sqrt(vectors)
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "48"))
+# Memory-map the saved index so workers share its pages through the OS cache.
+FAISS_MMAP = os.getenv("FAISS_MMAP", "true").strip().lower() in ("1", "true", "yes")
+# Search-time knobs, applied on load; they do not change the stored index.
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "8"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+# faiss warns below ~39 training points per IVF list.
+_MIN_POINTS_PER_LIST = 39
+# Seconds between checks of documents/ and the source URLs for changes; 0 disables the watcher.
+INDEX_WATCH_INTERVAL_SECONDS = float(os.getenv("INDEX_WATCH_INTERVAL_SECONDS", "30"))
+# Loaded collection indexes kept in memory; the least recently used are
+# evicted past either bound and reloaded from disk on their next request.
+LOADED_INDEXES_MAX = int(os.getenv("LOADED_INDEXES_MAX", "8"))
+LOADED_INDEXES_MAX_MB = int(os.getenv("LOADED_INDEXES_MAX_MB", "1024"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "512"))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "3600"))
+
+# (index version, normalized question, k, mode) -> top-k docstore ids.
+_retrieval_cache = LRUCache(maxsize=RETRIEVAL_CACHE_SIZE, ttl_seconds=RETRIEVAL_CACHE_TTL_SECONDS)
+
 
+def _index_signature_path(collection: Collection) -> Path:
+    return _index_dir(collection) / INDEX_SIGNATURE_FILE
 
-def _index_signature_path() -> Path:
-    return Path(_faiss_dir()) / INDEX_SIGNATURE_FILE
+
+def _index_manifest_path(collection: Collection) -> Path:
+    return _index_dir(collection) / INDEX_MANIFEST_FILE
+
+
+def _index_centroids_path(collection: Collection) -> Path:
+    return _index_dir(collection) / INDEX_CENTROIDS_FILE
+
+
+def _index_bm25_path(collection: Collection) -> Path:
+    return _index_dir(collection) / INDEX_BM25_FILE
+
+
+def _index_files(collection: Collection) -> dict:
+    """Names of the FAISS and docstore files the manifest published (one generation), or the legacy fixed names."""
+    try:
+        files = json.loads(_index_manifest_path(collection).read_text(encoding="utf-8")).get("files")
+    except Exception:
+        files = None
+    if isinstance(files, dict) and files.get("faiss") and files.get("docstore"):
+        return files
+    return {"faiss": INDEX_FAISS_FILE, "docstore": INDEX_DOCSTORE_FILE}
+
+
+def _index_faiss_path(collection: Collection, files: dict | None = None) -> Path:
+    return _index_dir(collection) / (files or _index_files(collection))["faiss"]
+
+
+def _index_docstore_path(collection: Collection, files: dict | None = None) -> Path:
+    return _index_dir(collection) / (files or _index_files(collection))["docstore"]
 
 
 def _expected_index_signature() -> dict:
+    # Settings that invalidate every vector when changed. Per-source state
+    # lives in the manifest so sources can be updated incrementally.
     return {
         "embedding_model": EMBEDDING_MODEL,
-        "urls": INDEX_SOURCE_URLS,
-        "pdf_files": _local_pdf_signature(),
+        "embedding_provider": EMBEDDING_PROVIDER,
         "chunk_size": INDEX_CHUNK_SIZE,
         "chunk_overlap": INDEX_CHUNK_OVERLAP,
+        "faiss_index": _index_config(),
     }
 
 
-def _documents_dir() -> Path:
-    return Path(__file__).resolve().parents[2] / DOCUMENTS_DIR_NAME
+def _index_config() -> dict:
+    if FAISS_INDEX_FACTORY:
+        return {"factory": FAISS_INDEX_FACTORY}
+    config = {"type": FAISS_INDEX_TYPE}
+    if FAISS_INDEX_TYPE.startswith("ivf"):
+        config["nlist"] = FAISS_NLIST or "auto"
+    if FAISS_INDEX_TYPE.startswith("hnsw"):
+        config["hnsw_m"] = FAISS_HNSW_M
+    if FAISS_INDEX_TYPE in ("ivfpq", "pq"):
+        config["pq_m"] = FAISS_PQ_M
+    return config
 
 
-def _local_pdf_files() -> list[Path]:
-    documents_dir = _documents_dir()
-    if not documents_dir.exists():
-        return []
-    return sorted(documents_dir.glob("*.pdf"))
+def _index_factory(count: int, dimension: int, index_type: str | None = None) -> str:
+    """faiss index_factory string for ``index_type`` (default: the configured one) over ``count`` vectors."""
+    if index_type is None and FAISS_INDEX_FACTORY:
+        return FAISS_INDEX_FACTORY
+    index_type = index_type or FAISS_INDEX_TYPE
+    nlist = FAISS_NLIST or int(4 * math.sqrt(max(count, 1)))
+    nlist = max(1, min(nlist, count // _MIN_POINTS_PER_LIST))
+    # PQ needs the dimension to split evenly into sub-quantizers.
+    pq_m = max(m for m in range(1, max(1, min(FAISS_PQ_M, dimension)) + 1) if dimension % m == 0)
+    factories = {
+        "flat": "Flat",
+        "ivf": f"IVF{nlist},Flat",
+        "ivfpq": f"IVF{nlist},PQ{pq_m}",
+        "ivfsq": f"IVF{nlist},SQ8",
+        "hnsw": f"HNSW{FAISS_HNSW_M}",
+        "hnswsq": f"HNSW{FAISS_HNSW_M},SQ8",
+        "pq": f"PQ{pq_m}",
+        "sq": "SQ8",
+    }
+    if index_type not in factories:
+        raise ValueError(f"Unknown FAISS_INDEX_TYPE: {index_type!r} (expected one of {', '.join(factories)}).")
+    return factories[index_type]
+
+
+def _incremental_updates_supported() -> bool:
+    # Flat indexes add and remove vectors in place; trained or graph indexes
+    # are rebuilt from the (cached) embeddings so their structure stays fresh.
+    return _index_factory(0, 1) == "Flat"
 
 
-def _local_pdf_signature() -> list[dict[str, str]]:
-    signature: list[dict[str, str]] = []
-    for pdf_path in _local_pdf_files():
+def prepare_index(index, nprobe: int | None = None, ef_search: int | None = None):
+    """Apply search-time parameters and enable ``reconstruct`` on IVF indexes."""
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except (RuntimeError, ValueError):
+        ivf = None
+    if ivf is not None:
+        ivf.nprobe = min(nprobe or FAISS_NPROBE, ivf.nlist)
+        ivf.make_direct_map()
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = ef_search or FAISS_EF_SEARCH
+    return index
+
+
+def new_index(vectors: np.ndarray, index_type: str | None = None, count: int | None = None):
+    """Empty faiss index trained on ``vectors`` (all vectors, or a sample of ``count``).
+
+    Small corpora fall back to Flat if training is impossible; see is_flat_fallback.
+    """
+    sample_size, dimension = vectors.shape
+    count = sample_size if count is None else count
+    factory = _index_factory(count, dimension, index_type)
+    index = faiss.index_factory(dimension, factory, faiss.METRIC_L2)
+    if not index.is_trained and sample_size < _min_training_points(factory):
+        print(f"---FAISS {factory}: {sample_size} VECTORS, NEEDS {_min_training_points(factory)} TO TRAIN, USING FLAT---")
+        index = faiss.IndexFlatL2(dimension)
+    elif not index.is_trained:
         try:
-            signature.append(
-                {
-                    "path": str(pdf_path.relative_to(Path(__file__).resolve().parents[2])),
-                    "mtime": str(pdf_path.stat().st_mtime_ns),
-                }
-            )
-        except Exception:
-            signature.append({"path": str(pdf_path), "mtime": "unknown"})
-    return signature
+            index.train(vectors)
+        except RuntimeError as exc:
+            print(f"---FAISS {factory}: CANNOT TRAIN ON {sample_size} VECTORS, USING FLAT ({exc})---")
+            index = faiss.IndexFlatL2(dimension)
+    return prepare_index(index)
+
+
+def _min_training_points(factory: str) -> int:
+    """Fewest vectors faiss can train ``factory`` on: k-means needs a point per centroid (nlist, and 2**nbits per PQ code)."""
+    minimum = 1
+    ivf = re.search(r"IVF(\d+)", factory)
+    if ivf:
+        minimum = max(minimum, int(ivf.group(1)))
+    pq = re.search(r"PQ\d+(?:x(\d+))?", factory)
+    if pq:
+        minimum = max(minimum, 2 ** int(pq.group(1) or 8))
+    return minimum
+
+
+def index_kind(index) -> str:
+    """faiss class actually built, e.g. ``IndexIVFPQ`` or ``IndexFlatL2``."""
+    return type(faiss.downcast_index(index)).__name__
+
+
+def is_flat_fallback(index, index_type: str | None = None) -> bool:
+    """True if ``index`` is the Flat stand-in new_index built because ``index_type`` could not be trained."""
+    return _index_factory(0, 1, index_type) != "Flat" and isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+
 
+def _project_root() -> Path:
+    return Path(__file__).resolve().parents[2]
 
-def _has_valid_signature() -> bool:
-    signature_path = _index_signature_path()
+
+def _local_pdf_files(collection: Collection) -> list[Path]:
+    if not collection.documents_dir.exists():
+        return []
+    return sorted(collection.documents_dir.glob("*.pdf"))
+
+
+def _pdf_source_key(pdf_path: Path) -> str:
+    try:
+        return pdf_path.relative_to(_project_root()).as_posix()
+    except ValueError:
+        return pdf_path.as_posix()
+
+
+def _text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _has_valid_signature(collection: Collection) -> bool:
+    signature_path = _index_signature_path(collection)
     if not signature_path.exists():
         return False
 
@@ -70,98 +264,764 @@ def _has_valid_signature() -> bool:
     except Exception:
         return False
 
+    current_signature.pop("built_index", None)
     return current_signature == _expected_index_signature()
 
 
-def _write_signature() -> None:
-    _index_signature_path().write_text(
-        json.dumps(_expected_index_signature(), indent=2),
+def _write_signature(collection: Collection, index) -> None:
+    # built_index records what was actually built, which differs from the
+    # configured faiss_index when training fell back to Flat.
+    _index_signature_path(collection).write_text(
+        json.dumps({**_expected_index_signature(), "built_index": index_kind(index)}, indent=2),
         encoding="utf-8",
     )
 
-# Set embeddings to use HuggingFace (free alternative)
-
-def _faiss_dir():
-    base = Path(os.path.dirname(os.path.dirname(__file__))) / "data" / "faiss_index"
-    base.mkdir(parents=True, exist_ok=True)
-    return str(base)
-
-def build_vectorstore_with_key(groq_api_key):
-    # Set embeddings to use HuggingFace Endpoint (no local PyTorch required)
-    hf_token = os.getenv("HF_TOKEN")
-    if not hf_token:
-        raise ValueError("HF_TOKEN environment variable is required for embeddings.")
-    
-    embd = HuggingFaceEndpointEmbeddings(
-        model=EMBEDDING_MODEL,
-        task="feature-extraction",
-        huggingfacehub_api_token=hf_token,
+
+def _load_manifest(collection: Collection) -> dict | None:
+    """Return the per-source manifest, or None if the index must be rebuilt."""
+    if not _has_valid_signature(collection):
+        return None
+    manifest_path = _index_manifest_path(collection)
+    if not manifest_path.exists():
+        return None
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if not isinstance(manifest.get("sources"), dict):
+        return None
+    return manifest
+
+
+def _write_manifest(collection: Collection, sources: dict, index, files: dict) -> None:
+    """Publish a saved index generation: the manifest names its files and is swapped in last, in one rename."""
+    manifest_path = _index_manifest_path(collection)
+    temp_path = manifest_path.with_name(f"{manifest_path.name}.tmp")
+    temp_path.write_text(json.dumps({"sources": sources, "files": files}, indent=2), encoding="utf-8")
+    os.replace(temp_path, manifest_path)
+    _write_signature(collection, index)
+    _remove_unpublished_files(collection, files)
+
+
+def _remove_unpublished_files(collection: Collection, files: dict) -> None:
+    # Runs under the build lock, which loads also take, so no reader is
+    # between reading the manifest and opening these; readers that already
+    # have an older generation open keep it until they reload.
+    stem, suffix = INDEX_FAISS_FILE.rsplit(".", 1)
+    docstore_stem, docstore_suffix = INDEX_DOCSTORE_FILE.rsplit(".", 1)
+    directory = _index_dir(collection)
+    candidates = [
+        *directory.glob(f"{stem}.*.{suffix}"),
+        *directory.glob(f"{docstore_stem}.*.{docstore_suffix}"),
+        directory / INDEX_FAISS_FILE,
+        directory / INDEX_DOCSTORE_FILE,
+        # Pickled docstore written by older versions of the index.
+        directory / "index.pkl",
+    ]
+    for path in candidates:
+        if path.name not in files.values():
+            path.unlink(missing_ok=True)
+
+
+def _index_version(sources: dict) -> str:
+    """Hash identifying the exact set of indexed chunks under the current settings."""
+    chunk_ids = sorted(chunk["id"] for entry in sources.values() for chunk in entry.get("chunks", []))
+    payload = json.dumps({"signature": _expected_index_signature(), "chunks": chunk_ids})
+    return _text_sha256(payload)
+
+
+def _index_dir(collection: Collection) -> Path:
+    collection.index_dir.mkdir(parents=True, exist_ok=True)
+    return collection.index_dir
+
+
+def _text_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name=TOKEN_ENCODING, chunk_size=INDEX_CHUNK_SIZE, chunk_overlap=INDEX_CHUNK_OVERLAP
     )
 
-    # Docs to index
-    urls = INDEX_SOURCE_URLS
-    pdf_files = _local_pdf_files()
 
-    # Load with a default USER_AGENT to avoid warnings
-    headers = {"User-Agent": os.getenv("USER_AGENT", "Adaptive-RAG-Streamlit/1.0")}
-    loader = WebBaseLoader(web_paths=urls, header_template=headers)
-    docs_list = loader.load()
+def _assign_chunk_ids(splits: list, previous_chunks: list[dict]) -> tuple[list[dict], list, list[str], list[str]]:
+    """Match new splits against a source's previous chunks by content hash.
+
+    Returns the new chunk entries, the splits that need embedding with their
+    ids, and the previous ids that no longer exist.
+    """
+    reusable: dict[str, list[str]] = {}
+    for chunk in previous_chunks:
+        reusable.setdefault(chunk["hash"], []).append(chunk["id"])
 
-    for pdf_path in pdf_files:
+    chunks: list[dict] = []
+    new_docs: list = []
+    new_ids: list[str] = []
+    for split in splits:
+        chunk_hash = _text_sha256(split.page_content)
+        if reusable.get(chunk_hash):
+            chunk_id = reusable[chunk_hash].pop(0)
+        else:
+            chunk_id = str(uuid4())
+            new_docs.append(split)
+            new_ids.append(chunk_id)
+        chunks.append({"id": chunk_id, "hash": chunk_hash})
+
+    stale_ids = [chunk_id for ids in reusable.values() for chunk_id in ids]
+    return chunks, new_docs, new_ids, stale_ids
+
+
+def _sync_sources(
+    collection: Collection, previous_sources: dict, stats: IngestionStats, spool: ChunkSpool
+) -> tuple[dict, list[str]]:
+    """Diff the collection's configured sources against its manifest.
+
+    Only sources that are new or whose content hash changed are fetched,
+    parsed and split; PDFs are parsed in a process pool. New chunks are
+    streamed into ``spool`` source by source. Returns (sources, stale_ids).
+    """
+    sources: dict = {}
+    stale_ids: list[str] = []
+
+    def _apply(key: str, entry: dict, splits: list) -> None:
+        chunks, new_docs, new_ids, removed = _assign_chunk_ids(
+            splits, previous_sources.get(key, {}).get("chunks", [])
+        )
+        entry["chunks"] = chunks
+        sources[key] = entry
+        spool.add(new_docs, new_ids)
+        stats.chunks += len(new_ids)
+        stale_ids.extend(removed)
+
+    # Web sources are keyed by URL and only fetched when first configured.
+    new_urls = [url for url in collection.source_urls if url not in previous_sources]
+    for url in collection.source_urls:
+        if url in previous_sources:
+            sources[url] = previous_sources[url]
+    if new_urls:
+        # Load with a default USER_AGENT to avoid warnings
+        headers = {"User-Agent": os.getenv("USER_AGENT", "Adaptive-RAG-Streamlit/1.0")}
+        with stats.stage("web"):
+            web_docs = WebBaseLoader(web_paths=new_urls, header_template=headers).load()
+        text_splitter = _text_splitter()
+        for url in new_urls:
+            url_docs = [doc for doc in web_docs if doc.metadata.get("source") == url]
+            if not url_docs:
+                print(f"---URL LOAD FAILED: {url}---")
+                continue
+            content_hash = _text_sha256("".join(doc.page_content for doc in url_docs))
+            with stats.stage("split"):
+                splits = text_splitter.split_documents(url_docs)
+            _apply(url, {"type": "url", "content_hash": content_hash}, splits)
+            print(f"---URL LOADED: {url}---")
+
+    # PDFs whose mtime and size are unchanged are not read at all; the rest
+    # are hashed, and re-parsed only if their bytes changed.
+    jobs: list[PdfJob] = []
+    stats_by_key: dict[str, os.stat_result] = {}
+    for pdf_path in _local_pdf_files(collection):
+        key = _pdf_source_key(pdf_path)
+        previous = previous_sources.get(key)
         try:
-            pdf_loader = PyPDFLoader(str(pdf_path))
-            docs_list.extend(pdf_loader.load())
-            print(f"---PDF LOADED: {pdf_path.name}---")
+            stat = pdf_path.stat()
         except Exception as exc:
             print(f"---PDF LOAD FAILED: {pdf_path.name}: {exc}---")
+            stats.files_failed[key] = str(exc)
+            if previous:
+                sources[key] = previous
+            continue
+        if previous and previous.get("mtime") == stat.st_mtime_ns and previous.get("size") == stat.st_size:
+            sources[key] = previous
+            continue
+        stats_by_key[key] = stat
+        jobs.append(
+            PdfJob(key=key, path=str(pdf_path), previous_hash=(previous or {}).get("content_hash"), size=stat.st_size)
+        )
+
+    for done, result in enumerate(parse_pdfs(jobs, INDEX_CHUNK_SIZE, INDEX_CHUNK_OVERLAP), start=1):
+        for stage, seconds in result.timings.items():
+            stats.add(stage, seconds)
+        key = result.key
+        previous = previous_sources.get(key)
+        name = Path(result.path).name
+        if result.error:
+            # The file keeps its previous chunks (if any) and is retried next sync.
+            print(f"---PDF LOAD FAILED: {name}: {result.error}---")
+            stats.files_failed[key] = result.error
+            if previous:
+                sources[key] = previous
+        else:
+            stat = stats_by_key[key]
+            entry = {"type": "pdf", "content_hash": result.content_hash, "mtime": stat.st_mtime_ns, "size": stat.st_size}
+            if result.splits is None:
+                sources[key] = {**previous, **entry}
+            else:
+                stats.files_parsed += 1
+                _apply(key, entry, result.splits)
+                print(f"---PDF {'UPDATED' if previous else 'LOADED'}: {name}---")
+        if len(jobs) > 1 and (done % INGEST_PROGRESS_EVERY == 0 or done == len(jobs)):
+            print(f"---INGEST PROGRESS: {done}/{len(jobs)} PDFs---")
+
+    for key, previous in previous_sources.items():
+        if key not in sources:
+            stale_ids.extend(chunk["id"] for chunk in previous.get("chunks", []))
+            print(f"---SOURCE REMOVED: {key}---")
+
+    return sources, stale_ids
+
 
-    # Split
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=INDEX_CHUNK_SIZE, chunk_overlap=INDEX_CHUNK_OVERLAP
+def _compute_topic_centroids(vectorstore: FAISS, sources: dict) -> dict[str, list[float]]:
+    """Unit-length mean vector of each source's chunks (one topic per URL/PDF).
+
+    Vectors are reconstructed in batches, so this never copies the whole index.
+    """
+    keys = list(sources)
+    topic_of = {chunk["id"]: topic for topic, key in enumerate(keys) for chunk in sources[key].get("chunks", [])}
+    ntotal = vectorstore.index.ntotal
+    sums = np.zeros((len(keys), vectorstore.index.d), dtype=np.float64)
+    counts = np.zeros(len(keys), dtype=np.int64)
+    for start in range(0, ntotal, INGEST_BATCH_SIZE):
+        count = min(INGEST_BATCH_SIZE, ntotal - start)
+        topics = np.asarray([topic_of.get(vectorstore.index_to_docstore_id.get(start + offset), -1) for offset in range(count)])
+        known = topics >= 0
+        if known.any():
+            vectors = vectorstore.index.reconstruct_n(start, count)
+            np.add.at(sums, topics[known], vectors[known])
+            np.add.at(counts, topics[known], 1)
+    centroids: dict[str, list[float]] = {}
+    for topic, key in enumerate(keys):
+        if counts[topic]:
+            centroid = sums[topic] / counts[topic]
+            centroids[key] = (centroid / max(float(np.linalg.norm(centroid)), 1e-12)).astype(np.float32).tolist()
+    return centroids
+
+
+def _topic_centroids(collection: Collection, vectorstore: FAISS, sources: dict, version: str) -> dict[str, list[float]]:
+    centroids_path = _index_centroids_path(collection)
+    try:
+        stored = json.loads(centroids_path.read_text(encoding="utf-8"))
+        if stored.get("version") == version:
+            return stored["centroids"]
+    except Exception:
+        pass
+
+    centroids = _compute_topic_centroids(vectorstore, sources)
+    try:
+        centroids_path.write_text(json.dumps({"version": version, "centroids": centroids}), encoding="utf-8")
+    except Exception:
+        print("---TOPIC CENTROIDS SAVE SKIPPED---")
+    return centroids
+
+
+def _lexical_index(collection: Collection, vectorstore: FAISS, version: str) -> BM25Index:
+    """BM25 index over the same chunks as the FAISS index, persisted under its version hash."""
+    bm25_path = _index_bm25_path(collection)
+    index = BM25Index.load(bm25_path, version)
+    if index is not None:
+        return index
+
+    doc_ids = [vectorstore.index_to_docstore_id[i] for i in range(len(vectorstore.index_to_docstore_id))]
+    # Chunks are streamed from the docstore; only the postings are kept.
+    texts = (
+        doc.page_content if isinstance(doc, Document) else ""
+        for doc in map(vectorstore.docstore.search, doc_ids)
     )
-    doc_splits = text_splitter.split_documents(docs_list)
+    index = BM25Index.build(doc_ids, texts)
+    try:
+        index.save(bm25_path, version)
+        print("---BM25 INDEX SAVED TO DISK---")
+    except Exception:
+        print("---BM25 INDEX SAVE SKIPPED---")
+    return index
+
+
+def _index_artifacts(collection: Collection, vectorstore: FAISS, sources: dict) -> tuple[FAISS, str, dict, BM25Index]:
+    version = _index_version(sources)
+    return (
+        vectorstore,
+        version,
+        _topic_centroids(collection, vectorstore, sources, version),
+        _lexical_index(collection, vectorstore, version),
+    )
+
 
-    if not doc_splits:
-        raise ValueError("No documents available to index from web sources or local PDFs.")
+def _training_sample(vectors: np.ndarray) -> np.ndarray:
+    """Random rows to train IVF/PQ/SQ on, capped at half the ingestion memory limit."""
+    limit = max(1, INGEST_MEMORY_LIMIT_BYTES // 2 // max(1, vectors.shape[1] * 4))
+    if len(vectors) <= limit:
+        return np.ascontiguousarray(vectors)
+    rows = np.sort(np.random.default_rng(0).choice(len(vectors), size=limit, replace=False))
+    return np.ascontiguousarray(vectors[rows])
+
+
+def _append_spooled_vectors(vectorstore: FAISS, spool: ChunkSpool) -> None:
+    vectors = spool.vectors()
+    start = len(vectorstore.index_to_docstore_id)
+    for offset, doc_id in enumerate(spool.ids()):
+        vectorstore.index_to_docstore_id[start + offset] = doc_id
+    for batch_start in range(0, len(vectors), INGEST_BATCH_SIZE):
+        vectorstore.index.add(np.ascontiguousarray(vectors[batch_start : batch_start + INGEST_BATCH_SIZE]))
+
+
+def _vectorstore_from_spool(embd, spool: ChunkSpool, stats: IngestionStats) -> FAISS:
+    """New index over every spooled chunk, trained on a sample and filled in batches."""
+    with stats.stage("index"):
+        vectorstore = FAISS(
+            embedding_function=embd,
+            index=new_index(_training_sample(spool.vectors()), count=spool.count),
+            docstore=SQLiteDocstore(spool.docstore_path),
+            index_to_docstore_id={},
+        )
+        _append_spooled_vectors(vectorstore, spool)
+    return vectorstore
 
-    # Add to vectorstore
-    # Try to load a cached index; if not present, build and save
-    index_dir = _faiss_dir()
-    if _has_valid_signature():
+
+def _update_vectorstore(
+    collection: Collection, vectorstore: FAISS, stale_ids: list[str], spool: ChunkSpool, stats: IngestionStats
+) -> list[str]:
+    """Remove stale chunks and append spooled ones in place (flat indexes); returns the stale ids that were indexed."""
+    vectorstore.index = _read_index(collection, mmap=False)
+    indexed_ids = set(vectorstore.index_to_docstore_id.values())
+    stale_ids = [chunk_id for chunk_id in stale_ids if chunk_id in indexed_ids]
+    with stats.stage("index"):
+        if stale_ids:
+            vectorstore.delete(stale_ids)
+        vectorstore.docstore.attach(spool.docstore_path)
+        _append_spooled_vectors(vectorstore, spool)
+    return stale_ids
+
+
+def _spool_kept_chunks(vectorstore: FAISS, stale_ids: list[str], spool: ChunkSpool) -> None:
+    """Stream the chunks that survive a sync into the spool so a trained index can be rebuilt (vectors come from the embedding cache)."""
+    stale = set(stale_ids)
+    for position in range(len(vectorstore.index_to_docstore_id)):
+        doc_id = vectorstore.index_to_docstore_id[position]
+        doc = vectorstore.docstore.search(doc_id)
+        if doc_id not in stale and isinstance(doc, Document):
+            spool.add([doc], [doc_id])
+    spool.flush()
+
+
+def _read_index(collection: Collection, mmap: bool = FAISS_MMAP, files: dict | None = None):
+    # A memory-mapped index is read-only: callers that add or remove vectors
+    # must read it with mmap=False.
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) if mmap else 0
+    return prepare_index(faiss.read_index(str(_index_faiss_path(collection, files)), flags))
+
+
+def _load_vectorstore(embd, collection: Collection) -> FAISS:
+    """Saved index with lazily read chunks; nothing is unpickled."""
+    # Both files come from the same manifest read, so they are one generation.
+    files = _index_files(collection)
+    docstore = SQLiteDocstore(_index_docstore_path(collection, files))
+    index = _read_index(collection, files=files)
+    index_to_docstore_id = docstore.index_to_docstore_id()
+    if index.ntotal != len(index_to_docstore_id):
+        docstore.close()
+        raise ValueError(f"{files['faiss']} and {files['docstore']} hold different chunk counts.")
+    return FAISS(
+        embedding_function=embd,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
+
+
+def _save_vectorstore(collection: Collection, vectorstore: FAISS) -> dict:
+    """Write the index and docstore as a new generation of files; nothing reads them until _write_manifest publishes them."""
+    generation = uuid4().hex[:12]
+    stem, suffix = INDEX_FAISS_FILE.rsplit(".", 1)
+    docstore_stem, docstore_suffix = INDEX_DOCSTORE_FILE.rsplit(".", 1)
+    files = {
+        "faiss": f"{stem}.{generation}.{suffix}",
+        "docstore": f"{docstore_stem}.{generation}.{docstore_suffix}",
+    }
+    faiss.write_index(vectorstore.index, str(_index_faiss_path(collection, files)))
+    write_docstore(_index_docstore_path(collection, files), vectorstore.docstore, vectorstore.index_to_docstore_id)
+    return files
+
+
+def _load_or_build_vectorstore(collection: Collection | None = None) -> tuple[FAISS, str, dict, BM25Index]:
+    collection = collection or get_collection()
+    # Local ONNX or HuggingFace Endpoint embeddings, behind the on-disk cache
+    embd = get_embeddings()
+
+    # Try to load the cached index first; sources are only touched if the
+    # manifest says they changed.
+    manifest = _load_manifest(collection)
+    vectorstore = None
+    if manifest is not None:
         try:
-            vectorstore = FAISS.load_local(index_dir, embd, allow_dangerous_deserialization=True)
+            vectorstore = _load_vectorstore(embd, collection)
             print("---VECTORSTORE LOADED FROM DISK---")
-            return vectorstore
         except Exception:
             print("---VECTORSTORE LOAD FAILED: REBUILDING---")
+            manifest = None
     else:
         print("---VECTORSTORE SIGNATURE MISMATCH: REBUILDING---")
 
-    vectorstore = FAISS.from_documents(
-        documents=doc_splits,
-        embedding=embd
-    )
+    previous_sources = manifest["sources"] if manifest else {}
+    stats = IngestionStats()
+    if not hasattr(_load_or_build_vectorstore, "last_stats"):
+        _load_or_build_vectorstore.last_stats = {}
+    _load_or_build_vectorstore.last_stats[collection.name] = stats
+    # New chunks are embedded in batches into an on-disk spool as sources are
+    # parsed, then added to the index from it; nothing holds the whole corpus.
+    spool = ChunkSpool(_index_dir(collection), embd, stats)
     try:
-        vectorstore.save_local(index_dir)
-        _write_signature()
-        print("---VECTORSTORE SAVED TO DISK---")
-    except Exception:
-        print("---VECTORSTORE SAVE SKIPPED---")
+        sources, stale_ids = _sync_sources(collection, previous_sources, stats, spool)
+        spool.flush()
 
-    return vectorstore
+        # Blank or image-only PDFs are sources that yield no chunks.
+        if not any(entry.get("chunks") for entry in sources.values()):
+            spool.remove()
+            raise ValueError(f"No documents available to index from web sources or local PDFs in collection {collection.name}.")
+
+        if vectorstore is None:
+            vectorstore = _vectorstore_from_spool(embd, spool, stats)
+        elif (stale_ids or spool.count) and not _incremental_updates_supported():
+            added = spool.count
+            _spool_kept_chunks(vectorstore, stale_ids, spool)
+            vectorstore = _vectorstore_from_spool(embd, spool, stats)
+            print(f"---VECTORSTORE REBUILT: +{added} / -{len(stale_ids)} CHUNKS---")
+        elif stale_ids or spool.count:
+            stale_ids = _update_vectorstore(collection, vectorstore, stale_ids, spool, stats)
+            print(f"---VECTORSTORE UPDATED: +{spool.count} / -{len(stale_ids)} CHUNKS---")
+        elif sources == previous_sources:
+            if stats.files_failed:
+                print(f"---INGEST SUMMARY: {stats.summary()}---")
+            spool.remove()
+            return _index_artifacts(collection, vectorstore, sources)
+
+        try:
+            with stats.stage("save"):
+                files = _save_vectorstore(collection, vectorstore)
+                _write_manifest(collection, sources, vectorstore.index, files)
+            print("---VECTORSTORE SAVED TO DISK---")
+        except Exception as exc:
+            # Keep serving from the spool files; the next sync recreates them.
+            print(f"---VECTORSTORE SAVE SKIPPED: {exc}---")
+        else:
+            # Serve from the saved files so the in-memory build can be freed.
+            vectorstore = _load_vectorstore(embd, collection)
+            spool.remove()
+    finally:
+        spool.close()
+
+    print(f"---INGEST SUMMARY: {stats.summary()}---")
+    return _index_artifacts(collection, vectorstore, sources)
+
+
+def get_ingestion_stats(collection: str | None = None) -> dict | None:
+    """Stage timings and per-file failures of the collection's last index sync in this process."""
+    stats = getattr(_load_or_build_vectorstore, "last_stats", {}).get(get_collection(collection).name)
+    return stats.to_dict() if stats else None
+
+
+@dataclass(frozen=True)
+class LoadedIndex:
+    """Everything a retrieval reads from one collection, swapped in and out as one object.
+
+    Readers take the current LoadedIndex once per request, so a reload never
+    pairs a new FAISS index with an old BM25 index or centroid set.
+    """
+
+    vectorstore: FAISS
+    version: str
+    centroids: np.ndarray
+    bm25: BM25Index
+    # _sources_fingerprint() taken just before the sync that produced it.
+    fingerprint: tuple
+    # Approximate resident size, used to bound the loaded-index LRU.
+    memory_bytes: int = 0
+
+
+# Collection name -> LoadedIndex. Requests that still hold an evicted index
+# finish on it; it is freed once they are done.
+_loaded_indexes = LRUCache(
+    maxsize=LOADED_INDEXES_MAX,
+    max_bytes=LOADED_INDEXES_MAX_MB * 1024 * 1024,
+    sizeof=lambda index: index.memory_bytes,
+)
+# One lock per collection guards its first load and serializes its builds
+# between threads; other collections keep serving meanwhile.
+_index_locks: dict[str, threading.RLock] = {}
+_index_locks_guard = threading.Lock()
+
+
+def _collection_lock(name: str) -> threading.RLock:
+    with _index_locks_guard:
+        return _index_locks.setdefault(name, threading.RLock())
+
+
+@contextmanager
+def _build_lock(collection: Collection):
+    """Serialize a collection's index syncs across threads and, through a lock file, across worker processes."""
+    with _collection_lock(collection.name), (_index_dir(collection) / INDEX_LOCK_FILE).open("a") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        yield
+
+
+def _sources_fingerprint(collection: Collection) -> tuple:
+    """Cheap change check: the configured URLs and each PDF's path, mtime and size."""
+    pdfs = []
+    for pdf_path in _local_pdf_files(collection):
+        try:
+            stat = pdf_path.stat()
+        except OSError:
+            continue
+        pdfs.append((_pdf_source_key(pdf_path), stat.st_mtime_ns, stat.st_size))
+    return collection.source_urls, tuple(pdfs)
+
+
+def _index_memory_bytes(collection: Collection, vectorstore: FAISS, centroids: np.ndarray, bm25: BM25Index) -> int:
+    """Approximate resident size of a loaded index: FAISS data plus the Python-side id map and BM25 postings."""
+    try:
+        index_bytes = _index_faiss_path(collection).stat().st_size
+    except OSError:
+        index_bytes = vectorstore.index.ntotal * vectorstore.index.d * 4
+    postings = sum(len(rows) for rows in bm25.postings.values())
+    # Roughly 120 bytes per small Python list/dict entry.
+    return index_bytes + centroids.nbytes + 120 * (postings + len(bm25.doc_ids) + len(vectorstore.index_to_docstore_id))
+
+
+def _load_index(collection: Collection) -> LoadedIndex:
+    # Fingerprint first, so files that change during the sync are picked up by the next check.
+    fingerprint = _sources_fingerprint(collection)
+    with _build_lock(collection):
+        vectorstore, version, centroids, bm25 = _load_or_build_vectorstore(collection)
+    centroids = np.asarray(list(centroids.values()), dtype=np.float32)
+    return LoadedIndex(
+        vectorstore=vectorstore,
+        version=version,
+        centroids=centroids,
+        bm25=bm25,
+        fingerprint=fingerprint,
+        memory_bytes=_index_memory_bytes(collection, vectorstore, centroids, bm25),
+    )
+
+
+def _current_index(collection: str | None = None) -> LoadedIndex:
+    """The index a collection's requests are served from.
 
+    The first caller loads or builds it (again after an eviction);
+    concurrent callers for the same collection wait for that one load.
+    """
+    collection = get_collection(collection)
+    index = _loaded_indexes.get(collection.name)
+    if index is None:
+        with _collection_lock(collection.name):
+            index = _loaded_indexes.peek(collection.name)
+            if index is None:
+                index = _load_index(collection)
+                _loaded_indexes.set(collection.name, index)
+                print(f"---INDEX LOADED: {collection.name} (~{index.memory_bytes / 1e6:.1f} MB)---")
+    return index
 
-def get_retriever(groq_api_key):
-    # Simple in-memory cache for vectorstores (embeddings don't need API key)
-    if not hasattr(get_retriever, "_cache"):
-        get_retriever._cache = {}
-    cache = get_retriever._cache
-    if "vectorstore" in cache:
-        vectorstore = cache["vectorstore"]
+
+def reload_index(collection: str | None = None, force: bool = False) -> bool:
+    """Sync a collection's index with its sources on the calling thread and swap it in if it changed.
+
+    Requests never wait for the sync: those that already hold the old
+    LoadedIndex finish on it and later ones get the new one. Returns whether
+    a new index was swapped in.
+    """
+    collection = get_collection(collection)
+    with _collection_lock(collection.name):
+        current = _current_index(collection.name)
+        if not force and _sources_fingerprint(collection) == current.fingerprint:
+            return False
+        index = _load_index(collection)
+        if index.version == current.version:
+            _loaded_indexes.set(collection.name, replace(current, fingerprint=index.fingerprint))
+            INDEX_RELOADS.inc(result="unchanged")
+            return False
+        _loaded_indexes.set(collection.name, index)
+    INDEX_RELOADS.inc(result="swapped")
+    print(f"---INDEX RELOADED: {collection.name} {current.version[:12]} -> {index.version[:12]}---")
+    return True
+
+
+class IndexWatcher:
+    """Daemon thread that polls the sources of loaded collections and hot-swaps their indexes when they change.
+
+    A change is acted on only once the fingerprint is the same on two
+    consecutive polls, so a PDF that is still being copied is not parsed
+    half-written. Collections that are not loaded are not watched; they are
+    synced when next loaded.
+    """
+
+    def __init__(self, interval: float = INDEX_WATCH_INTERVAL_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="index-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling; waits for a sync in progress so its files are fully written."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        pending: dict[str, tuple] = {}
+        while not self._stop.wait(self.interval):
+            for name, current in _loaded_indexes.items():
+                fingerprint = _sources_fingerprint(get_collection(name))
+                if fingerprint == current.fingerprint:
+                    pending.pop(name, None)
+                    continue
+                if fingerprint != pending.get(name):
+                    pending[name] = fingerprint
+                    print(f"---INDEX SOURCES CHANGED: {name}: RELOADING ONCE THEY SETTLE---")
+                    continue
+                pending.pop(name, None)
+                try:
+                    reload_index(name)
+                except Exception as exc:
+                    INDEX_RELOADS.inc(result="failed")
+                    print(f"---INDEX RELOAD FAILED: {name} (still serving the previous index): {exc}---")
+
+
+def start_index_watcher() -> None:
+    if not hasattr(start_index_watcher, "_instance"):
+        start_index_watcher._instance = IndexWatcher()
+    start_index_watcher._instance.start()
+
+
+def stop_index_watcher() -> None:
+    watcher = getattr(start_index_watcher, "_instance", None)
+    if watcher is not None:
+        watcher.stop()
+
+
+def get_vectorstore(collection: str | None = None):
+    return _current_index(collection).vectorstore
+
+
+def get_index_signature(collection: str | None = None) -> str | None:
+    """Version hash of the collection's loaded index, or None if it is not loaded."""
+    index = _loaded_indexes.peek(get_collection(collection).name)
+    return index.version if index is not None else None
+
+
+class HybridRetriever(BaseRetriever):
+    """LangChain retriever over ``retrieve_documents`` (hybrid or dense, per RETRIEVAL_MODE)."""
+
+    k: int = RETRIEVER_K
+    collection: str | None = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        documents, _ = retrieve_documents(query, k=self.k, collection=self.collection)
+        return documents
+
+
+def get_retriever(collection: str | None = None):
+    get_vectorstore(collection)
+    return HybridRetriever(k=RETRIEVER_K, collection=collection)
+
+
+def _normalize_query(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+def _hybrid_search(index: LoadedIndex, question: str, embedding: list[float], k: int) -> list:
+    """Fuse the dense and BM25 candidate rankings and return the top-k documents."""
+    vectorstore = index.vectorstore
+    candidates = max(k, HYBRID_CANDIDATES)
+    with FAISS_SEARCH.time(operation="similarity_search"):
+        dense = vectorstore.similarity_search_by_vector(embedding, k=candidates)
+    with BM25_SEARCH.time():
+        lexical = index.bm25.search(question, candidates)
+
+    dense_ids = [doc.id for doc in dense if doc.id]
+    by_id = {doc.id: doc for doc in dense if doc.id}
+    documents = []
+    for doc_id in reciprocal_rank_fusion([dense_ids, [doc_id for doc_id, _ in lexical]], k=RRF_K)[:k]:
+        doc = by_id.get(doc_id) or vectorstore.docstore.search(doc_id)
+        if isinstance(doc, Document):
+            documents.append(doc)
+    return documents
+
+
+def retrieve_documents(question: str, k: int = RETRIEVER_K, collection: str | None = None) -> tuple[list, bool]:
+    """Top-k documents for ``question``, served from the retrieval cache when possible.
+
+    Returns (documents, cache_hit). A hit skips both the query embedding and
+    the index searches; documents are re-read from the docstore by id.
+    """
+    # One LoadedIndex for the whole call, even if a reload swaps it meanwhile.
+    index = _current_index(collection)
+    vectorstore = index.vectorstore
+    # Keyed by index version, so entries from other collections or an older
+    # index are never served; they age out of the LRU.
+    key = (index.version, _normalize_query(question), k, RETRIEVAL_MODE)
+
+    cached_ids = _retrieval_cache.get(key)
+    if cached_ids is not None:
+        documents = [vectorstore.docstore.search(doc_id) for doc_id in cached_ids]
+        if all(isinstance(doc, Document) for doc in documents):
+            return documents, True
+        _retrieval_cache.pop(key)
+
+    with EMBEDDING_DURATION.time():
+        embedding = get_embeddings().embed_query(question)
+    if RETRIEVAL_MODE == "hybrid":
+        documents = _hybrid_search(index, question, embedding, k)
     else:
-        vectorstore = build_vectorstore_with_key(groq_api_key)
-        cache["vectorstore"] = vectorstore
-    return vectorstore.as_retriever(search_kwargs={"k": 2})
+        with FAISS_SEARCH.time(operation="similarity_search"):
+            documents = vectorstore.similarity_search_by_vector(embedding, k=k)
+    if all(doc.id for doc in documents):
+        _retrieval_cache.set(key, [doc.id for doc in documents])
+    return documents, False
+
+
+def route_scores(question: str, collection: str | None = None) -> tuple[float, float]:
+    """Cosine similarity of the question to its nearest chunk and to the collection's closest topic centroid."""
+    index = _current_index(collection)
+    vectorstore, centroids = index.vectorstore, index.centroids
+    with EMBEDDING_DURATION.time():
+        query = np.asarray(get_embeddings().embed_query(question), dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    nearest_score = 0.0
+    with FAISS_SEARCH.time(operation="route"):
+        _, positions = vectorstore.index.search(query[None, :], 1)
+    if positions[0][0] >= 0:
+        nearest = vectorstore.index.reconstruct(int(positions[0][0]))
+        nearest_score = float(nearest @ query) / max(float(np.linalg.norm(nearest)), 1e-12)
+
+    centroid_score = float((centroids @ query).max()) if len(centroids) else 0.0
+    return nearest_score, centroid_score
+
+
+def get_loaded_indexes() -> dict:
+    """Collections whose indexes are in memory (least recently used first) and the LRU's totals."""
+    return {
+        **_loaded_indexes.stats(),
+        "collections": {
+            name: {"version": index.version, "memory_bytes": index.memory_bytes}
+            for name, index in _loaded_indexes.items()
+        },
+    }
+
+
+def _retrieval_metrics():
+    stats = _retrieval_cache.stats()
+    yield ("rag_retrieval_cache_size", "gauge", "Entries in the retrieval cache.", {}, stats["size"])
+    yield ("rag_retrieval_cache_lookups_total", "counter", "Retrieval cache lookups by result.", {"result": "hit"}, stats["hits"])
+    yield ("rag_retrieval_cache_lookups_total", "counter", "Retrieval cache lookups by result.", {"result": "miss"}, stats["misses"])
+    loaded = _loaded_indexes.stats()
+    yield ("rag_loaded_indexes", "gauge", "Collection indexes held in memory.", {}, loaded["size"])
+    yield ("rag_loaded_index_bytes", "gauge", "Approximate memory of the loaded collection indexes.", {}, loaded["bytes"])
+    yield ("rag_loaded_index_evictions_total", "counter", "Collection indexes evicted from memory.", {}, loaded["evictions"])
+
+
+REGISTRY.register_collector(_retrieval_metrics)
 
 def get_graph_info():
-    return {"graph": "Vectorstore and retriever initialized."}
\ No newline at end of file
+    return {"graph": "Vectorstore and retriever initialized."}
@@ -0,0 +1,146 @@
+# Recall-vs-latency report for the FAISS index types
+"""Compare FAISS index types against the exact (Flat) baseline on the current corpus.
+
+Run from the project root:
+
+    python -m src.graphs.index_report --k 5 --queries 200
+    python -m src.graphs.index_report --types ivf,hnsw --questions questions.txt
+    python -m src.graphs.index_report --collection papers
+
+Queries are the given questions (one per line) or, by default, midpoints of
+random chunk pairs. For every type and search setting the report prints
+recall@k against Flat, per-query latency and index size.
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from src.graphs.collection_config import get_collection
+from src.graphs.embeddings import get_embeddings
+from src.graphs.graph_builder import _load_or_build_vectorstore, index_kind, is_flat_fallback, new_index, prepare_index
+
+
+DEFAULT_TYPES = ("flat", "ivf", "ivfsq", "ivfpq", "hnsw", "hnswsq", "sq", "pq")
+NPROBE_SWEEP = (1, 4, 8, 16, 32, 64)
+EF_SEARCH_SWEEP = (16, 32, 64, 128, 256)
+
+
+def _corpus_vectors(collection: str | None = None) -> np.ndarray:
+    vectorstore, _, _, _ = _load_or_build_vectorstore(get_collection(collection))
+    texts = [
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[position]).page_content
+        for position in range(len(vectorstore.index_to_docstore_id))
+    ]
+    # Exact vectors from the embedding cache, independent of any lossy index.
+    return np.asarray(get_embeddings().embed_documents(texts), dtype=np.float32)
+
+
+def _query_vectors(vectors: np.ndarray, count: int, questions_path: str | None, seed: int) -> np.ndarray:
+    if questions_path:
+        with open(questions_path, encoding="utf-8") as handle:
+            questions = [line.strip() for line in handle if line.strip()]
+        return np.asarray(get_embeddings().embed_documents(questions), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    pairs = rng.integers(0, len(vectors), size=(count, 2))
+    queries = (vectors[pairs[:, 0]] + vectors[pairs[:, 1]]) / 2.0
+    return queries / np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+
+
+def _search_settings(index) -> list[dict]:
+    try:
+        nlist = faiss.extract_index_ivf(index).nlist
+        return [{"nprobe": nprobe} for nprobe in NPROBE_SWEEP if nprobe <= nlist] or [{"nprobe": nlist}]
+    except (RuntimeError, ValueError):
+        pass
+    if getattr(faiss.downcast_index(index), "hnsw", None) is not None:
+        return [{"ef_search": ef_search} for ef_search in EF_SEARCH_SWEEP]
+    return [{}]
+
+
+def _measure(index, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Top-k positions and per-query latency (seconds), one query at a time as the API searches."""
+    positions = np.zeros((len(queries), k), dtype=np.int64)
+    latencies = np.zeros(len(queries))
+    for row, query in enumerate(queries):
+        started = time.perf_counter()
+        _, found = index.search(query[None, :], k)
+        latencies[row] = time.perf_counter() - started
+        positions[row] = found[0]
+    return positions, latencies
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row_found) & set(row_truth)) for row_found, row_truth in zip(found, truth))
+    return hits / truth.size
+
+
+def build_report(
+    types=DEFAULT_TYPES,
+    k: int = 5,
+    queries: int = 200,
+    questions_path: str | None = None,
+    seed: int = 0,
+    collection: str | None = None,
+) -> list[dict]:
+    vectors = _corpus_vectors(collection)
+    query_vectors = _query_vectors(vectors, queries, questions_path, seed)
+    k = min(k, len(vectors))
+
+    baseline = faiss.IndexFlatL2(vectors.shape[1])
+    baseline.add(vectors)
+    truth, _ = _measure(baseline, query_vectors, k)
+
+    rows = []
+    for index_type in types:
+        started = time.perf_counter()
+        index = new_index(vectors, index_type)
+        index.add(vectors)
+        build_seconds = time.perf_counter() - started
+        size_bytes = len(faiss.serialize_index(index))
+        for settings in _search_settings(index):
+            prepare_index(index, **settings)
+            found, latencies = _measure(index, query_vectors, k)
+            rows.append({
+                # A type that could not be trained on this corpus is measured as the Flat it fell back to.
+                "type": f"{index_type}->flat" if is_flat_fallback(index, index_type) else index_type,
+                "index": index_kind(index),
+                "settings": ",".join(f"{key}={value}" for key, value in settings.items()) or "-",
+                "recall": _recall(found, truth),
+                "p50_ms": float(np.percentile(latencies, 50) * 1000),
+                "p95_ms": float(np.percentile(latencies, 95) * 1000),
+                "build_s": build_seconds,
+                "size_mb": size_bytes / (1024 * 1024),
+            })
+    return rows
+
+
+def format_report(rows: list[dict], k: int) -> str:
+    header = f"{'type':<12} {'index':<24} {'search':<14} {'recall@' + str(k):>9} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8} {'size MB':>8}"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(
+            f"{row['type']:<12} {row['index']:<24} {row['settings']:<14} {row['recall']:>9.3f} "
+            f"{row['p50_ms']:>8.3f} {row['p95_ms']:>8.3f} {row['build_s']:>8.2f} {row['size_mb']:>8.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--types", default=",".join(DEFAULT_TYPES), help="comma-separated index types")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200, help="synthetic queries when --questions is not given")
+    parser.add_argument("--questions", help="file with one question per line")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--collection", help="named collection (default: DEFAULT_COLLECTION)")
+    args = parser.parse_args()
+
+    types = [item.strip().lower() for item in args.types.split(",") if item.strip()]
+    rows = build_report(types, k=args.k, queries=args.queries, questions_path=args.questions, seed=args.seed, collection=args.collection)
+    print(format_report(rows, args.k))
+
+
+if __name__ == "__main__":
+    main()
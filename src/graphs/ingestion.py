@@ -0,0 +1,265 @@
+# Parallel PDF parsing and chunking for index builds
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+
+# Worker processes for PDF parsing/splitting; 1 parses in-process.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+INGEST_PROGRESS_EVERY = int(os.getenv("INGEST_PROGRESS_EVERY", "10"))
+# Chunks embedded and appended per batch.
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+# Soft ceiling on what ingestion buffers in RAM: PDFs being parsed, chunk text
+# waiting to be embedded and the index training sample each get a share.
+INGEST_MEMORY_LIMIT_MB = int(os.getenv("INGEST_MEMORY_LIMIT_MB", "512"))
+INGEST_MEMORY_LIMIT_BYTES = INGEST_MEMORY_LIMIT_MB * 1024 * 1024
+
+
+@dataclass
+class PdfJob:
+    key: str
+    path: str
+    previous_hash: str | None = None
+    size: int = 0
+
+
+@dataclass
+class PdfResult:
+    key: str
+    path: str
+    content_hash: str | None = None
+    # None when the content hash matched and parsing was skipped.
+    splits: list | None = None
+    timings: dict[str, float] = field(default_factory=dict)
+    error: str | None = None
+
+
+@dataclass
+class IngestionStats:
+    """Per-stage time and per-file outcome of one index sync.
+
+    Worker stages (hash, parse, split) sum CPU time across processes, so
+    they can exceed the wall time when files are parsed in parallel.
+    """
+
+    stage_seconds: dict[str, float] = field(default_factory=dict)
+    files_parsed: int = 0
+    files_failed: dict[str, str] = field(default_factory=dict)
+    chunks: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def to_dict(self) -> dict:
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 3),
+            "stage_seconds": {name: round(seconds, 3) for name, seconds in self.stage_seconds.items()},
+            "files_parsed": self.files_parsed,
+            "files_failed": dict(self.files_failed),
+            "chunks": self.chunks,
+        }
+
+    def summary(self) -> str:
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.stage_seconds.items())
+        return (
+            f"{self.files_parsed} PDFs parsed, {len(self.files_failed)} failed, {self.chunks} new chunks "
+            f"in {time.perf_counter() - self.started:.2f}s ({stages or 'no work'})"
+        )
+
+
+def _text_splitter(chunk_size: int, chunk_overlap: int):
+    # One tokenizer-backed splitter per worker process.
+    key = (chunk_size, chunk_overlap)
+    if getattr(_text_splitter, "_key", None) != key:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        from src.graphs.context import TOKEN_ENCODING
+
+        _text_splitter._instance = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name=TOKEN_ENCODING, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+        _text_splitter._key = key
+    return _text_splitter._instance
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_pdf(job: PdfJob, chunk_size: int, chunk_overlap: int) -> PdfResult:
+    """Hash, parse and split one PDF; failures are returned, never raised."""
+    result = PdfResult(key=job.key, path=job.path)
+    stage = "hash"
+    try:
+        started = time.perf_counter()
+        result.content_hash = _file_sha256(Path(job.path))
+        result.timings["hash"] = time.perf_counter() - started
+        if result.content_hash == job.previous_hash:
+            return result
+
+        from langchain_community.document_loaders import PyPDFLoader
+
+        stage = "parse"
+        started = time.perf_counter()
+        pages = PyPDFLoader(job.path).load()
+        result.timings["parse"] = time.perf_counter() - started
+
+        stage = "split"
+        started = time.perf_counter()
+        result.splits = _text_splitter(chunk_size, chunk_overlap).split_documents(pages)
+        result.timings["split"] = time.perf_counter() - started
+    except Exception as exc:
+        result.error = f"{stage}: {type(exc).__name__}: {exc}"
+    return result
+
+
+def parse_pdfs(
+    jobs: list[PdfJob],
+    chunk_size: int,
+    chunk_overlap: int,
+    workers: int = INGEST_WORKERS,
+    max_inflight_bytes: int = INGEST_MEMORY_LIMIT_BYTES // 2,
+):
+    """Yield a PdfResult per job as files finish, using a process pool when there is more than one file.
+
+    Only a few files per worker are in flight at once (and no more than
+    ``max_inflight_bytes`` of PDF), so parsed pages never pile up faster
+    than the caller consumes them. A worker that dies (e.g. a parser crash)
+    only fails the files it had not finished; they are reported with an
+    error like any other failure.
+    """
+    workers = max(1, min(workers, len(jobs)))
+    if workers == 1:
+        for job in jobs:
+            yield parse_pdf(job, chunk_size, chunk_overlap)
+        return
+
+    remaining = iter(jobs)
+    # spawn: the server process has threads (uvicorn, onnxruntime) that fork would copy mid-state.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as executor:
+        pending = {}
+        inflight_bytes = 0
+        while True:
+            while len(pending) < workers * 2 and (not pending or inflight_bytes < max_inflight_bytes):
+                job = next(remaining, None)
+                if job is None:
+                    break
+                pending[executor.submit(parse_pdf, job, chunk_size, chunk_overlap)] = job
+                inflight_bytes += job.size
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = pending.pop(future)
+                inflight_bytes -= job.size
+                try:
+                    yield future.result()
+                except BrokenProcessPool as exc:
+                    yield PdfResult(key=job.key, path=job.path, error=f"worker crashed: {exc}")
+                except Exception as exc:
+                    yield PdfResult(key=job.key, path=job.path, error=f"{type(exc).__name__}: {exc}")
+
+
+class ChunkSpool:
+    """Append-only on-disk buffer of chunks headed for the index.
+
+    Chunks are embedded in batches as they arrive; text and metadata go to a
+    SQLite file with the docstore schema and vectors to a raw float32 file,
+    so RAM holds at most one batch no matter how large the corpus is. The
+    index is then built or extended from ``vectors()`` in batches.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        embeddings,
+        stats: IngestionStats,
+        batch_size: int = INGEST_BATCH_SIZE,
+        max_buffer_bytes: int = INGEST_MEMORY_LIMIT_BYTES // 8,
+    ):
+        self.docstore_path = Path(directory) / "spool_docstore.sqlite3"
+        self.vectors_path = Path(directory) / "spool_vectors.f32"
+        self.embeddings = embeddings
+        self.stats = stats
+        self.batch_size = max(1, batch_size)
+        self.max_buffer_bytes = max_buffer_bytes
+        self.count = 0
+        self.dimension: int | None = None
+        self._pending: list[tuple[str, object]] = []
+        self._pending_bytes = 0
+        self.remove()
+        self._connection = sqlite3.connect(str(self.docstore_path))
+        self._connection.execute(
+            "create table chunks ("
+            "position integer primary key, id text not null unique, content text not null, metadata text not null)"
+        )
+
+    def add(self, documents: list, ids: list[str]) -> None:
+        for doc, doc_id in zip(documents, ids):
+            self._pending.append((doc_id, doc))
+            self._pending_bytes += len(doc.page_content)
+            if len(self._pending) >= self.batch_size or self._pending_bytes >= self.max_buffer_bytes:
+                self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending, self._pending_bytes = self._pending, [], 0
+        with self.stats.stage("embed"):
+            vectors = np.asarray(
+                self.embeddings.embed_documents([doc.page_content for _, doc in batch]), dtype=np.float32
+            )
+        with self.stats.stage("spool"):
+            self.dimension = vectors.shape[1]
+            with self.vectors_path.open("ab") as handle:
+                handle.write(vectors.tobytes())
+            self._connection.executemany(
+                "insert into chunks values (?, ?, ?, ?)",
+                [
+                    (self.count + offset, doc_id, doc.page_content, json.dumps(doc.metadata, default=str))
+                    for offset, (doc_id, doc) in enumerate(batch)
+                ],
+            )
+            self._connection.commit()
+        self.count += len(batch)
+
+    def ids(self) -> list[str]:
+        return [row[0] for row in self._connection.execute("select id from chunks order by position")]
+
+    def vectors(self) -> np.ndarray:
+        """All spooled vectors, memory-mapped read-only."""
+        if not self.count:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dimension))
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def remove(self) -> None:
+        if hasattr(self, "_connection"):
+            self.close()
+        self.docstore_path.unlink(missing_ok=True)
+        self.vectors_path.unlink(missing_ok=True)
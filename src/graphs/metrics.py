@@ -0,0 +1,257 @@
+# In-process metrics rendered in the Prometheus text exposition format
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in series:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+# A collector returns (name, type, help, labels, value) samples computed at
+# scrape time from state the app already keeps (cache stats, pool sizes).
+Sample = tuple[str, str, str, dict[str, Any], float]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: list[Counter | Histogram] = []
+        self._collectors: list[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), **options) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, **options)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        lines: list[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        described: set[str] = set()
+        for collector in collectors:
+            try:
+                samples = list(collector())
+            except Exception:
+                continue
+            for name, metric_type, documentation, labels, value in samples:
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {documentation}")
+                    lines.append(f"# TYPE {name} {metric_type}")
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+NODE_DURATION = REGISTRY.histogram(
+    "rag_node_duration_seconds", "Time spent in each graph node and routing/grading edge.", ("node", "kind")
+)
+LLM_CALLS = REGISTRY.counter("rag_llm_calls_total", "LLM calls by model and outcome.", ("model", "status"))
+LLM_LATENCY = REGISTRY.histogram("rag_llm_call_duration_seconds", "LLM call latency by model.", ("model",))
+LLM_TOKENS = REGISTRY.counter("rag_llm_tokens_total", "LLM tokens by model and direction.", ("model", "type"))
+EMBEDDING_DURATION = REGISTRY.histogram(
+    "rag_query_embedding_seconds", "Time to embed a query.", buckets=FAST_BUCKETS
+)
+FAISS_SEARCH = REGISTRY.histogram(
+    "rag_faiss_search_seconds", "FAISS index search time.", ("operation",), buckets=FAST_BUCKETS
+)
+BM25_SEARCH = REGISTRY.histogram(
+    "rag_bm25_search_seconds", "BM25 lexical index search time.", buckets=FAST_BUCKETS
+)
+RERANK_DURATION = REGISTRY.histogram(
+    "rag_rerank_seconds", "Local reranker scoring time per retrieval.", ("mode",)
+)
+RERANK_DECISIONS = REGISTRY.counter(
+    "rag_rerank_decisions_total", "Retrieved chunks by grading path: accepted, rejected or sent to the LLM grader.", ("path",)
+)
+CONTEXT_TOKENS = REGISTRY.histogram(
+    "rag_context_tokens",
+    "Tokens of retrieved context sent to the generator.",
+    buckets=(128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+INDEX_RELOADS = REGISTRY.counter(
+    "rag_index_reloads_total", "Background index syncs by result: swapped, unchanged or failed.", ("result",)
+)
+CHAT_STORE_QUERY = REGISTRY.histogram(
+    "rag_chat_store_query_seconds", "Chat store operation latency.", ("operation", "status"), buckets=FAST_BUCKETS
+)
+CHAT_STORE_WRITE_BEHIND_ROWS = REGISTRY.counter(
+    "rag_chat_store_write_behind_rows_total",
+    "Write-behind rows by kind and outcome: written, requeued or dead_lettered.",
+    ("kind", "result"),
+)
+REQUEST_DURATION = REGISTRY.histogram(
+    "rag_request_duration_seconds", "End-to-end chat request latency.", ("endpoint",)
+)
+STREAM_TTFT = REGISTRY.histogram(
+    "rag_stream_time_to_first_token_seconds", "Time from /chat/stream request to the first answer token."
+)
+
+
+def llm_token_usage(response) -> dict[str, int]:
+    """input/output/total token counts from an LLMResult."""
+    usage: dict[str, int] = {}
+    for generations in response.generations or []:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            for key in ("input_tokens", "output_tokens", "total_tokens"):
+                usage[key] = usage.get(key, 0) + int(metadata.get(key) or 0)
+    if not usage.get("total_tokens"):
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        usage = {
+            "input_tokens": int(token_usage.get("prompt_tokens") or 0),
+            "output_tokens": int(token_usage.get("completion_tokens") or 0),
+            "total_tokens": int(token_usage.get("total_tokens") or 0),
+        }
+    return usage
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """Counts, times and token-meters every call made through one pooled client."""
+
+    run_inline = True
+
+    def __init__(self, model: str):
+        self.model = model
+        self._started: dict[Any, float] = {}
+        self._lock = threading.Lock()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self.on_llm_start(serialized, messages, run_id=run_id)
+
+    def _elapsed(self, run_id) -> float | None:
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        return None if started is None else time.perf_counter() - started
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        elapsed = self._elapsed(run_id)
+        if elapsed is not None:
+            LLM_LATENCY.observe(elapsed, model=self.model)
+        LLM_CALLS.inc(model=self.model, status="ok")
+        usage = llm_token_usage(response)
+        LLM_TOKENS.inc(usage.get("input_tokens", 0), model=self.model, type="input")
+        LLM_TOKENS.inc(usage.get("output_tokens", 0), model=self.model, type="output")
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        elapsed = self._elapsed(run_id)
+        if elapsed is not None:
+            LLM_LATENCY.observe(elapsed, model=self.model)
+        LLM_CALLS.inc(model=self.model, status="error")
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,156 @@
+# Local relevance scoring of retrieved chunks before LLM grading
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from src.graphs.embeddings import _data_dir, get_embeddings, resolve_onnx_model_files
+from src.graphs.metrics import RERANK_DURATION
+
+
+RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANKER_MAX_LENGTH = 512
+# "cross_encoder": ONNX ms-marco cross-encoder on CPU (sigmoid of its logit).
+# "embedding": cosine similarity of cached chunk and query embeddings.
+# "off": no local scoring, every chunk goes to the LLM grader.
+RERANKER_MODE = os.getenv("RERANKER_MODE", "cross_encoder").strip().lower()
+RERANKER_BATCH_SIZE = int(os.getenv("RERANKER_BATCH_SIZE", "16"))
+
+# (accept, reject) defaults per scorer: chunks at or above accept skip the LLM
+# grader as relevant, chunks at or below reject are dropped without it.
+_DEFAULT_THRESHOLDS = {"cross_encoder": (0.85, 0.02), "embedding": (0.6, 0.15)}
+
+
+def _thresholds(mode: str) -> tuple[float, float]:
+    accept, reject = _DEFAULT_THRESHOLDS.get(mode, (1.0, 0.0))
+    return (
+        float(os.getenv("RERANKER_ACCEPT_SCORE", str(accept))),
+        float(os.getenv("RERANKER_REJECT_SCORE", str(reject))),
+    )
+
+
+def _reranker_model_dir() -> Path:
+    configured = os.getenv("RERANKER_MODEL_DIR")
+    if configured:
+        return Path(configured)
+    return _data_dir() / "models" / RERANKER_MODEL.split("/")[-1]
+
+
+class LocalCrossEncoder:
+    """CPU inference for the ms-marco MiniLM cross-encoder using onnxruntime.
+
+    Each (question, chunk) pair is encoded jointly; pairs are scored in
+    padded batches and the logit is squashed to a 0-1 relevance score.
+    """
+
+    def __init__(self, model_name: str = RERANKER_MODEL, batch_size: int = RERANKER_BATCH_SIZE):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        model_path, tokenizer_path = resolve_onnx_model_files(model_name, _reranker_model_dir())
+        self._tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self._tokenizer.enable_truncation(max_length=RERANKER_MAX_LENGTH)
+        self._tokenizer.no_padding()
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = int(os.getenv("EMBEDDING_THREADS", str(os.cpu_count() or 1)))
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(
+            str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {item.name for item in self._session.get_inputs()}
+
+    def _score_batch(self, question: str, texts: list[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch([(question, text) for text in texts])
+        width = max(len(item.ids) for item in encodings)
+        input_ids = np.zeros((len(encodings), width), dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), width), dtype=np.int64)
+        token_type_ids = np.zeros((len(encodings), width), dtype=np.int64)
+        for row, item in enumerate(encodings):
+            input_ids[row, : len(item.ids)] = item.ids
+            attention_mask[row, : len(item.attention_mask)] = item.attention_mask
+            token_type_ids[row, : len(item.type_ids)] = item.type_ids
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = token_type_ids
+        logits = np.asarray(self._session.run(None, feeds)[0], dtype=np.float32).reshape(len(texts), -1)[:, 0]
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def score(self, question: str, texts: list[str]) -> list[float]:
+        scores = np.zeros(len(texts), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), self.batch_size):
+            batch_ids = order[start : start + self.batch_size]
+            scores[batch_ids] = self._score_batch(question, [texts[i] for i in batch_ids])
+        return scores.tolist()
+
+
+def _embedding_scores(question: str, texts: list[str]) -> list[float]:
+    # Chunk vectors come from the embedding cache filled at indexing time.
+    embeddings = get_embeddings()
+    query = np.asarray(embeddings.embed_query(question), dtype=np.float32)
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1) * max(float(np.linalg.norm(query)), 1e-12)
+    return (vectors @ query / np.clip(norms, 1e-12, None)).tolist()
+
+
+class Reranker:
+    """Scores chunks locally and splits them into accept / reject / ambiguous bands."""
+
+    def __init__(self, mode: str, cross_encoder: LocalCrossEncoder | None = None):
+        self.mode = mode
+        self.accept_score, self.reject_score = _thresholds(mode)
+        self._cross_encoder = cross_encoder
+
+    def score(self, question: str, texts: list[str]) -> list[float]:
+        if self.mode == "off" or not texts:
+            return [0.0] * len(texts)
+        with RERANK_DURATION.time(mode=self.mode):
+            if self.mode == "cross_encoder":
+                return self._cross_encoder.score(question, texts)
+            return _embedding_scores(question, texts)
+
+    def rerank(self, question: str, documents: list) -> list[tuple[object, float]]:
+        """(document, score) pairs, highest score first; order is unchanged when scoring is off."""
+        texts = [getattr(d, "page_content", str(d)) for d in documents]
+        scored = list(zip(documents, self.score(question, texts)))
+        if self.mode == "off":
+            return scored
+        return sorted(scored, key=lambda item: item[1], reverse=True)
+
+    def split(self, scored: list[tuple[object, float]]) -> tuple[list, list, list]:
+        """(accepted, rejected, ambiguous) documents, each in score order."""
+        if self.mode == "off":
+            return [], [], [doc for doc, _ in scored]
+        accepted, rejected, ambiguous = [], [], []
+        for doc, score in scored:
+            if score >= self.accept_score:
+                accepted.append(doc)
+            elif score <= self.reject_score:
+                rejected.append(doc)
+            else:
+                ambiguous.append(doc)
+        return accepted, rejected, ambiguous
+
+
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Reranker:
+    """Process-wide reranker; falls back to embedding scores if the cross-encoder cannot load."""
+    with _reranker_lock:
+        if not hasattr(get_reranker, "_instance"):
+            mode = RERANKER_MODE if RERANKER_MODE in ("cross_encoder", "embedding", "off") else "off"
+            cross_encoder = None
+            if mode == "cross_encoder":
+                try:
+                    cross_encoder = LocalCrossEncoder()
+                except Exception as exc:
+                    print(f"---RERANKER LOAD FAILED: USING EMBEDDING SCORES ({exc})---")
+                    mode = "embedding"
+            get_reranker._instance = Reranker(mode, cross_encoder)
+    return get_reranker._instance
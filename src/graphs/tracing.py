@@ -0,0 +1,170 @@
+# Per-request trace of graph steps
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+from typing import Any
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.graphs.metrics import NODE_DURATION, llm_token_usage
+
+
+@dataclass
+class TraceEvent:
+    """One traced step: a graph node, an edge decision or a short-circuit."""
+
+    name: str
+    kind: str = "node"
+    started_at: float = field(default_factory=time.time)
+    ended_at: float | None = None
+    duration_ms: float | None = None
+    decision: str | None = None
+    notes: list[str] = field(default_factory=list)
+    token_usage: dict[str, int] = field(default_factory=dict)
+    error: str | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class TraceCollector:
+    """Finished events for one request, in completion order."""
+
+    def __init__(self):
+        self._events: list[TraceEvent] = []
+        self._lock = threading.Lock()
+
+    def add(self, event: TraceEvent) -> None:
+        with self._lock:
+            self._events.append(event)
+
+    def events_since(self, index: int) -> list[TraceEvent]:
+        with self._lock:
+            return self._events[index:]
+
+    def to_list(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [event.to_dict() for event in self._events]
+
+
+# Context vars follow the request into asyncio tasks, asyncio.to_thread and
+# LangChain's ContextThreadPoolExecutor, so concurrent requests never mix.
+_current_trace: contextvars.ContextVar[TraceCollector | None] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[TraceEvent | None] = contextvars.ContextVar("current_span", default=None)
+_usage_lock = threading.Lock()
+
+
+@contextmanager
+def collect_trace():
+    collector = TraceCollector()
+    token = _current_trace.set(collector)
+    try:
+        yield collector
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name: str, kind: str = "node"):
+    trace = _current_trace.get()
+    event = TraceEvent(name=name, kind=kind)
+    token = _current_span.set(event)
+    started = time.perf_counter()
+    try:
+        yield event
+    except BaseException as exc:
+        event.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        _current_span.reset(token)
+        elapsed = time.perf_counter() - started
+        event.ended_at = time.time()
+        event.duration_ms = round(elapsed * 1000, 3)
+        NODE_DURATION.observe(elapsed, node=name, kind=kind)
+        if trace is not None:
+            trace.add(event)
+
+
+def record(name: str, kind: str, decision: str | None = None) -> TraceEvent:
+    """Add an instantaneous event (e.g. a cache hit) to the current trace."""
+    event = TraceEvent(name=name, kind=kind, decision=decision, duration_ms=0.0)
+    event.ended_at = event.started_at
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(event)
+    return event
+
+
+def log_step(message: str) -> None:
+    """Attach a note to the running span; printed when nothing is tracing (scripts, notebooks)."""
+    event = _current_span.get()
+    if event is None or _current_trace.get() is None:
+        print(f"---{message.upper()}---")
+        return
+    event.notes.append(message)
+
+
+def step_lines(events: list[dict[str, Any]]) -> list[str]:
+    """Trace events as the ``---STEP---`` lines /chat returned in ``steps`` before the structured trace."""
+    lines: list[str] = []
+    for event in events:
+        heading = event["name"].replace("_", " ").upper()
+        if event.get("decision"):
+            heading += f" ({event['decision'].upper()})"
+        lines.append(f"---{heading}---")
+        lines.extend(f"---{note.upper()}---" for note in event.get("notes", []))
+    return lines
+
+
+def set_decision(decision: str) -> None:
+    event = _current_span.get()
+    if event is not None:
+        event.decision = decision
+
+
+def traced(func, name: str, kind: str = "node"):
+    """Wrap a graph node or edge function in a span; string results become the decision."""
+
+    @wraps(func)
+    def wrapper(state):
+        with span(name, kind) as event:
+            result = func(state)
+            if isinstance(result, str):
+                event.decision = result
+            return result
+
+    return wrapper
+
+
+def atraced(func, name: str, kind: str = "node"):
+    @wraps(func)
+    async def wrapper(state):
+        with span(name, kind) as event:
+            result = await func(state)
+            if isinstance(result, str):
+                event.decision = result
+            return result
+
+    return wrapper
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """Adds each LLM call's token usage to the span it ran under."""
+
+    run_inline = True
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        event = _current_span.get()
+        if event is None:
+            return
+        usage = llm_token_usage(response)
+        with _usage_lock:
+            event.token_usage["llm_calls"] = event.token_usage.get("llm_calls", 0) + 1
+            for key, value in usage.items():
+                event.token_usage[key] = event.token_usage.get(key, 0) + value
+
+
+token_usage_callback = TokenUsageCallback()
@@ -1,8 +1,96 @@
 
+import hashlib
+import os
+import threading
+
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_groq import ChatGroq
 
+from src.graphs.cache import LRUCache
+from src.graphs.metrics import REGISTRY, LLMMetricsCallback
+from src.graphs.tracing import token_usage_callback
+
+RAG_MODEL = "openai/gpt-oss-20b"
+# API keys whose clients and chains are kept warm.
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "64"))
+
+# Pre-built ChatGroq clients and chains, grouped by API key hash and keyed
+# within a group by (kind, name/model, options). Reusing a client reuses its
+# HTTP connection pool, so warm requests skip object construction and TLS
+# handshakes. A key's objects are evicted together, so chains never push out
+# their own clients and one user's objects never push out another's.
+_llm_pool = LRUCache(maxsize=LLM_POOL_SIZE)
+_llm_pool_lock = threading.Lock()
+_llm_pool_counts = {"hits": 0, "misses": 0}
+
+
+def _api_key_fingerprint(groq_api_key: str | None) -> str:
+    return hashlib.sha256((groq_api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _pooled(groq_api_key: str | None, key, factory):
+    fingerprint = _api_key_fingerprint(groq_api_key)
+    objects = _llm_pool.get(fingerprint)
+    if objects is None:
+        with _llm_pool_lock:
+            objects = _llm_pool.peek(fingerprint)
+            if objects is None:
+                objects = {}
+                _llm_pool.set(fingerprint, objects)
+    value = objects.get(key)
+    with _llm_pool_lock:
+        _llm_pool_counts["hits" if value is not None else "misses"] += 1
+    if value is None:
+        # Built without holding the lock, so a slow construction only delays
+        # its own caller; if two callers race, the first insert wins.
+        value = objects.setdefault(key, factory())
+    return value
+
+
+def get_chat_model(model: str, groq_api_key: str, **options) -> ChatGroq:
+    """Shared temperature-0 ChatGroq client for this model, key and options."""
+    key = ("model", model, tuple(sorted(options.items())))
+    return _pooled(groq_api_key, key, lambda: ChatGroq(
+        model=model,
+        temperature=0,
+        groq_api_key=groq_api_key,
+        callbacks=[token_usage_callback, LLMMetricsCallback(model)],
+        **options,
+    ))
+
+
+def get_chain(name: str, build, model: str, groq_api_key: str, **options):
+    """Shared runnable ``build(llm)`` for the pooled client; built once per key."""
+    key = ("chain", name, model, tuple(sorted(options.items())))
+    return _pooled(groq_api_key, key, lambda: build(get_chat_model(model, groq_api_key, **options)))
+
+
+def get_llm_pool_stats() -> dict:
+    groups = [objects for _, objects in _llm_pool.items()]
+    with _llm_pool_lock:
+        counts = dict(_llm_pool_counts)
+    return {
+        "keys": len(groups),
+        "max_keys": _llm_pool.maxsize,
+        "size": sum(len(objects) for objects in groups),
+        "key_evictions": _llm_pool.evictions,
+        **counts,
+    }
+
+
+def _pool_metrics():
+    stats = get_llm_pool_stats()
+    yield ("rag_llm_pool_size", "gauge", "Pooled ChatGroq clients and chains.", {}, stats["size"])
+    yield ("rag_llm_pool_keys", "gauge", "API keys with pooled clients and chains.", {}, stats["keys"])
+    yield ("rag_llm_pool_key_evictions_total", "counter", "API keys evicted from the LLM pool.", {}, stats["key_evictions"])
+    yield ("rag_llm_pool_lookups_total", "counter", "LLM pool lookups by result.", {"result": "hit"}, stats["hits"])
+    yield ("rag_llm_pool_lookups_total", "counter", "LLM pool lookups by result.", {"result": "miss"}, stats["misses"])
+
+
+REGISTRY.register_collector(_pool_metrics)
+
+
 # Prompt for RAG
 prompt = ChatPromptTemplate.from_messages([
     (
@@ -18,13 +106,8 @@ prompt = ChatPromptTemplate.from_messages([
 ])
 
 def make_rag_chain(groq_api_key: str):
-    """Construct a RAG chain bound to the provided Groq API key."""
-    llm = ChatGroq(model="openai/gpt-oss-20b", temperature=0, groq_api_key=groq_api_key)
-    return prompt | llm | StrOutputParser()
-
-# Post-processing
-def format_docs(docs):
-    return "\n\n".join(doc.page_content for doc in docs)
+    """Return the (pooled) RAG chain bound to the provided Groq API key."""
+    return get_chain("rag", lambda llm: prompt | llm | StrOutputParser(), RAG_MODEL, groq_api_key)
 
 def get_llm_info():
-    return {"llm": "Groq Chat model (openai/gpt-oss-20b) used via make_rag_chain(groq_api_key)."}
\ No newline at end of file
+    return {"llm": f"Groq Chat model ({RAG_MODEL}) used via make_rag_chain(groq_api_key)."}
\ No newline at end of file
@@ -1,14 +1,130 @@
-from src.graphs.graph_builder import get_retriever
-from src.llms.llm import make_rag_chain, format_docs
-from langchain_core.documents import Document
+from src.graphs.answer_cache import is_history_dependent
+from src.graphs.context import build_context
+from src.graphs.graph_builder import retrieve_documents, route_scores
+from src.graphs.metrics import CONTEXT_TOKENS, RERANK_DECISIONS
+from src.graphs.reranker import get_reranker
+from src.graphs.tracing import log_step, set_decision
+from src.llms.llm import make_rag_chain, get_chain
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 from pydantic import BaseModel, Field
 from typing import Literal
+import asyncio
+import os
+
+GRADER_MODEL = "llama-3.1-8b-instant"
+GRADER_MAX_CONCURRENCY = int(os.getenv("GRADER_MAX_CONCURRENCY", "8"))
+GRADER_TIMEOUT_SECONDS = float(os.getenv("GRADER_TIMEOUT_SECONDS", "20"))
+# "per_document": one grader call per chunk (run concurrently).
+# "batched": one structured-output call for all chunks, falling back to per_document.
+GRADER_MODE = os.getenv("GRADER_MODE", "per_document").strip().lower()
+# "hybrid": decide from embedding similarity to the corpus and only ask the
+# LLM router inside the uncertain band; "llm": always ask the LLM router.
+ROUTER_MODE = os.getenv("ROUTER_MODE", "hybrid").strip().lower()
+ROUTER_ACCEPT_SCORE = float(os.getenv("ROUTER_ACCEPT_SCORE", "0.55"))
+ROUTER_REJECT_SCORE = float(os.getenv("ROUTER_REJECT_SCORE", "0.15"))
+
+# Shared pool for running the post-generation graders side by side. It
+# copies context vars so LangChain callbacks still reach the graders.
+_grader_executor = ContextThreadPoolExecutor(
+    max_workers=int(os.getenv("GRADER_POOL_SIZE", "16")),
+    thread_name_prefix="grader",
+)
+
+
+# --- PROMPTS AND OUTPUT SCHEMAS ---
+# Built once at import; the pooled chains in src.llms.llm bind them to a client.
+class GradeDocuments(BaseModel):
+    binary_score: str = Field(description="Documents are relevant to the question, 'yes' or 'no'")
+
+
+class GradeDocumentsBatch(BaseModel):
+    scores: list[str] = Field(
+        description="One 'yes' or 'no' per document, in the same order as the documents were given"
+    )
+
+
+class RouteQuery(BaseModel):
+    datasource: Literal["vectorstore", "human_escalation"] = Field(
+        ..., description="Choose to route to vectorstore or human escalation."
+    )
+
+
+class GradeHallucinations(BaseModel):
+    binary_score: str = Field(description="Answer is grounded in the facts, 'yes' or 'no'")
+
+
+class GradeAnswer(BaseModel):
+    binary_score: str = Field(description="Answer addresses the question, 'yes' or 'no'")
+
+
+grade_prompt = ChatPromptTemplate.from_messages([
+    (
+        "system",
+        "You are a grader assessing relevance of a retrieved document to a user question.\n "
+        "If the document contains keyword(s) or semantic meaning related to the user question, grade it as relevant.\n"
+        "It does not need to be a stringent test. The goal is to filter out erroneous retrievals.\n"
+        "Give a binary score 'yes' or 'no' to indicate whether the document is relevant to the question."
+    ),
+    ("human", "Retrieved document:\n\n {document} \n\n User question: {question}"),
+])
+
+batch_grade_prompt = ChatPromptTemplate.from_messages([
+    (
+        "system",
+        "You are a grader assessing relevance of retrieved documents to a user question.\n "
+        "If a document contains keyword(s) or semantic meaning related to the user question, grade it as relevant.\n"
+        "It does not need to be a stringent test. The goal is to filter out erroneous retrievals.\n"
+        "Return exactly one binary score 'yes' or 'no' per document, in document order."
+    ),
+    ("human", "Retrieved documents ({count}):\n\n{documents}\n\nUser question: {question}"),
+])
+
+re_write_prompt = ChatPromptTemplate.from_messages([
+    (
+        "system",
+        "You are a question re-writer that converts an input question to a better version optimized for vectorstore retrieval.\n "
+        "Look at the input and reason about the underlying semantic intent/meaning."
+        "If the question references terms like 'it' or 'they', refer to the chat history to resolve them contextually."
+    ),
+    ("human", "Chat History:\n{chat_history}\n\nHere is the initial question:\n\n {question} \n Formulate an improved question."),
+])
+
+route_prompt = ChatPromptTemplate.from_messages([
+    (
+        "system",
+        "You are an expert router for a RAG system that can use vectorstore retrieval or escalate to humans."
+        "The vectorstore contains documents related to agents, prompt engineering, and adversarial attacks."
+        "Use vectorstore only for those topics."
+        "If the question is outside this scope, time-sensitive, policy-sensitive, or likely to need expert judgment,"
+        "route to human_escalation."
+    ),
+    ("human", "Chat history:\n{chat_history}\n\nQuestion: {question}"),
+])
+
+hallucination_prompt = ChatPromptTemplate.from_messages([
+    ("system", "You are a grader assessing whether an LLM generation is grounded in a set of retrieved facts. Give 'yes' or 'no'."),
+    ("human", "Set of facts:\n\n {documents} \n\n LLM generation: {generation}"),
+])
+
+answer_prompt = ChatPromptTemplate.from_messages([
+    ("system", "You are a grader assessing whether an answer addresses/resolves a question. Give 'yes' or 'no'."),
+    ("human", "User question:\n\n {question} \n\n LLM generation: {generation}"),
+])
+
+
+def _structured_chain(name, chain_prompt, schema, groq_api_key, **options):
+    return get_chain(
+        name,
+        lambda llm: chain_prompt | llm.with_structured_output(schema),
+        GRADER_MODEL,
+        groq_api_key,
+        **options,
+    )
+
 
 def human_escalation(state):
-    print("---HUMAN ESCALATION---")
     question = state["question"]
     reason = state.get("escalation_reason")
     if not reason:
@@ -33,15 +149,14 @@ def human_escalation(state):
     }
 
 
+async def ahuman_escalation(state):
+    return human_escalation(state)
+
+
 # Node: retrieve
-def retrieve(state):
-    print("---RETRIEVE---")
-    question = state["question"]
-    groq_api_key = state.get("groq_api_key")
-    if not groq_api_key:
-        raise ValueError("Groq API key is required.")
-    retriever = get_retriever(groq_api_key)
-    documents = retriever.invoke(question)
+def _retrieve_result(state, question, groq_api_key, documents, cache_hit):
+    set_decision("cache hit" if cache_hit else "searched")
+    log_step(f"{len(documents)} documents retrieved")
     return {
         "documents": documents,
         "question": question,
@@ -53,34 +168,54 @@ def retrieve(state):
     }
 
 
+def retrieve(state):
+    question = state["question"]
+    groq_api_key = state.get("groq_api_key")
+    if not groq_api_key:
+        raise ValueError("Groq API key is required.")
+    documents, cache_hit = retrieve_documents(question, collection=state.get("collection"))
+    return _retrieve_result(state, question, groq_api_key, documents, cache_hit)
+
 
-# Node: generate
-def generate(state):
-    print("---GENERATE---")
+async def aretrieve(state):
     question = state["question"]
-    documents = state["documents"]
     groq_api_key = state.get("groq_api_key")
     if not groq_api_key:
-        raise ValueError("Groq API key is required for generation.")
-    # Normalize documents to text context
-    if isinstance(documents, list):
-        if documents and isinstance(documents[0], Document):
-            context_text = format_docs(documents)
-        else:
-            context_text = "\n\n".join(str(d) for d in documents)
-    elif isinstance(documents, Document):
-        context_text = documents.page_content
-    else:
-        context_text = str(documents)
+        raise ValueError("Groq API key is required.")
+    # FAISS search and local embedding are CPU-bound; keep them off the event loop.
+    documents, cache_hit = await asyncio.to_thread(
+        retrieve_documents, question, collection=state.get("collection")
+    )
+    return _retrieve_result(state, question, groq_api_key, documents, cache_hit)
 
-    generation = make_rag_chain(groq_api_key).invoke({
-        "context": context_text,
-        "question": question,
+
+# Node: generate
+def _documents_context(documents):
+    # Generation and the hallucination grader see the same merged, deduplicated
+    # and token-budgeted context.
+    if not isinstance(documents, list):
+        documents = [documents]
+    return build_context(documents)
+
+
+def _generate_inputs(state):
+    groq_api_key = state.get("groq_api_key")
+    if not groq_api_key:
+        raise ValueError("Groq API key is required for generation.")
+    context = _documents_context(state["documents"])
+    CONTEXT_TOKENS.observe(context.tokens)
+    log_step(f"context: {context.summary()}")
+    return groq_api_key, {
+        "context": context.text,
+        "question": state["question"],
         "chat_history": state.get("chat_history", "")
-    })
+    }
+
+
+def _generate_result(state, groq_api_key, generation):
     return {
-        "documents": documents,
-        "question": question,
+        "documents": state["documents"],
+        "question": state["question"],
         "generation": generation,
         "groq_api_key": groq_api_key,
         "retrieval_attempts": state.get("retrieval_attempts", 0),
@@ -90,182 +225,344 @@ def generate(state):
     }
 
 
+def generate(state):
+    groq_api_key, inputs = _generate_inputs(state)
+    generation = make_rag_chain(groq_api_key).invoke(inputs)
+    return _generate_result(state, groq_api_key, generation)
+
+
+async def agenerate(state):
+    groq_api_key, inputs = _generate_inputs(state)
+    generation = await make_rag_chain(groq_api_key).ainvoke(inputs)
+    return _generate_result(state, groq_api_key, generation)
+
+
 # --- ADAPTIVE RAG NODES ---
-def grade_documents(state):
-    print("---CHECK DOCUMENT RELEVANCE TO QUESTION---")
-    question = state["question"]
-    documents = state["documents"]
-    groq_api_key = state.get("groq_api_key")
+def _batch_grader(groq_api_key, question, documents):
+    batch_grader = _structured_chain(
+        "batch_retrieval_grader", batch_grade_prompt, GradeDocumentsBatch, groq_api_key,
+        timeout=GRADER_TIMEOUT_SECONDS,
+    )
+    documents_text = "\n\n".join(
+        f'<document index="{i}">\n{getattr(d, "page_content", str(d))}\n</document>'
+        for i, d in enumerate(documents, start=1)
+    )
+    return batch_grader, {"question": question, "documents": documents_text, "count": len(documents)}
 
-    class GradeDocuments(BaseModel):
-        binary_score: str = Field(description="Documents are relevant to the question, 'yes' or 'no'")
 
-    llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0, groq_api_key=groq_api_key)
-    system = (
-        "You are a grader assessing relevance of a retrieved document to a user question.\n "
-        "If the document contains keyword(s) or semantic meaning related to the user question, grade it as relevant.\n"
-        "It does not need to be a stringent test. The goal is to filter out erroneous retrievals.\n"
-        "Give a binary score 'yes' or 'no' to indicate whether the document is relevant to the question."
+def _batch_scores(result, documents):
+    """Per-document yes/no list from a batched grade; None means fall back to per-document grading."""
+    scores = [str(score).strip().lower() for score in (getattr(result, "scores", None) or [])]
+    if len(scores) != len(documents) or any(score not in ("yes", "no") for score in scores):
+        log_step(f"batched grading returned {len(scores)} scores for {len(documents)} documents, falling back")
+        return None
+    return scores
+
+
+def _grade_documents_in_one_call(groq_api_key, question, documents):
+    """Grade all documents with a single LLM call; None means fall back to per-document grading."""
+    batch_grader, inputs = _batch_grader(groq_api_key, question, documents)
+    try:
+        result = batch_grader.invoke(inputs)
+    except Exception as exc:
+        log_step(f"batched grading failed, falling back: {exc}")
+        return None
+    return _batch_scores(result, documents)
+
+
+async def _agrade_documents_in_one_call(groq_api_key, question, documents):
+    batch_grader, inputs = _batch_grader(groq_api_key, question, documents)
+    try:
+        result = await batch_grader.ainvoke(inputs)
+    except Exception as exc:
+        log_step(f"batched grading failed, falling back: {exc}")
+        return None
+    return _batch_scores(result, documents)
+
+
+def _retrieval_grader(groq_api_key, question, documents):
+    retrieval_grader = _structured_chain(
+        "retrieval_grader", grade_prompt, GradeDocuments, groq_api_key,
+        timeout=GRADER_TIMEOUT_SECONDS,
     )
-    grade_prompt = ChatPromptTemplate.from_messages([
-        ("system", system),
-        ("human", "Retrieved document:\n\n {document} \n\n User question: {question}"),
-    ])
-    retrieval_grader = grade_prompt | llm.with_structured_output(GradeDocuments)
-
-    filtered_docs = []
-    for d in documents:
-        score = retrieval_grader.invoke({"question": question, "document": getattr(d, "page_content", str(d))})
-        if getattr(score, "binary_score", "no") == "yes":
-            print("---GRADE: DOCUMENT RELEVANT---")
+    inputs = [{"question": question, "document": getattr(d, "page_content", str(d))} for d in documents]
+    return retrieval_grader, inputs
+
+
+def _per_document_scores(results):
+    return [
+        result if isinstance(result, Exception) else getattr(result, "binary_score", "no")
+        for result in results
+    ]
+
+
+def _rerank_gate(question, documents):
+    """Score chunks locally; returns (accepted, ambiguous) in score order and drops clear rejects."""
+    reranker = get_reranker()
+    accepted, rejected, ambiguous = reranker.split(reranker.rerank(question, documents))
+    RERANK_DECISIONS.inc(len(accepted), path="accepted")
+    RERANK_DECISIONS.inc(len(rejected), path="rejected")
+    RERANK_DECISIONS.inc(len(ambiguous), path="llm")
+    if reranker.mode != "off":
+        log_step(
+            f"reranker ({reranker.mode}): {len(accepted)} accepted, {len(rejected)} rejected, "
+            f"{len(ambiguous)} sent to the LLM grader"
+        )
+    return accepted, ambiguous
+
+
+def _graded_result(state, accepted, ambiguous, scores):
+    filtered_docs = list(accepted)
+    for d, score in zip(ambiguous, scores):
+        if isinstance(score, Exception):
+            log_step(f"document grading failed: {score}")
+        elif score == "yes":
             filtered_docs.append(d)
-        else:
-            print("---GRADE: DOCUMENT NOT RELEVANT---")
+    set_decision(f"{len(filtered_docs)}/{len(state['documents'])} relevant")
     return {
         "documents": filtered_docs,
-        "question": question,
-        "groq_api_key": groq_api_key,
+        "question": state["question"],
+        "groq_api_key": state.get("groq_api_key"),
         "retrieval_attempts": state.get("retrieval_attempts", 0),
         "generation_attempts": state.get("generation_attempts", 0),
         "escalated": state.get("escalated", False),
         "escalation_reason": state.get("escalation_reason", ""),
     }
 
-def transform_query(state):
-    print("---TRANSFORM QUERY---")
+
+def _llm_grade(groq_api_key, question, documents):
+    if not documents:
+        return []
+    if GRADER_MODE == "batched" and len(documents) > 1:
+        scores = _grade_documents_in_one_call(groq_api_key, question, documents)
+        if scores is not None:
+            return scores
+    # Grade every document concurrently; batch() keeps results in input order.
+    retrieval_grader, inputs = _retrieval_grader(groq_api_key, question, documents)
+    results = retrieval_grader.batch(
+        inputs,
+        config={"max_concurrency": GRADER_MAX_CONCURRENCY},
+        return_exceptions=True,
+    )
+    return _per_document_scores(results)
+
+
+async def _allm_grade(groq_api_key, question, documents):
+    if not documents:
+        return []
+    if GRADER_MODE == "batched" and len(documents) > 1:
+        scores = await _agrade_documents_in_one_call(groq_api_key, question, documents)
+        if scores is not None:
+            return scores
+    retrieval_grader, inputs = _retrieval_grader(groq_api_key, question, documents)
+    results = await retrieval_grader.abatch(
+        inputs,
+        config={"max_concurrency": GRADER_MAX_CONCURRENCY},
+        return_exceptions=True,
+    )
+    return _per_document_scores(results)
+
+
+def grade_documents(state):
     question = state["question"]
-    documents = state["documents"]
     groq_api_key = state.get("groq_api_key")
-    llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0, groq_api_key=groq_api_key)
-    system = (
-        "You are a question re-writer that converts an input question to a better version optimized for vectorstore retrieval.\n "
-        "Look at the input and reason about the underlying semantic intent/meaning."
-        "If the question references terms like 'it' or 'they', refer to the chat history to resolve them contextually."
+
+    # Only chunks in the reranker's uncertain band cost an LLM call.
+    accepted, ambiguous = _rerank_gate(question, state["documents"])
+    scores = _llm_grade(groq_api_key, question, ambiguous)
+    return _graded_result(state, accepted, ambiguous, scores)
+
+
+async def agrade_documents(state):
+    question = state["question"]
+    groq_api_key = state.get("groq_api_key")
+
+    accepted, ambiguous = await asyncio.to_thread(_rerank_gate, question, state["documents"])
+    scores = await _allm_grade(groq_api_key, question, ambiguous)
+    return _graded_result(state, accepted, ambiguous, scores)
+
+
+def _question_rewriter(groq_api_key):
+    return get_chain(
+        "question_rewriter", lambda llm: re_write_prompt | llm | StrOutputParser(), GRADER_MODEL, groq_api_key
     )
-    re_write_prompt = ChatPromptTemplate.from_messages([
-        ("system", system),
-        ("human", "Chat History:\n{chat_history}\n\nHere is the initial question:\n\n {question} \n Formulate an improved question."),
-    ])
-    question_rewriter = re_write_prompt | llm | StrOutputParser()
-    better_question = question_rewriter.invoke({
-        "question": question,
-        "chat_history": state.get("chat_history", "")
-    })
+
+
+def _transform_result(state, better_question):
+    log_step(f"rewritten question: {better_question}")
     return {
-        "documents": documents,
+        "documents": state["documents"],
         "question": better_question,
-        "groq_api_key": groq_api_key,
+        "groq_api_key": state.get("groq_api_key"),
         "retrieval_attempts": state.get("retrieval_attempts", 0) + 1,
         "generation_attempts": state.get("generation_attempts", 0),
         "escalated": state.get("escalated", False),
         "escalation_reason": state.get("escalation_reason", ""),
     }
 
+
+def transform_query(state):
+    better_question = _question_rewriter(state.get("groq_api_key")).invoke({
+        "question": state["question"],
+        "chat_history": state.get("chat_history", "")
+    })
+    return _transform_result(state, better_question)
+
+
+async def atransform_query(state):
+    better_question = await _question_rewriter(state.get("groq_api_key")).ainvoke({
+        "question": state["question"],
+        "chat_history": state.get("chat_history", "")
+    })
+    return _transform_result(state, better_question)
+
+
+def _embedding_route(question, chat_history, collection=None):
+    """Route from corpus similarity alone; None means the LLM router must decide."""
+    if ROUTER_MODE != "hybrid" or is_history_dependent(question, chat_history):
+        return None
+    try:
+        nearest_score, centroid_score = route_scores(question, collection)
+    except Exception as exc:
+        log_step(f"embedding router unavailable: {exc}")
+        return None
+    log_step(f"route scores: nearest={nearest_score:.3f} centroid={centroid_score:.3f}")
+    score = max(nearest_score, centroid_score)
+    if score >= ROUTER_ACCEPT_SCORE:
+        return "vectorstore"
+    if score < ROUTER_REJECT_SCORE:
+        return "human_escalation"
+    return None
+
+
+def _route_decision(datasource):
+    if datasource == "human_escalation":
+        return "human_escalation"
+    return "vectorstore"
+
+
 def route_question(state):
-    print("---ROUTE QUESTION---")
     question = state["question"]
     groq_api_key = state.get("groq_api_key")
+    chat_history = state.get("chat_history", "")
+    datasource = _embedding_route(question, chat_history, state.get("collection"))
+    if datasource is not None:
+        log_step("decided by embedding similarity")
+    else:
+        log_step("decided by LLM router")
+        question_router = _structured_chain("question_router", route_prompt, RouteQuery, groq_api_key)
+        source = question_router.invoke({
+            "question": question,
+            "chat_history": chat_history
+        })
+        datasource = source.datasource
+    return _route_decision(datasource)
 
-    class RouteQuery(BaseModel):
-        datasource: Literal["vectorstore", "human_escalation"] = Field(
-            ..., description="Choose to route to vectorstore or human escalation."
-        )
 
-    llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0, groq_api_key=groq_api_key)
-    system = (
-        "You are an expert router for a RAG system that can use vectorstore retrieval or escalate to humans."
-        "The vectorstore contains documents related to agents, prompt engineering, and adversarial attacks."
-        "Use vectorstore only for those topics."
-        "If the question is outside this scope, time-sensitive, policy-sensitive, or likely to need expert judgment,"
-        "route to human_escalation."
+async def aroute_question(state):
+    question = state["question"]
+    groq_api_key = state.get("groq_api_key")
+    chat_history = state.get("chat_history", "")
+    datasource = await asyncio.to_thread(
+        _embedding_route, question, chat_history, state.get("collection")
     )
-    route_prompt = ChatPromptTemplate.from_messages([
-        ("system", system),
-        ("human", "Chat history:\n{chat_history}\n\nQuestion: {question}"),
-    ])
-    question_router = route_prompt | llm.with_structured_output(RouteQuery)
-    source = question_router.invoke({
-        "question": question,
-        "chat_history": state.get("chat_history", "")
-    })
-    if source.datasource == "human_escalation":
-        print("---ROUTE QUESTION TO HUMAN ESCALATION---")
-        return "human_escalation"
+    if datasource is not None:
+        log_step("decided by embedding similarity")
     else:
-        print("---ROUTE QUESTION TO RAG---")
-        return "vectorstore"
+        log_step("decided by LLM router")
+        question_router = _structured_chain("question_router", route_prompt, RouteQuery, groq_api_key)
+        source = await question_router.ainvoke({
+            "question": question,
+            "chat_history": chat_history
+        })
+        datasource = source.datasource
+    return _route_decision(datasource)
+
 
 def decide_to_generate(state):
-    print("---ASSESS GRADED DOCUMENTS---")
     filtered_documents = state["documents"]
     retrieval_attempts = state.get("retrieval_attempts", 0)
     if not filtered_documents:
         if retrieval_attempts >= 1:
-            print("---DECISION: DOCUMENTS STILL NOT RELEVANT, ESCALATE TO HUMAN---")
             state["escalation_reason"] = "No relevant documents after retrieval retries."
             return "human_escalation"
-        print("---DECISION: ALL DOCUMENTS ARE NOT RELEVANT TO QUESTION, TRANSFORM QUERY---")
         return "transform_query"
     else:
-        print("---DECISION: GENERATE---")
         return "generate"
 
-def grade_generation_v_documents_and_question(state):
-    print("---CHECK HALLUCINATIONS---")
-    question = state["question"]
-    documents = state["documents"]
-    generation = state["generation"]
-    groq_api_key = state.get("groq_api_key")
 
-    class GradeHallucinations(BaseModel):
-        binary_score: str = Field(description="Answer is grounded in the facts, 'yes' or 'no'")
+async def adecide_to_generate(state):
+    return decide_to_generate(state)
 
-    class GradeAnswer(BaseModel):
-        binary_score: str = Field(description="Answer addresses the question, 'yes' or 'no'")
 
-    llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0, groq_api_key=groq_api_key)
+def _generation_graders(state):
+    groq_api_key = state.get("groq_api_key")
+    hallucination_grader = _structured_chain(
+        "hallucination_grader", hallucination_prompt, GradeHallucinations, groq_api_key
+    )
+    answer_grader = _structured_chain("answer_grader", answer_prompt, GradeAnswer, groq_api_key)
+    # For documents input, provide text to graders
+    hallucination_inputs = {"documents": _documents_context(state["documents"]).text, "generation": state["generation"]}
+    answer_inputs = {"question": state["question"], "generation": state["generation"]}
+    return hallucination_grader, hallucination_inputs, answer_grader, answer_inputs
 
-    hallucination_prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a grader assessing whether an LLM generation is grounded in a set of retrieved facts. Give 'yes' or 'no'."),
-        ("human", "Set of facts:\n\n {documents} \n\n LLM generation: {generation}"),
-    ])
-    hallucination_grader = hallucination_prompt | llm.with_structured_output(GradeHallucinations)
 
-    answer_prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a grader assessing whether an answer addresses/resolves a question. Give 'yes' or 'no'."),
-        ("human", "User question:\n\n {question} \n\n LLM generation: {generation}"),
-    ])
-    answer_grader = answer_prompt | llm.with_structured_output(GradeAnswer)
+def _grounded(score):
+    if getattr(score, "binary_score", "no") == "yes":
+        log_step("generation is grounded in documents")
+        return True
+    return False
 
-    # For documents input, provide text to graders
-    if isinstance(documents, list) and documents and isinstance(documents[0], Document):
-        docs_text = format_docs(documents)
-    elif isinstance(documents, Document):
-        docs_text = documents.page_content
-    else:
-        docs_text = str(documents)
 
-    score = hallucination_grader.invoke({"documents": docs_text, "generation": generation})
-    if getattr(score, "binary_score", "no") == "yes":
-        print("---DECISION: GENERATION IS GROUNDED IN DOCUMENTS---")
-        score2 = answer_grader.invoke({"question": question, "generation": generation})
-        if getattr(score2, "binary_score", "no") == "yes":
-            print("---DECISION: GENERATION ADDRESSES QUESTION---")
-            return "useful"
-        else:
-            print("---DECISION: GENERATION DOES NOT ADDRESS QUESTION---")
-            if state.get("generation_attempts", 0) >= 1:
-                state["escalation_reason"] = "Generated answer did not resolve the question after retry."
-                return "human_escalation"
-            return "not useful"
+def _answer_decision(state, score2):
+    if getattr(score2, "binary_score", "no") == "yes":
+        log_step("generation addresses question")
+        return "useful"
     else:
-        print("---DECISION: GENERATION IS NOT GROUNDED IN DOCUMENTS, RE-TRY---")
+        log_step("generation does not address question")
         if state.get("generation_attempts", 0) >= 1:
-            state["escalation_reason"] = "Answer grounding failed after retry."
+            state["escalation_reason"] = "Generated answer did not resolve the question after retry."
             return "human_escalation"
-        return "not supported"
+        return "not useful"
 
-def get_node_info():
-    return {"node": "Node functions for retrieve and generate implemented."}
+
+def _not_grounded_decision(state):
+    log_step("generation is not grounded in documents")
+    if state.get("generation_attempts", 0) >= 1:
+        state["escalation_reason"] = "Answer grounding failed after retry."
+        return "human_escalation"
+    return "not supported"
+
+
+def grade_generation_v_documents_and_question(state):
+    hallucination_grader, hallucination_inputs, answer_grader, answer_inputs = _generation_graders(state)
+
+    # Run both graders at once; the answer grade is only used if grounding passes.
+    # This only overlaps latency: a blocking invoke cannot be interrupted, so the
+    # answer-grader call always completes (and is billed) even when its result is
+    # discarded. The async twin below does cancel it.
+    answer_future = _grader_executor.submit(answer_grader.invoke, answer_inputs)
+    score = hallucination_grader.invoke(hallucination_inputs)
+    if _grounded(score):
+        return _answer_decision(state, answer_future.result())
+    return _not_grounded_decision(state)
 
 
+async def agrade_generation_v_documents_and_question(state):
+    hallucination_grader, hallucination_inputs, answer_grader, answer_inputs = _generation_graders(state)
+
+    answer_task = asyncio.ensure_future(answer_grader.ainvoke(answer_inputs))
+    try:
+        score = await hallucination_grader.ainvoke(hallucination_inputs)
+    except BaseException:
+        answer_task.cancel()
+        raise
+    if _grounded(score):
+        return _answer_decision(state, await answer_task)
+    # Grounding failed: the answer grade is irrelevant, so stop waiting on Groq for it.
+    answer_task.cancel()
+    return _not_grounded_decision(state)
+
+
+def get_node_info():
+    return {"node": "Node functions for retrieve and generate implemented."}
@@ -1,15 +1,25 @@
 
 
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, StateGraph, START
+from src.graphs.tracing import atraced, traced
 from src.nodes.node_implementation import (
     human_escalation,
+    ahuman_escalation,
     retrieve,
+    aretrieve,
     grade_documents,
+    agrade_documents,
     generate,
+    agenerate,
     transform_query,
+    atransform_query,
     route_question,
+    aroute_question,
     decide_to_generate,
+    adecide_to_generate,
     grade_generation_v_documents_and_question,
+    agrade_generation_v_documents_and_question,
 )
 
 # Define the graph state structure (matching notebook)
@@ -23,25 +33,37 @@ class GraphState(TypedDict):
     generation: str
     documents: List[Document]
     groq_api_key: str
+    collection: str
     retrieval_attempts: int
     generation_attempts: int
     escalated: bool
     escalation_reason: str
 
+
+def _node(func, afunc, kind="node"):
+    # invoke() runs the sync function, ainvoke()/astream_events() the async one;
+    # both record a span in the request's trace.
+    # LangGraph already emits events under the node name; a distinct inner
+    # name keeps astream_events from reporting every node twice.
+    name = func.__name__
+    runnable_name = name if kind == "edge" else f"{name}_impl"
+    return RunnableLambda(traced(func, name, kind), afunc=atraced(afunc, name, kind), name=runnable_name)
+
+
 # Build the adaptive RAG workflow graph
 workflow = StateGraph(GraphState)
 
 # Define the nodes
-workflow.add_node("human_escalation", human_escalation)  # human escalation
-workflow.add_node("retrieve", retrieve)  # retrieve
-workflow.add_node("grade_documents", grade_documents)  # grade documents
-workflow.add_node("generate", generate)  # generate
-workflow.add_node("transform_query", transform_query)  # transform_query
+workflow.add_node("human_escalation", _node(human_escalation, ahuman_escalation))  # human escalation
+workflow.add_node("retrieve", _node(retrieve, aretrieve))  # retrieve
+workflow.add_node("grade_documents", _node(grade_documents, agrade_documents))  # grade documents
+workflow.add_node("generate", _node(generate, agenerate))  # generate
+workflow.add_node("transform_query", _node(transform_query, atransform_query))  # transform_query
 
 # Build graph edges and logic
 workflow.add_conditional_edges(
     START,
-    route_question,
+    _node(route_question, aroute_question, kind="edge"),
     {
         "human_escalation": "human_escalation",
         "vectorstore": "retrieve",
@@ -51,7 +73,7 @@ workflow.add_edge("human_escalation", END)
 workflow.add_edge("retrieve", "grade_documents")
 workflow.add_conditional_edges(
     "grade_documents",
-    decide_to_generate,
+    _node(decide_to_generate, adecide_to_generate, kind="edge"),
     {
         "transform_query": "transform_query",
         "generate": "generate",
@@ -61,7 +83,7 @@ workflow.add_conditional_edges(
 workflow.add_edge("transform_query", "retrieve")
 workflow.add_conditional_edges(
     "generate",
-    grade_generation_v_documents_and_question,
+    _node(grade_generation_v_documents_and_question, agrade_generation_v_documents_and_question, kind="edge"),
     {
         "not supported": "generate",
         "useful": END,
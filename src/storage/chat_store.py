@@ -1,14 +1,47 @@
+import asyncio
+import inspect
+import itertools
 import json
+import logging
 import os
+import threading
+import time
 from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
 from typing import Any
 
 import psycopg
 from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, ConnectionPool, PoolTimeout
 from dotenv import load_dotenv
 
+from src.graphs.cache import LRUCache
+from src.graphs.metrics import CHAT_STORE_QUERY, CHAT_STORE_WRITE_BEHIND_ROWS, REGISTRY
+
 
 load_dotenv()
+logger = logging.getLogger(__name__)
+
+CHAT_STORE_POOL_MIN_SIZE = int(os.getenv("CHAT_STORE_POOL_MIN_SIZE", "1"))
+CHAT_STORE_POOL_MAX_SIZE = int(os.getenv("CHAT_STORE_POOL_MAX_SIZE", "10"))
+# How long background work (the write-behind flusher) waits for a free connection.
+CHAT_STORE_POOL_TIMEOUT_SECONDS = float(os.getenv("CHAT_STORE_POOL_TIMEOUT_SECONDS", "5"))
+# How long a request waits for a free connection before falling back to memory.
+CHAT_STORE_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("CHAT_STORE_ACQUIRE_TIMEOUT_SECONDS", "0.5"))
+# After this many consecutive connection failures (not timeouts of a busy but
+# healthy pool), calls fail fast for the cooldown instead of each waiting out
+# the acquire timeout.
+CHAT_STORE_BREAKER_THRESHOLD = int(os.getenv("CHAT_STORE_BREAKER_THRESHOLD", "5"))
+CHAT_STORE_BREAKER_COOLDOWN_SECONDS = float(os.getenv("CHAT_STORE_BREAKER_COOLDOWN_SECONDS", "10"))
+CHAT_STORE_POOL_MAX_IDLE_SECONDS = float(os.getenv("CHAT_STORE_POOL_MAX_IDLE_SECONDS", "300"))
+# Give up reconnecting after the database has been unreachable this long.
+CHAT_STORE_RECONNECT_TIMEOUT_SECONDS = float(os.getenv("CHAT_STORE_RECONNECT_TIMEOUT_SECONDS", "60"))
+# Recent-history cache: sessions kept, messages kept per session, and how long
+# an entry is trusted (other workers may append to the same session).
+CHAT_HISTORY_CACHE_SESSIONS = int(os.getenv("CHAT_HISTORY_CACHE_SESSIONS", "1000"))
+CHAT_HISTORY_CACHE_MESSAGES = int(os.getenv("CHAT_HISTORY_CACHE_MESSAGES", "20"))
+CHAT_HISTORY_CACHE_TTL_SECONDS = float(os.getenv("CHAT_HISTORY_CACHE_TTL_SECONDS", "300"))
 
 
 class ChatStoreError(RuntimeError):
@@ -19,71 +52,473 @@ def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def _get_connection() -> psycopg.Connection[Any]:
-    if hasattr(_get_connection, "_connection"):
-        connection = _get_connection._connection  # type: ignore[attr-defined]
-        if connection and not connection.closed:
-            return connection
+# Whether the pools' latest attempt to open a connection failed. A PoolTimeout
+# while it is False means every connection was busy, not that the database is
+# down, and must not trip the circuit breaker.
+_connect_state = {"failing": False}
+
+
+class _TrackedConnection(psycopg.Connection):
+    @classmethod
+    def connect(cls, *args, **kwargs):
+        try:
+            connection = super().connect(*args, **kwargs)
+        except psycopg.OperationalError:
+            _connect_state["failing"] = True
+            raise
+        _connect_state["failing"] = False
+        return connection
+
+
+class _AsyncTrackedConnection(psycopg.AsyncConnection):
+    @classmethod
+    async def connect(cls, *args, **kwargs):
+        try:
+            connection = await super().connect(*args, **kwargs)
+        except psycopg.OperationalError:
+            _connect_state["failing"] = True
+            raise
+        _connect_state["failing"] = False
+        return connection
 
+
+def _pool_options() -> dict[str, Any]:
     database_url = os.getenv("DATABASE_URL")
     if not database_url:
         raise ChatStoreError("DATABASE_URL is not configured.")
+    return {
+        "conninfo": database_url,
+        "min_size": CHAT_STORE_POOL_MIN_SIZE,
+        "max_size": max(CHAT_STORE_POOL_MIN_SIZE, CHAT_STORE_POOL_MAX_SIZE),
+        "kwargs": {"row_factory": dict_row, "autocommit": True},
+        "timeout": CHAT_STORE_POOL_TIMEOUT_SECONDS,
+        "max_idle": CHAT_STORE_POOL_MAX_IDLE_SECONDS,
+        "reconnect_timeout": CHAT_STORE_RECONNECT_TIMEOUT_SECONDS,
+    }
+
+
+_pool_lock = threading.Lock()
+_async_pool_lock = asyncio.Lock()
+
+
+def _get_pool() -> ConnectionPool:
+    """Process-wide pool for threadpool handlers and background threads."""
+    with _pool_lock:
+        pool = getattr(_get_pool, "_pool", None)
+        if pool is None or pool.closed:
+            try:
+                # check_connection pings a connection before handing it out,
+                # so connections dropped by the server are replaced transparently.
+                pool = ConnectionPool(
+                    connection_class=_TrackedConnection,
+                    check=ConnectionPool.check_connection,
+                    open=True,
+                    **_pool_options(),
+                )
+            except ChatStoreError:
+                raise
+            except Exception as exc:
+                raise ChatStoreError(f"Failed to connect to PostgreSQL: {exc}") from exc
+            _get_pool._pool = pool  # type: ignore[attr-defined]
+        return pool
+
+
+async def _get_async_pool() -> AsyncConnectionPool:
+    """Pool for async handlers; bound to the running event loop."""
+    async with _async_pool_lock:
+        pool = getattr(_get_async_pool, "_pool", None)
+        if pool is None or pool.closed:
+            try:
+                pool = AsyncConnectionPool(
+                    connection_class=_AsyncTrackedConnection,
+                    check=AsyncConnectionPool.check_connection,
+                    open=False,
+                    **_pool_options(),
+                )
+                await pool.open()
+            except ChatStoreError:
+                raise
+            except Exception as exc:
+                raise ChatStoreError(f"Failed to connect to PostgreSQL: {exc}") from exc
+            _get_async_pool._pool = pool  # type: ignore[attr-defined]
+        return pool
+
+
+def close_pool() -> None:
+    pool = getattr(_get_pool, "_pool", None)
+    if pool is not None:
+        pool.close()
+
+
+async def aclose_pool() -> None:
+    pool = getattr(_get_async_pool, "_pool", None)
+    if pool is not None:
+        await pool.close()
+
+
+def _timed(func):
+    """Record the operation's latency in the chat-store histogram."""
+
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            status = "error"
+            try:
+                result = await func(*args, **kwargs)
+                status = "ok"
+                return result
+            finally:
+                CHAT_STORE_QUERY.observe(time.perf_counter() - started, operation=func.__name__, status=status)
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = func(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            CHAT_STORE_QUERY.observe(time.perf_counter() - started, operation=func.__name__, status=status)
+
+    return wrapper
+
+
+class _CircuitBreaker:
+    """Fails chat-store calls fast for a cooldown once the database stops answering.
+
+    When the cooldown ends, one call is let through as a probe (the others
+    keep failing fast); its success closes the breaker, its failure starts
+    another cooldown.
+    """
+
+    def __init__(self, threshold: int = CHAT_STORE_BREAKER_THRESHOLD, cooldown: float = CHAT_STORE_BREAKER_COOLDOWN_SECONDS):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.trips = 0
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._failures >= self.threshold
+
+    def check(self) -> None:
+        with self._lock:
+            if self._failures < self.threshold:
+                return
+            now = time.monotonic()
+            if now < self._open_until:
+                raise ChatStoreError("PostgreSQL unavailable; chat store circuit is open.")
+            self._open_until = now + self.cooldown
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures == self.threshold:
+                self.trips += 1
+                logger.warning("Chat store circuit opened for %.1fs", self.cooldown)
+            if self._failures >= self.threshold:
+                self._open_until = time.monotonic() + self.cooldown
+
+
+_breaker = _CircuitBreaker()
+
+
+def _breaker_metrics():
+    yield ("rag_chat_store_circuit_open", "gauge", "1 while chat-store calls fail fast after connection failures.", {}, int(_breaker.is_open))
+    yield ("rag_chat_store_circuit_trips_total", "counter", "Times the chat-store circuit opened.", {}, _breaker.trips)
+
+
+REGISTRY.register_collector(_breaker_metrics)
 
-    try:
-        _get_connection._connection = psycopg.connect(  # type: ignore[attr-defined]
-            database_url,
-            row_factory=dict_row,
-            autocommit=True,
-        )
-        return _get_connection._connection  # type: ignore[attr-defined]
-    except Exception as exc:
-        raise ChatStoreError(f"Failed to connect to PostgreSQL: {exc}") from exc
+
+# A connection that breaks mid-query is discarded by the pool; reads are
+# retried once on a fresh connection, writes are not (they may have landed).
+_RETRYABLE_ERRORS = (psycopg.OperationalError,)
+
+
+def _run(
+    query: str,
+    params: tuple[Any, ...],
+    fetch: str | None,
+    retry: bool = False,
+    timeout: float = CHAT_STORE_ACQUIRE_TIMEOUT_SECONDS,
+):
+    _breaker.check()
+    attempts = 2 if retry else 1
+    for attempt in range(attempts):
+        try:
+            with _get_pool().connection(timeout=timeout) as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(query, params)
+                    if fetch == "one":
+                        result = cursor.fetchone()
+                    elif fetch == "all":
+                        result = cursor.fetchall() or []
+                    else:
+                        result = None
+            _breaker.record_success()
+            return result
+        except PoolTimeout as exc:
+            if _connect_state["failing"]:
+                _breaker.record_failure()
+            raise ChatStoreError(f"No PostgreSQL connection available: {exc}") from exc
+        except _RETRYABLE_ERRORS as exc:
+            if attempt + 1 < attempts:
+                continue
+            _breaker.record_failure()
+            raise ChatStoreError(f"PostgreSQL connection failed: {exc}") from exc
+
+
+async def _arun(
+    query: str,
+    params: tuple[Any, ...],
+    fetch: str | None,
+    retry: bool = False,
+    timeout: float = CHAT_STORE_ACQUIRE_TIMEOUT_SECONDS,
+):
+    _breaker.check()
+    attempts = 2 if retry else 1
+    for attempt in range(attempts):
+        try:
+            pool = await _get_async_pool()
+            async with pool.connection(timeout=timeout) as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(query, params)
+                    if fetch == "one":
+                        result = await cursor.fetchone()
+                    elif fetch == "all":
+                        result = await cursor.fetchall() or []
+                    else:
+                        result = None
+            _breaker.record_success()
+            return result
+        except PoolTimeout as exc:
+            if _connect_state["failing"]:
+                _breaker.record_failure()
+            raise ChatStoreError(f"No PostgreSQL connection available: {exc}") from exc
+        except _RETRYABLE_ERRORS as exc:
+            if attempt + 1 < attempts:
+                continue
+            _breaker.record_failure()
+            raise ChatStoreError(f"PostgreSQL connection failed: {exc}") from exc
 
 
 def _fetch_one(query: str, params: tuple[Any, ...]) -> dict[str, Any] | None:
-    connection = _get_connection()
-    with connection.cursor() as cursor:
-        cursor.execute(query, params)
-        return cursor.fetchone()
+    return _run(query, params, "one")
 
 
 def _fetch_all(query: str, params: tuple[Any, ...]) -> list[dict[str, Any]]:
-    connection = _get_connection()
-    with connection.cursor() as cursor:
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        return rows or []
+    return _run(query, params, "all", retry=True)
 
 
 def _execute(query: str, params: tuple[Any, ...]) -> None:
-    connection = _get_connection()
-    with connection.cursor() as cursor:
-        cursor.execute(query, params)
+    _run(query, params, None)
+
+
+_CREATE_SESSION_SQL = """
+    insert into public.chat_sessions (title, last_message_at)
+    values (%s, %s)
+    returning id::text as id, title, created_at::text as created_at, last_message_at::text as last_message_at
+"""
+
+_LIST_SESSIONS_SQL = """
+    select id::text as id, title, created_at::text as created_at, last_message_at::text as last_message_at
+    from public.chat_sessions
+    order by last_message_at desc
+    limit %s
+"""
+
+# Insert the message and bump the session's last_message_at in one round trip.
+# created_at comes from the app clock, like write-behind rows, so a deferred
+# answer can never sort before the question appended on the same turn.
+_APPEND_MESSAGE_SQL = """
+    with inserted as (
+        insert into public.chat_messages (session_id, role, content, metadata, created_at)
+        values (%s, %s, %s, %s::jsonb, %s::timestamptz)
+        returning id, session_id, role, content, metadata, created_at
+    ), touched as (
+        update public.chat_sessions as sessions
+        set last_message_at = greatest(sessions.last_message_at, inserted.created_at)
+        from inserted
+        where sessions.id = inserted.session_id
+    )
+    select id::text as id, session_id::text as session_id, role, content, metadata, created_at::text as created_at
+    from inserted
+"""
+
+# Batched forms used by the write-behind flusher; created_at is the enqueue
+# time so message order survives batching.
+_APPEND_MESSAGES_BATCH_SQL = """
+    with rows as (
+        select * from unnest(%s::uuid[], %s::text[], %s::text[], %s::jsonb[], %s::timestamptz[])
+            as r(session_id, role, content, metadata, created_at)
+    ), inserted as (
+        insert into public.chat_messages (session_id, role, content, metadata, created_at)
+        select session_id, role, content, metadata, created_at from rows
+        returning session_id, created_at
+    )
+    update public.chat_sessions as sessions
+    set last_message_at = greatest(sessions.last_message_at, latest.created_at)
+    from (select session_id, max(created_at) as created_at from inserted group by session_id) as latest
+    where sessions.id = latest.session_id
+"""
+
+_GET_MESSAGES_SQL = """
+    select id::text as id, session_id::text as session_id, role, content, metadata, created_at::text as created_at
+    from public.chat_messages
+    where session_id = %s
+    order by created_at asc
+    limit %s
+"""
+
+# Newest-first so the (session_id, created_at) index is read backwards and
+# the LIMIT stops early; only the columns the prompt needs.
+_RECENT_MESSAGES_SQL = """
+    select role, content
+    from public.chat_messages
+    where session_id = %s and role = any(%s)
+    order by created_at desc
+    limit %s
+"""
+
+_LOG_ESCALATION_SQL = """
+    insert into public.escalated_conversations (session_id, question, chat_history, escalation_reason)
+    values (%s, %s, %s::jsonb, %s)
+    returning id::text as id
+"""
+
+
+_LOG_ESCALATIONS_BATCH_SQL = """
+    insert into public.escalated_conversations (session_id, question, chat_history, escalation_reason, created_at)
+    select * from unnest(%s::uuid[], %s::text[], %s::jsonb[], %s::text[], %s::timestamptz[])
+"""
+
+
+def _create_session_params(title: str) -> tuple[Any, ...]:
+    return (title[:120] if title else "New chat", _now_iso())
+
+
+def _append_message_params(
+    session_id: str,
+    role: str,
+    content: str,
+    metadata: dict[str, Any] | None,
+) -> tuple[Any, ...]:
+    return (session_id, role, content, json.dumps(metadata or {}), _now_iso())
+
+
+def _log_escalation_params(
+    session_id: str,
+    question: str,
+    chat_history_str: str,
+    escalation_reason: str,
+) -> tuple[Any, ...]:
+    history_json = json.dumps([{"history": chat_history_str}])
+    return (session_id, question, history_json, escalation_reason)
+
+
+# session id -> {roles tuple: {"messages": [...oldest first], "complete": bool}}
+# "complete" means the list holds every message the session has for those roles.
+_history_cache = LRUCache(maxsize=CHAT_HISTORY_CACHE_SESSIONS, ttl_seconds=CHAT_HISTORY_CACHE_TTL_SECONDS)
+# session id -> stamp of the last message this process appended. A read takes
+# the stamp before querying and only fills the cache if it is unchanged, so a
+# fetch that raced an append cannot overwrite the appended message.
+_history_versions = LRUCache(maxsize=CHAT_HISTORY_CACHE_SESSIONS * 2)
+_history_clock = itertools.count(1)
+_history_lock = threading.Lock()
+
+
+def _history_version(session_id: str) -> int | None:
+    with _history_lock:
+        return _history_versions.peek(session_id)
+
+
+def _cached_recent_messages(session_id: str, n: int, roles: tuple[str, ...]) -> list[dict[str, Any]] | None:
+    with _history_lock:
+        entry = (_history_cache.get(session_id) or {}).get(roles)
+        if entry is None or (len(entry["messages"]) < n and not entry["complete"]):
+            return None
+        return [dict(message) for message in entry["messages"][-n:]] if n > 0 else []
+
+
+def _cache_recent_messages(
+    session_id: str,
+    roles: tuple[str, ...],
+    rows: list[dict[str, Any]],
+    limit: int,
+    version: int | None,
+) -> None:
+    """Cache rows read after ``_history_version`` returned ``version``, unless a message was appended since."""
+    messages = [{"role": row["role"], "content": row["content"]} for row in reversed(rows)]
+    with _history_lock:
+        if _history_versions.peek(session_id) != version:
+            return
+        entries = _history_cache.get(session_id) or {}
+        entries[roles] = {
+            "messages": messages[-CHAT_HISTORY_CACHE_MESSAGES:],
+            "complete": len(rows) < limit and len(rows) <= CHAT_HISTORY_CACHE_MESSAGES,
+        }
+        _history_cache.set(session_id, entries)
 
 
+def _remember_message(session_id: str, role: str, content: str) -> None:
+    """Keep cached history windows current when this process appends a message."""
+    with _history_lock:
+        _history_versions.set(session_id, next(_history_clock))
+        entries = _history_cache.get(session_id)
+        if not entries:
+            return
+        for roles, entry in entries.items():
+            if role in roles:
+                entry["messages"].append({"role": role, "content": content})
+                if len(entry["messages"]) > CHAT_HISTORY_CACHE_MESSAGES:
+                    del entry["messages"][0]
+                    entry["complete"] = False
+
+
+def _recent_messages_limit(n: int) -> int:
+    return max(n, CHAT_HISTORY_CACHE_MESSAGES)
+
+
+@_timed
 def create_session(title: str) -> dict[str, Any]:
-    session_title = title[:120] if title else "New chat"
-    query = """
-        insert into public.chat_sessions (title, last_message_at)
-        values (%s, %s)
-        returning id::text as id, title, created_at::text as created_at, last_message_at::text as last_message_at
-    """
-    row = _fetch_one(query, (session_title, _now_iso()))
+    row = _fetch_one(_CREATE_SESSION_SQL, _create_session_params(title))
     if not row:
         raise ChatStoreError("Failed to create chat session.")
+    _cache_recent_messages(row["id"], ("user", "assistant"), [], 1, None)
     return row
 
 
+@_timed
+async def acreate_session(title: str) -> dict[str, Any]:
+    row = await _arun(_CREATE_SESSION_SQL, _create_session_params(title), "one")
+    if not row:
+        raise ChatStoreError("Failed to create chat session.")
+    _cache_recent_messages(row["id"], ("user", "assistant"), [], 1, None)
+    return row
+
+
+@_timed
 def list_sessions(limit: int = 50) -> list[dict[str, Any]]:
-    query = """
-        select id::text as id, title, created_at::text as created_at, last_message_at::text as last_message_at
-        from public.chat_sessions
-        order by last_message_at desc
-        limit %s
-    """
-    return _fetch_all(query, (limit,))
+    return _fetch_all(_LIST_SESSIONS_SQL, (limit,))
 
 
+@_timed
+async def alist_sessions(limit: int = 50) -> list[dict[str, Any]]:
+    return await _arun(_LIST_SESSIONS_SQL, (limit,), "all", retry=True)
+
+
+@_timed
 def update_session_title(session_id: str, title: str) -> None:
     try:
         _execute(
@@ -94,53 +529,319 @@ def update_session_title(session_id: str, title: str) -> None:
         raise ChatStoreError(f"Failed to update session title: {exc}") from exc
 
 
+@_timed
 def append_message(
     session_id: str,
     role: str,
     content: str,
     metadata: dict[str, Any] | None = None,
 ) -> dict[str, Any]:
-    query = """
-        insert into public.chat_messages (session_id, role, content, metadata)
-        values (%s, %s, %s, %s::jsonb)
-        returning id::text as id, session_id::text as session_id, role, content, metadata, created_at::text as created_at
-    """
-    metadata_json = json.dumps(metadata or {})
-    row = _fetch_one(query, (session_id, role, content, metadata_json))
+    row = _fetch_one(_APPEND_MESSAGE_SQL, _append_message_params(session_id, role, content, metadata))
     if not row:
         raise ChatStoreError("Failed to append chat message.")
+    _remember_message(session_id, role, content)
+    return row
 
-    _execute(
-        "update public.chat_sessions set last_message_at = %s where id = %s",
-        (_now_iso(), session_id),
-    )
+
+@_timed
+async def aappend_message(
+    session_id: str,
+    role: str,
+    content: str,
+    metadata: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    row = await _arun(_APPEND_MESSAGE_SQL, _append_message_params(session_id, role, content, metadata), "one")
+    if not row:
+        raise ChatStoreError("Failed to append chat message.")
+    _remember_message(session_id, role, content)
     return row
 
 
+@_timed
 def get_messages(session_id: str, limit: int = 500) -> list[dict[str, Any]]:
-    query = """
-        select id::text as id, session_id::text as session_id, role, content, metadata, created_at::text as created_at
-        from public.chat_messages
-        where session_id = %s
-        order by created_at asc
-        limit %s
-    """
-    return _fetch_all(query, (session_id, limit))
+    return _fetch_all(_GET_MESSAGES_SQL, (session_id, limit))
+
+
+@_timed
+async def aget_messages(session_id: str, limit: int = 500) -> list[dict[str, Any]]:
+    return await _arun(_GET_MESSAGES_SQL, (session_id, limit), "all", retry=True)
+
+
+@_timed
+def get_recent_messages(
+    session_id: str,
+    n: int = 10,
+    roles: tuple[str, ...] = ("user", "assistant"),
+) -> list[dict[str, Any]]:
+    """The last ``n`` messages with these roles (oldest first), as role/content only."""
+    roles = tuple(roles)
+    cached = _cached_recent_messages(session_id, n, roles)
+    if cached is not None:
+        return cached
+    limit = _recent_messages_limit(n)
+    version = _history_version(session_id)
+    rows = _fetch_all(_RECENT_MESSAGES_SQL, (session_id, list(roles), limit))
+    _cache_recent_messages(session_id, roles, rows, limit, version)
+    return [{"role": row["role"], "content": row["content"]} for row in reversed(rows[:n])]
+
+
+@_timed
+async def aget_recent_messages(
+    session_id: str,
+    n: int = 10,
+    roles: tuple[str, ...] = ("user", "assistant"),
+) -> list[dict[str, Any]]:
+    roles = tuple(roles)
+    cached = _cached_recent_messages(session_id, n, roles)
+    if cached is not None:
+        return cached
+    limit = _recent_messages_limit(n)
+    version = _history_version(session_id)
+    rows = await _arun(_RECENT_MESSAGES_SQL, (session_id, list(roles), limit), "all", retry=True)
+    _cache_recent_messages(session_id, roles, rows, limit, version)
+    return [{"role": row["role"], "content": row["content"]} for row in reversed(rows[:n])]
 
 
+@_timed
 def log_escalation(
     session_id: str,
     question: str,
     chat_history_str: str,
     escalation_reason: str,
 ) -> dict[str, Any]:
-    query = """
-        insert into public.escalated_conversations (session_id, question, chat_history, escalation_reason)
-        values (%s, %s, %s::jsonb, %s)
-        returning id::text as id
-    """
-    history_json = json.dumps([{"history": chat_history_str}])
-    row = _fetch_one(query, (session_id, question, history_json, escalation_reason))
+    row = _fetch_one(_LOG_ESCALATION_SQL, _log_escalation_params(session_id, question, chat_history_str, escalation_reason))
     if not row:
         raise ChatStoreError("Failed to log escalation.")
     return row
+
+
+@_timed
+async def alog_escalation(
+    session_id: str,
+    question: str,
+    chat_history_str: str,
+    escalation_reason: str,
+) -> dict[str, Any]:
+    params = _log_escalation_params(session_id, question, chat_history_str, escalation_reason)
+    row = await _arun(_LOG_ESCALATION_SQL, params, "one")
+    if not row:
+        raise ChatStoreError("Failed to log escalation.")
+    return row
+
+
+# --- WRITE-BEHIND ---
+# Assistant messages and escalation logs don't need to be durable before the
+# response is sent; when enabled they are queued and inserted in batches.
+CHAT_STORE_WRITE_BEHIND = os.getenv("CHAT_STORE_WRITE_BEHIND", "false").strip().lower() in ("1", "true", "yes")
+CHAT_STORE_FLUSH_INTERVAL_SECONDS = float(os.getenv("CHAT_STORE_FLUSH_INTERVAL_SECONDS", "0.25"))
+CHAT_STORE_FLUSH_BATCH_SIZE = int(os.getenv("CHAT_STORE_FLUSH_BATCH_SIZE", "100"))
+# When the queue is full, writes go straight to the database instead.
+CHAT_STORE_WRITE_QUEUE_SIZE = int(os.getenv("CHAT_STORE_WRITE_QUEUE_SIZE", "10000"))
+# Attempts for a batch that fails on a connection error, with exponential backoff.
+CHAT_STORE_FLUSH_RETRIES = int(os.getenv("CHAT_STORE_FLUSH_RETRIES", "3"))
+CHAT_STORE_FLUSH_BACKOFF_SECONDS = float(os.getenv("CHAT_STORE_FLUSH_BACKOFF_SECONDS", "0.5"))
+# JSON lines of queued writes that could not be stored (rejected rows, or rows
+# still failing at shutdown), kept so they can be replayed.
+CHAT_STORE_DEAD_LETTER_FILE = os.getenv(
+    "CHAT_STORE_DEAD_LETTER_FILE", str(Path(__file__).resolve().parents[1] / "data" / "chat_store_dead_letter.jsonl")
+)
+
+
+@_timed
+async def _append_messages_batch(rows: list[tuple[Any, ...]]) -> None:
+    await _arun(
+        _APPEND_MESSAGES_BATCH_SQL,
+        tuple(list(column) for column in zip(*rows)),
+        None,
+        timeout=CHAT_STORE_POOL_TIMEOUT_SECONDS,
+    )
+
+
+@_timed
+async def _log_escalations_batch(rows: list[tuple[Any, ...]]) -> None:
+    await _arun(
+        _LOG_ESCALATIONS_BATCH_SQL,
+        tuple(list(column) for column in zip(*rows)),
+        None,
+        timeout=CHAT_STORE_POOL_TIMEOUT_SECONDS,
+    )
+
+
+class WriteBehindQueue:
+    """Background task that flushes queued writes every interval or batch."""
+
+    def __init__(
+        self,
+        flush_interval: float = CHAT_STORE_FLUSH_INTERVAL_SECONDS,
+        batch_size: int = CHAT_STORE_FLUSH_BATCH_SIZE,
+        maxsize: int = CHAT_STORE_WRITE_QUEUE_SIZE,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def put(self, kind: str, row: tuple[Any, ...]) -> bool:
+        if self._task is None or self._task.done():
+            return False
+        try:
+            self._queue.put_nowait((kind, row))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            batch = []
+            deadline = loop.time() + self.flush_interval
+            while True:
+                if item is None:
+                    # Rows requeued by an earlier failed flush can sit behind the sentinel.
+                    stopping = True
+                    while not self._queue.empty():
+                        item = self._queue.get_nowait()
+                        if item is not None:
+                            batch.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+            if batch:
+                await self._flush(batch, final=stopping)
+
+    async def _flush(self, batch: list[tuple[str, tuple[Any, ...]]], final: bool = False) -> None:
+        """Write the batch; nothing is dropped.
+
+        Connection failures (ChatStoreError) are retried with backoff. A batch
+        rejected by the database is retried row by row so one bad row does not
+        take the others with it. Rows that still fail are requeued when the
+        failure is transient, and dead-lettered when it is not or when
+        ``final`` (shutdown) leaves no later flush to retry them.
+        """
+        for kind, write in (("message", _append_messages_batch), ("escalation", _log_escalations_batch)):
+            rows = [row for item_kind, row in batch if item_kind == kind]
+            if not rows:
+                continue
+            error = await self._write_with_retry(write, rows)
+            if error is None:
+                CHAT_STORE_WRITE_BEHIND_ROWS.inc(len(rows), kind=kind, result="written")
+                continue
+            if isinstance(error, ChatStoreError):
+                # The database is unreachable; row-by-row inserts would fail the same way.
+                logger.warning("Write-behind flush of %d %s rows failed: %s", len(rows), kind, error)
+                self._requeue_or_dead_letter(kind, rows, error, final)
+                continue
+            logger.warning("Write-behind batch of %d %s rows rejected, retrying row by row: %s", len(rows), kind, error)
+            for row in rows:
+                row_error = await self._write_with_retry(write, [row])
+                if row_error is None:
+                    CHAT_STORE_WRITE_BEHIND_ROWS.inc(kind=kind, result="written")
+                elif isinstance(row_error, ChatStoreError):
+                    self._requeue_or_dead_letter(kind, [row], row_error, final)
+                else:
+                    self._dead_letter(kind, [row], row_error)
+
+    async def _write_with_retry(self, write, rows: list[tuple[Any, ...]]) -> Exception | None:
+        """Run ``write(rows)``, retrying connection failures; the last error, or None on success."""
+        for attempt in range(max(1, CHAT_STORE_FLUSH_RETRIES)):
+            try:
+                await write(rows)
+                return None
+            except ChatStoreError as exc:
+                error = exc
+                if attempt + 1 < CHAT_STORE_FLUSH_RETRIES:
+                    await asyncio.sleep(CHAT_STORE_FLUSH_BACKOFF_SECONDS * 2 ** attempt)
+            except Exception as exc:
+                return exc
+        return error
+
+    def _requeue_or_dead_letter(self, kind: str, rows: list[tuple[Any, ...]], error: Exception, final: bool) -> None:
+        if not final:
+            for index, row in enumerate(rows):
+                try:
+                    self._queue.put_nowait((kind, row))
+                except asyncio.QueueFull:
+                    rows = rows[index:]
+                    break
+                CHAT_STORE_WRITE_BEHIND_ROWS.inc(kind=kind, result="requeued")
+            else:
+                return
+        self._dead_letter(kind, rows, error)
+
+    def _dead_letter(self, kind: str, rows: list[tuple[Any, ...]], error: Exception) -> None:
+        CHAT_STORE_WRITE_BEHIND_ROWS.inc(len(rows), kind=kind, result="dead_lettered")
+        try:
+            path = Path(CHAT_STORE_DEAD_LETTER_FILE)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a", encoding="utf-8") as handle:
+                for row in rows:
+                    handle.write(json.dumps({"kind": kind, "row": list(row), "error": str(error), "failed_at": _now_iso()}) + "\n")
+            logger.error("Write-behind stored %d %s rows in %s: %s", len(rows), kind, path, error)
+        except OSError as exc:
+            logger.error("Write-behind lost %d %s rows (%s); dead-letter file failed: %s", len(rows), kind, error, exc)
+
+    async def aclose(self) -> None:
+        """Flush everything queued so far, then stop."""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(None)
+        await self._task
+
+
+async def start_write_behind() -> None:
+    if not CHAT_STORE_WRITE_BEHIND or not os.getenv("DATABASE_URL"):
+        return
+    queue = WriteBehindQueue()
+    queue.start()
+    start_write_behind._queue = queue  # type: ignore[attr-defined]
+
+
+async def stop_write_behind() -> None:
+    queue = getattr(start_write_behind, "_queue", None)
+    if queue is not None:
+        await queue.aclose()
+        start_write_behind._queue = None  # type: ignore[attr-defined]
+
+
+async def aappend_message_deferred(
+    session_id: str,
+    role: str,
+    content: str,
+    metadata: dict[str, Any] | None = None,
+) -> None:
+    """Queue the message when write-behind is running, otherwise write it now."""
+    queue = getattr(start_write_behind, "_queue", None)
+    row = _append_message_params(session_id, role, content, metadata)
+    if queue is not None and queue.put("message", row):
+        # Visible to the next turn's history read before the batch lands.
+        _remember_message(session_id, role, content)
+    else:
+        await aappend_message(session_id, role, content, metadata)
+
+
+async def alog_escalation_deferred(
+    session_id: str,
+    question: str,
+    chat_history_str: str,
+    escalation_reason: str,
+) -> None:
+    queue = getattr(start_write_behind, "_queue", None)
+    row = (*_log_escalation_params(session_id, question, chat_history_str, escalation_reason), _now_iso())
+    if queue is None or not queue.put("escalation", row):
+        await alog_escalation(session_id, question, chat_history_str, escalation_reason)
@@ -0,0 +1,200 @@
+# Bounded in-process chat store used when PostgreSQL is unavailable
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any
+from uuid import uuid4
+
+from src.graphs.metrics import REGISTRY
+
+
+MEMORY_STORE_MAX_SESSIONS = int(os.getenv("MEMORY_STORE_MAX_SESSIONS", "1000"))
+MEMORY_STORE_MAX_MESSAGES = int(os.getenv("MEMORY_STORE_MAX_MESSAGES", "200"))
+MEMORY_STORE_MAX_BYTES = int(os.getenv("MEMORY_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Rough fixed cost of a row dict plus its keys, on top of the string payloads.
+_ROW_OVERHEAD_BYTES = 400
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _message_size(row: dict[str, Any]) -> int:
+    return (
+        _ROW_OVERHEAD_BYTES
+        + sys.getsizeof(row["content"])
+        + len(json.dumps(row["metadata"], default=str))
+    )
+
+
+class MemoryChatStore:
+    """Sessions and messages kept in memory with hard limits.
+
+    Sessions live in an OrderedDict ordered by last activity, so the most
+    recently active session is last: listing is a reverse walk that stops
+    after ``limit`` rows and eviction pops from the front. Every method takes
+    the same lock, so request handlers and the title-rename threads can use
+    it concurrently.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = MEMORY_STORE_MAX_SESSIONS,
+        max_messages_per_session: int = MEMORY_STORE_MAX_MESSAGES,
+        max_bytes: int = MEMORY_STORE_MAX_BYTES,
+    ):
+        self.max_sessions = max(1, max_sessions)
+        self.max_messages_per_session = max(1, max_messages_per_session)
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self.evicted_sessions = 0
+        self.evicted_messages = 0
+        self._sessions: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._messages: dict[str, deque[dict[str, Any]]] = {}
+        self._lock = threading.RLock()
+
+    def _touch(self, session_id: str) -> None:
+        self._sessions[session_id]["last_message_at"] = _now_iso()
+        self._sessions.move_to_end(session_id)
+
+    def _drop_session(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+        for row in self._messages.pop(session_id, ()):
+            self.bytes_used -= row["_size"]
+
+    def _evict(self, keep: str | None = None) -> None:
+        while len(self._sessions) > self.max_sessions or (self.max_bytes and self.bytes_used > self.max_bytes):
+            oldest = next(iter(self._sessions))
+            if oldest == keep:
+                if len(self._sessions) == 1:
+                    break
+                # Never evict the session being written; take the next oldest.
+                oldest = next(islice(self._sessions, 1, None))
+            self._drop_session(oldest)
+            self.evicted_sessions += 1
+
+    def _ensure(self, session_id: str, title: str) -> dict[str, Any]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            now = _now_iso()
+            session = {
+                "id": session_id,
+                "title": title[:120] if title else "New chat",
+                "created_at": now,
+                "last_message_at": now,
+            }
+            self._sessions[session_id] = session
+            self._messages[session_id] = deque()
+            self._evict(keep=session_id)
+        return session
+
+    def create_session(self, title: str, session_id: str | None = None) -> dict[str, Any]:
+        with self._lock:
+            return dict(self._ensure(session_id or str(uuid4()), title))
+
+    def ensure_session(self, session_id: str, title: str = "Recovered chat") -> dict[str, Any]:
+        with self._lock:
+            return dict(self._ensure(session_id, title))
+
+    def update_title(self, session_id: str, title: str) -> dict[str, Any] | None:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            session["title"] = title[:120]
+            return dict(session)
+
+    def append_message(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        metadata: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        row = {
+            "id": str(uuid4()),
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "metadata": metadata or {},
+            "created_at": _now_iso(),
+        }
+        row["_size"] = _message_size(row)
+        with self._lock:
+            self._ensure(session_id, "Recovered chat")
+            messages = self._messages[session_id]
+            messages.append(row)
+            self.bytes_used += row["_size"]
+            while len(messages) > self.max_messages_per_session:
+                self.bytes_used -= messages.popleft()["_size"]
+                self.evicted_messages += 1
+            self._touch(session_id)
+            self._evict(keep=session_id)
+        return {key: value for key, value in row.items() if key != "_size"}
+
+    def get_messages(self, session_id: str, limit: int = 500) -> list[dict[str, Any]]:
+        with self._lock:
+            messages = self._messages.get(session_id, ())
+            rows = list(islice(messages, max(0, len(messages) - limit), None))
+        return [{key: value for key, value in row.items() if key != "_size"} for row in rows]
+
+    def get_recent_messages(
+        self,
+        session_id: str,
+        n: int = 10,
+        roles: tuple[str, ...] = ("user", "assistant"),
+    ) -> list[dict[str, Any]]:
+        recent: list[dict[str, Any]] = []
+        with self._lock:
+            for row in reversed(self._messages.get(session_id, ())):
+                if len(recent) >= n:
+                    break
+                if row["role"] in roles:
+                    recent.append({"role": row["role"], "content": row["content"]})
+        recent.reverse()
+        return recent
+
+    def list_sessions(self, limit: int = 50) -> list[dict[str, Any]]:
+        with self._lock:
+            return [dict(self._sessions[session_id]) for session_id in islice(reversed(self._sessions), limit)]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "messages": sum(len(messages) for messages in self._messages.values()),
+                "bytes_used": self.bytes_used,
+                "max_bytes": self.max_bytes,
+                "max_sessions": self.max_sessions,
+                "max_messages_per_session": self.max_messages_per_session,
+                "evicted_sessions": self.evicted_sessions,
+                "evicted_messages": self.evicted_messages,
+            }
+
+
+_memory_store_lock = threading.Lock()
+
+
+def get_memory_store() -> MemoryChatStore:
+    with _memory_store_lock:
+        if not hasattr(get_memory_store, "_instance"):
+            get_memory_store._instance = MemoryChatStore()
+    return get_memory_store._instance
+
+
+def _memory_store_metrics():
+    if not hasattr(get_memory_store, "_instance"):
+        return
+    stats = get_memory_store._instance.stats()
+    yield ("rag_memory_store_sessions", "gauge", "Sessions held by the in-memory fallback store.", {}, stats["sessions"])
+    yield ("rag_memory_store_bytes", "gauge", "Approximate bytes held by the in-memory fallback store.", {}, stats["bytes_used"])
+    yield ("rag_memory_store_evictions_total", "counter", "In-memory store evictions.", {"type": "session"}, stats["evicted_sessions"])
+    yield ("rag_memory_store_evictions_total", "counter", "In-memory store evictions.", {"type": "message"}, stats["evicted_messages"])
+
+
+REGISTRY.register_collector(_memory_store_metrics)
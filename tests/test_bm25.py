@@ -0,0 +1,60 @@
+from src.graphs.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def _index():
+    return BM25Index.build(
+        ["agents", "memory", "gpt"],
+        [
+            "An agent plans tasks and uses tools to act on the plan.",
+            "Short-term memory is in-context learning; long-term memory uses a vector store.",
+            "GPT-4 is evaluated on the benchmark next to other models.",
+        ],
+    )
+
+
+def test_tokenize_drops_stopwords_and_keeps_compound_terms():
+    assert tokenize("What is GPT-4 and the v1.2 release_notes?") == ["gpt-4", "v1.2", "release_notes"]
+
+
+def test_search_ranks_matching_chunk_first():
+    results = _index().search("long-term memory", k=3)
+
+    assert [doc_id for doc_id, _ in results] == ["memory"]
+    assert results[0][1] > 0
+
+
+def test_search_handles_unknown_terms_and_empty_index():
+    assert _index().search("quantum chromodynamics", k=3) == []
+    assert _index().search("memory", k=0) == []
+    assert BM25Index.build([], []).search("memory", k=3) == []
+
+
+def test_search_limits_to_k():
+    index = BM25Index.build(["a", "b", "c"], ["tools tools", "tools", "tools and plans"])
+    assert len(index.search("tools", k=2)) == 2
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / "bm25.json"
+    index = _index()
+    index.save(path, version="v1")
+
+    loaded = BM25Index.load(path, version="v1")
+    assert loaded is not None
+    assert loaded.search("agent tools", k=3) == index.search("agent tools", k=3)
+
+
+def test_load_rejects_other_version_and_missing_file(tmp_path):
+    path = tmp_path / "bm25.json"
+    _index().save(path, version="v1")
+
+    assert BM25Index.load(path, version="v2") is None
+    assert BM25Index.load(tmp_path / "missing.json", version="v1") is None
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]])
+
+    assert fused[0] == "b"
+    assert set(fused) == {"a", "b", "c", "d"}
+    assert reciprocal_rank_fusion([]) == []
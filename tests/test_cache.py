@@ -0,0 +1,98 @@
+import pytest
+
+from src.graphs import cache as cache_module
+from src.graphs.cache import LRUCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return clock
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_peek_leaves_order_and_counters_alone():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.peek("a") == 1
+    cache.set("c", 3)
+
+    assert cache.peek("a") is None
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["misses"] == 0
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = LRUCache(maxsize=4, ttl_seconds=10)
+    cache.set("a", 1)
+    clock.now += 5
+    assert cache.get("a") == 1
+    assert [key for key, _ in cache.items()] == ["a"]
+
+    clock.now += 6
+    assert cache.peek("a") is None
+    assert cache.items() == []
+    assert cache.get("a", "missing") == "missing"
+    assert len(cache) == 0
+
+
+def test_max_bytes_evicts_oldest_but_keeps_newest():
+    cache = LRUCache(maxsize=10, max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    cache.set("c", "xxxx")
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 8
+
+    cache.set("big", "x" * 50)
+    assert [key for key, _ in cache.items()] == ["big"]
+    assert cache.stats()["bytes"] == 50
+
+
+def test_replacing_a_key_updates_its_size():
+    cache = LRUCache(maxsize=10, max_bytes=100, sizeof=len)
+    cache.set("a", "x" * 40)
+    cache.set("a", "x" * 10)
+    cache.pop("a")
+    assert cache.stats()["bytes"] == 0
+
+
+def test_reset_if_changed_drops_entries_only_on_new_generation():
+    cache = LRUCache(maxsize=4)
+    cache.reset_if_changed("sig-1")
+    cache.set("a", 1)
+    cache.reset_if_changed("sig-1")
+    assert cache.get("a") == 1
+
+    cache.reset_if_changed("sig-2")
+    assert cache.get("a") is None
+    assert cache.generation == "sig-2"
+
+
+def test_zero_maxsize_disables_the_cache():
+    cache = LRUCache(maxsize=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
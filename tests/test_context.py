@@ -0,0 +1,76 @@
+import pytest
+from langchain_core.documents import Document
+
+from src.graphs import context as context_module
+from src.graphs.context import build_context, count_tokens
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # Use the len/4 estimate so the tests do not need the tiktoken download.
+    monkeypatch.setattr(context_module._encoding, "_instance", None, raising=False)
+
+
+TEXT = (
+    "Agents combine planning, memory and tool use. The planner breaks a task into steps, "
+    "memory keeps what was learned, and tools reach outside the model."
+)
+
+
+def test_overlapping_chunks_of_one_source_are_merged():
+    first = Document(page_content=TEXT[:90], metadata={"source": "a.pdf"})
+    second = Document(page_content=TEXT[60:], metadata={"source": "a.pdf"})
+
+    context = build_context([second, first], max_tokens=0)
+
+    assert context.text == TEXT
+    assert (context.chunks, context.passages, context.merged) == (2, 1, 1)
+
+
+def test_chunks_of_different_sources_are_not_merged():
+    first = Document(page_content=TEXT[:90], metadata={"source": "a.pdf"})
+    second = Document(page_content=TEXT[60:], metadata={"source": "b.pdf"})
+
+    context = build_context([first, second], max_tokens=0)
+
+    assert context.text == f"{TEXT[:90]}\n\n{TEXT[60:]}"
+    assert context.merged == 0
+
+
+def test_near_duplicate_of_a_better_passage_is_dropped():
+    best = Document(page_content=TEXT, metadata={"source": "copy-1.pdf"})
+    copy = Document(page_content=TEXT.replace("Agents", "agents"), metadata={"source": "copy-2.pdf"})
+    other = Document(page_content="Retrieval grades each document for relevance.", metadata={"source": "c.pdf"})
+
+    context = build_context([best, copy, other], max_tokens=0)
+
+    assert context.text == f"{TEXT}\n\n{other.page_content}"
+    assert context.duplicates == 1
+
+
+def test_budget_cuts_the_passage_that_crosses_it():
+    documents = [Document(page_content=f"{i} " + "word " * 200, metadata={"source": str(i)}) for i in range(3)]
+
+    context = build_context(documents, max_tokens=300)
+
+    assert context.truncated
+    assert context.passages == 2
+    assert context.tokens <= 300
+    assert count_tokens(context.text) <= 300
+
+
+def test_remainder_too_small_to_keep_is_dropped():
+    documents = [Document(page_content=f"{i} " + "word " * 60, metadata={"source": str(i)}) for i in range(2)]
+
+    context = build_context(documents, max_tokens=100)
+
+    assert context.truncated
+    assert context.passages == 1
+
+
+def test_empty_input_and_plain_strings():
+    assert build_context([]).text == ""
+    assert build_context(["  ", ""]).passages == 0
+
+    context = build_context(["first answer", "second answer"], max_tokens=0)
+    assert context.text == "first answer\n\nsecond answer"
@@ -0,0 +1,118 @@
+import hashlib
+
+from langchain_core.documents import Document
+
+from src.graphs.collection_config import Collection
+from src.graphs.graph_builder import _assign_chunk_ids, _pdf_source_key, _sync_sources, _text_sha256
+from src.graphs.ingestion import IngestionStats
+
+
+class _Spool:
+    def __init__(self):
+        self.ids: list[str] = []
+
+    def add(self, documents, ids):
+        self.ids.extend(ids)
+
+
+def _chunk(chunk_id: str, text: str) -> dict:
+    return {"id": chunk_id, "hash": _text_sha256(text)}
+
+
+def _collection(tmp_path, urls=()) -> Collection:
+    return Collection(name="test", source_urls=tuple(urls), documents_dir=tmp_path, index_dir=tmp_path / "index")
+
+
+def test_assign_chunk_ids_reuses_unchanged_chunks():
+    previous = [_chunk("id-a", "alpha"), _chunk("id-b", "beta")]
+    splits = [Document(page_content="beta"), Document(page_content="gamma")]
+
+    chunks, new_docs, new_ids, stale_ids = _assign_chunk_ids(splits, previous)
+
+    assert chunks[0] == _chunk("id-b", "beta")
+    assert chunks[1]["id"] == new_ids[0]
+    assert [doc.page_content for doc in new_docs] == ["gamma"]
+    assert stale_ids == ["id-a"]
+
+
+def test_assign_chunk_ids_reuses_each_previous_id_once():
+    previous = [_chunk("id-a", "same")]
+    splits = [Document(page_content="same"), Document(page_content="same")]
+
+    chunks, new_docs, new_ids, stale_ids = _assign_chunk_ids(splits, previous)
+
+    assert chunks[0]["id"] == "id-a"
+    assert chunks[1]["id"] == new_ids[0] != "id-a"
+    assert len(new_docs) == 1
+    assert stale_ids == []
+
+
+def test_assign_chunk_ids_for_a_new_source():
+    chunks, new_docs, new_ids, stale_ids = _assign_chunk_ids([Document(page_content="alpha")], [])
+
+    assert [chunk["id"] for chunk in chunks] == new_ids
+    assert len(new_docs) == 1
+    assert stale_ids == []
+
+
+def test_sync_keeps_unchanged_sources_without_reading_them(tmp_path):
+    # Not a real PDF: an unchanged mtime and size must skip parsing entirely.
+    pdf = tmp_path / "kept.pdf"
+    pdf.write_bytes(b"not a pdf")
+    stat = pdf.stat()
+    url = "https://example.com/post"
+    previous = {
+        _pdf_source_key(pdf): {
+            "type": "pdf",
+            "content_hash": "old",
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "chunks": [_chunk("pdf-1", "page")],
+        },
+        url: {"type": "url", "content_hash": "web", "chunks": [_chunk("url-1", "post")]},
+        "documents/removed.pdf": {"type": "pdf", "chunks": [_chunk("gone-1", "x"), _chunk("gone-2", "y")]},
+    }
+    spool = _Spool()
+    stats = IngestionStats()
+
+    sources, stale_ids = _sync_sources(_collection(tmp_path, [url]), previous, stats, spool)
+
+    assert sources == {key: previous[key] for key in (_pdf_source_key(pdf), url)}
+    assert sorted(stale_ids) == ["gone-1", "gone-2"]
+    assert spool.ids == []
+    assert stats.files_parsed == 0
+
+
+def test_sync_touched_pdf_with_same_bytes_keeps_its_chunks(tmp_path):
+    pdf = tmp_path / "touched.pdf"
+    pdf.write_bytes(b"same bytes")
+    key = _pdf_source_key(pdf)
+    previous = {
+        key: {
+            "type": "pdf",
+            "content_hash": hashlib.sha256(b"same bytes").hexdigest(),
+            "mtime": 0,
+            "size": pdf.stat().st_size,
+            "chunks": [_chunk("pdf-1", "page")],
+        }
+    }
+
+    sources, stale_ids = _sync_sources(_collection(tmp_path), previous, IngestionStats(), _Spool())
+
+    assert sources[key]["mtime"] == pdf.stat().st_mtime_ns
+    assert sources[key]["chunks"] == previous[key]["chunks"]
+    assert stale_ids == []
+
+
+def test_sync_failed_pdf_keeps_previous_chunks(tmp_path):
+    pdf = tmp_path / "broken.pdf"
+    pdf.write_bytes(b"changed and unreadable")
+    key = _pdf_source_key(pdf)
+    previous = {key: {"type": "pdf", "content_hash": "old", "mtime": 0, "size": 1, "chunks": [_chunk("pdf-1", "page")]}}
+    stats = IngestionStats()
+
+    sources, stale_ids = _sync_sources(_collection(tmp_path), previous, stats, _Spool())
+
+    assert sources[key] == previous[key]
+    assert stale_ids == []
+    assert key in stats.files_failed
@@ -0,0 +1,75 @@
+from src.storage.memory_store import MemoryChatStore
+
+
+def test_messages_are_returned_oldest_first():
+    store = MemoryChatStore()
+    session = store.create_session("Hello there")
+    for i in range(3):
+        store.append_message(session["id"], "user", f"message {i}")
+
+    assert [row["content"] for row in store.get_messages(session["id"])] == ["message 0", "message 1", "message 2"]
+    assert [row["content"] for row in store.get_messages(session["id"], limit=2)] == ["message 1", "message 2"]
+    assert "_size" not in store.get_messages(session["id"])[0]
+
+
+def test_recent_messages_filter_roles():
+    store = MemoryChatStore()
+    store.append_message("s", "user", "question")
+    store.append_message("s", "assistant", "answer", {"documents_used": 2})
+    store.append_message("s", "system", "note")
+
+    assert store.get_recent_messages("s", n=5) == [
+        {"role": "user", "content": "question"},
+        {"role": "assistant", "content": "answer"},
+    ]
+    assert store.get_recent_messages("s", n=1) == [{"role": "assistant", "content": "answer"}]
+
+
+def test_sessions_are_listed_by_last_activity():
+    store = MemoryChatStore()
+    store.create_session("first", session_id="a")
+    store.create_session("second", session_id="b")
+    store.append_message("a", "user", "bump")
+
+    assert [session["id"] for session in store.list_sessions()] == ["a", "b"]
+    assert [session["id"] for session in store.list_sessions(limit=1)] == ["a"]
+
+
+def test_least_recently_active_session_is_evicted():
+    store = MemoryChatStore(max_sessions=2)
+    store.create_session("a", session_id="a")
+    store.create_session("b", session_id="b")
+    store.append_message("a", "user", "keep me")
+    store.create_session("c", session_id="c")
+
+    assert {session["id"] for session in store.list_sessions()} == {"a", "c"}
+    assert store.get_messages("b") == []
+    assert store.stats()["evicted_sessions"] == 1
+
+
+def test_per_session_message_cap_drops_oldest():
+    store = MemoryChatStore(max_messages_per_session=2)
+    for i in range(4):
+        store.append_message("s", "user", str(i))
+
+    assert [row["content"] for row in store.get_messages("s")] == ["2", "3"]
+    assert store.stats()["evicted_messages"] == 2
+
+
+def test_byte_limit_never_evicts_the_session_being_written():
+    store = MemoryChatStore(max_bytes=2000)
+    store.append_message("old", "user", "x" * 500)
+    store.append_message("new", "user", "y" * 5000)
+
+    assert [session["id"] for session in store.list_sessions()] == ["new"]
+    assert store.get_messages("new")[0]["content"] == "y" * 5000
+    assert store.stats()["bytes_used"] > store.max_bytes
+
+
+def test_update_title_and_ensure_session():
+    store = MemoryChatStore()
+    assert store.update_title("missing", "title") is None
+
+    store.ensure_session("s")
+    assert store.update_title("s", "t" * 200)["title"] == "t" * 120
+    assert store.ensure_session("s", "ignored")["title"] == "t" * 120
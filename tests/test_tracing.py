@@ -0,0 +1,18 @@
+from src.graphs.tracing import collect_trace, log_step, record, span, step_lines
+
+
+def test_step_lines_keep_the_flat_step_format():
+    with collect_trace() as trace:
+        with span("route_question", kind="edge") as event:
+            log_step("decided by embedding similarity")
+            event.decision = "vectorstore"
+        with span("generate"):
+            pass
+        record("answer_cache", kind="cache", decision="exact")
+
+    assert step_lines(trace.to_list()) == [
+        "---ROUTE QUESTION (VECTORSTORE)---",
+        "---DECIDED BY EMBEDDING SIMILARITY---",
+        "---GENERATE---",
+        "---ANSWER CACHE (EXACT)---",
+    ]